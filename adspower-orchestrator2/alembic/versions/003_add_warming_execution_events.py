@@ -0,0 +1,108 @@
+"""Add partitioned warming_execution_events log table
+
+Revision ID: 003
+Revises: 002
+Create Date: 2024-01-03 00:00:00.000000
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+# Particiones mensuales creadas en la migración (actual + siguientes);
+# el resto las crea el loop de mantenimiento de la app
+PARTITIONS_AHEAD = 2
+
+
+def _month_start(value: date, offset: int = 0) -> date:
+    month_index = value.year * 12 + (value.month - 1) + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    # Tabla padre particionada por rango de created_at
+    op.create_table(
+        'warming_execution_events',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('execution_id', sa.Integer(), nullable=False),
+        sa.Column('action_index', sa.Integer(), nullable=True),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['execution_id'], ['warming_executions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index(
+        'ix_warming_execution_events_execution_action',
+        'warming_execution_events',
+        ['execution_id', 'action_index']
+    )
+    op.create_index(
+        'ix_warming_execution_events_execution_id_id',
+        'warming_execution_events',
+        ['execution_id', 'id']
+    )
+
+    # Partición DEFAULT (backfill histórico y meses aún sin partición; la app
+    # mueve sus filas al crear el mes y le aplica la retención por DELETE) + mensuales
+    op.execute(
+        "CREATE TABLE warming_execution_events_default "
+        "PARTITION OF warming_execution_events DEFAULT"
+    )
+
+    today = date.today()
+    for offset in range(PARTITIONS_AHEAD + 1):
+        start = _month_start(today, offset)
+        end = _month_start(today, offset + 1)
+        op.execute(
+            f"CREATE TABLE warming_execution_events_y{start.year}m{start.month:02d} "
+            f"PARTITION OF warming_execution_events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+
+    # Backfill: un evento por elemento del JSON execution_log
+    op.execute("""
+        INSERT INTO warming_execution_events (execution_id, action_index, event_type, payload, created_at)
+        SELECT
+            e.id,
+            CASE WHEN entry.value->>'action_index' ~ '^[0-9]+$'
+                 THEN (entry.value->>'action_index')::int END,
+            CASE
+                WHEN entry.value ? 'action_index' THEN 'action'
+                WHEN entry.value ? 'error' THEN 'failed'
+                WHEN entry.value ? 'completed' THEN 'completed'
+                ELSE 'progress'
+            END,
+            entry.value::json,
+            COALESCE(e.started_at, e.created_at, now())
+        FROM warming_executions e
+        CROSS JOIN LATERAL jsonb_array_elements(e.execution_log::jsonb) WITH ORDINALITY AS entry(value, ordinality)
+        WHERE e.execution_log IS NOT NULL
+          AND json_typeof(e.execution_log) = 'array'
+        ORDER BY e.id, entry.ordinality
+    """)
+
+
+def downgrade() -> None:
+    # Restaurar el log JSON desde los eventos antes de eliminar la tabla
+    op.execute("""
+        UPDATE warming_executions e
+        SET execution_log = events.log
+        FROM (
+            SELECT execution_id, json_agg(payload ORDER BY id) AS log
+            FROM warming_execution_events
+            GROUP BY execution_id
+        ) AS events
+        WHERE e.id = events.execution_id
+    """)
+
+    op.drop_index('ix_warming_execution_events_execution_id_id', table_name='warming_execution_events')
+    op.drop_index('ix_warming_execution_events_execution_action', table_name='warming_execution_events')
+    op.drop_table('warming_execution_events')
@@ -88,4 +88,24 @@ async def get_task_status(
     elif task.state == 'STARTED':
         response['message'] = 'Task is currently running'
     
-    return response
\ No newline at end of file
+    return response
+
+@router.get("/stats/browser-readiness")
+async def get_browser_readiness_stats():
+    """Histograma de latencia open→ready de navegadores por computer"""
+    from app.utils.browser_readiness import browser_readiness
+    from app.websocket.manager import connection_manager
+    
+    try:
+        orchestrator = browser_readiness.get_histograms()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Readiness stats unavailable: {e}")
+    
+    # Los agentes reportan su propio histograma en status_update
+    agents = {}
+    for computer_id in connection_manager.get_connected_agents():
+        state = connection_manager.get_agent_state(computer_id) or {}
+        if state.get("browser_ready_ms"):
+            agents[computer_id] = state["browser_ready_ms"]
+    
+    return {"orchestrator": orchestrator, "agents": agents}
@@ -3,6 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisco
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import uuid
 from app.database import get_db
 from app.services.warming_script_service import WarmingScriptService
 from app.schemas.warming_script import (
@@ -10,9 +12,16 @@ from app.schemas.warming_script import (
     WarmingScriptUpdate,
     WarmingScriptResponse,
     BatchWarmingRequest,
-    BatchWarmingResponse
+    BatchWarmingResponse,
+    WarmingExecutionDetailResponse
 )
 from app.websocket.manager import connection_manager
+from app.services.execution_progress import execution_progress_aggregator
+from app.services.selector_catalog import selector_catalog
+from app.services.warming_sync import warming_sync_manager
+from app.services.warming_dispatcher import warming_dispatcher
+from app.models.warming_script import ExecutionStatus
+from app.utils.script_store import script_bodies, script_content_hash
 from loguru import logger
 import json
 
@@ -119,6 +128,14 @@ async def execute_batch_warming(
     5. Distribuye ejecuciones solo a computadoras online
     6. Si una computadora no está online, muestra advertencia
     7. Envía comandos simultáneos a todos los agentes
+    
+    Un batch sincronizado se rechaza (400) si algún agente tiene más
+    profiles que su max_running: sus barreras no podrían completarse.
+    
+    Profiles en una consulta, ejecuciones en un INSERT (un commit) y
+    envío concurrente agrupado por computadora. A los agentes que anuncian
+    créditos las ejecuciones se les entregan por el dispatcher a medida que
+    tienen capacidad.
     """
     
     service = WarmingScriptService(db)
@@ -128,6 +145,9 @@ async def execute_batch_warming(
     if not script:
         raise HTTPException(status_code=404, detail="Script not found")
     
+    # ✅ Los comandos llevan solo el hash; el cuerpo viaja una vez por agente
+    script_hash = script_bodies.register(script.id, script.actions)
+    
     # 2. Obtener profiles y agrupar por computadora
     from app.services.profile_service import ProfileService
     
@@ -136,8 +156,10 @@ async def execute_batch_warming(
     profiles_by_computer = {}  # {computer_id: [profiles]}
     profile_map = {}  # {profile_id: profile_obj}
     
+    found_profiles = await profile_service.get_profiles_by_ids(request.profile_ids)
+    
     for profile_id in request.profile_ids:
-        profile = await profile_service.get_profile(profile_id)
+        profile = found_profiles.get(profile_id)
         if not profile:
             logger.warning(f"Profile {profile_id} not found, skipping")
             continue
@@ -162,11 +184,22 @@ async def execute_batch_warming(
     logger.info(f"Connected agents: {connected_agents}")
     logger.info(f"Profiles distribution: {[(cid, len(ps)) for cid, ps in profiles_by_computer.items()]}")
     
+    # ✅ Batch sincronizado: barrera en Redis antes de cada acción
+    sync = None
+    if request.synchronized:
+        sync = {
+            "batch_id": f"batch_{request.script_id}_{uuid.uuid4().hex[:12]}",
+            "participants": sum(
+                len(ps) for cid, ps in profiles_by_computer.items() if cid in connected_agents
+            ),
+            "timeout": request.barrier_timeout
+        }
+    
     # 4. Crear ejecuciones y distribuir
-    executions = []
     warnings = []
-    profiles_executed = 0
     profiles_skipped = 0
+    online_profiles = {}  # {computer_id: [profiles]}
+    over_capacity = []  # Sincronizado: agentes que no pueden correr todos sus profiles a la vez
     
     for computer_id, profiles in profiles_by_computer.items():
         
@@ -178,33 +211,78 @@ async def execute_batch_warming(
             profiles_skipped += len(profiles)
             continue
         
-        # ✅ Computadora ONLINE - Crear ejecuciones
-        for profile in profiles:
-            # Crear ejecución en DB
-            execution = await service.create_execution(
-                script_id=request.script_id,
-                profile_id=profile.id,
-                computer_id=profile.computer_id
-            )
-            
-            executions.append(execution.id)
-            profiles_executed += 1
-            
-            # ✅ Enviar comando al agente
-            success = await connection_manager.execute_warming(
-                computer_id=profile.computer_id,
-                execution_id=execution.id,
-                profile_id=profile.adspower_id,  # Usar adspower_id
-                script_actions=script.actions
-            )
-            
+        # ✅ Agente saturado: las ejecuciones quedarán en su cola de admisión
+        queue_depth = connection_manager.get_agent_queue_depth(computer_id)
+        if queue_depth:
+            warning_msg = f"⚠️ Computer {computer_id} has {queue_depth} executions queued - new ones will wait"
+            warnings.append(warning_msg)
+            logger.warning(warning_msg)
+        
+        # ✅ Sincronizado: si el agente no puede correr todos a la vez, las barreras vencerán
+        if sync:
+            admission = (connection_manager.get_agent_state(computer_id) or {}).get("admission") or {}
+            max_running = admission.get("max_running")
+            if max_running and len(profiles) > max_running:
+                over_capacity.append(
+                    f"Computer {computer_id} runs at most {max_running} executions at once "
+                    f"({len(profiles)} synchronized profiles)"
+                )
+        
+        online_profiles[computer_id] = profiles
+    
+    if over_capacity:
+        raise HTTPException(
+            status_code=400,
+            detail="Synchronized batch exceeds agent capacity: " + "; ".join(over_capacity)
+        )
+    
+    # ✅ Todas las ejecuciones en un INSERT ... RETURNING (un commit, incluye uso del script)
+    targets = [
+        (profile.id, computer_id)
+        for computer_id, profiles in online_profiles.items()
+        for profile in profiles
+    ]
+    executions = await service.create_executions(request.script_id, targets)
+    profiles_executed = len(executions)
+    
+    # 5. ✅ Enviar comandos: concurrente entre computadoras, en orden dentro de cada una
+    execution_ids = iter(executions)
+    dispatch_plan = {
+        computer_id: [
+            {
+                "execution_id": next(execution_ids),
+                "profile_id": profile.adspower_id,  # Usar adspower_id
+                "script_hash": script_hash,
+                "script_id": script.id,
+                "sync": sync
+            }
+            for profile in profiles
+        ]
+        for computer_id, profiles in online_profiles.items()
+    }
+    
+    async def dispatch(computer_id: int, planned: list) -> int:
+        # ✅ Agente con créditos: cola en el orquestador, se envía según capacidad
+        if await warming_dispatcher.accepts_credits(computer_id):
+            await warming_dispatcher.submit(computer_id, planned)
+            logger.info(f"✓ {len(planned)} executions queued for Computer {computer_id} (credit-based)")
+            return len(planned)
+        
+        sent = 0
+        for item in planned:
+            success = await connection_manager.execute_warming(computer_id=computer_id, **item)
             if success:
-                logger.info(f"✓ Warming command sent: Computer {profile.computer_id}, Profile {profile.id}")
-            else:
-                logger.error(f"✗ Failed to send warming command: Computer {profile.computer_id}")
+                sent += 1
+        
+        if sent < len(planned):
+            logger.error(f"✗ Failed to send {len(planned) - sent}/{len(planned)} warming commands: Computer {computer_id}")
+        else:
+            logger.info(f"✓ Warming commands sent: Computer {computer_id}, {sent} profiles")
+        return sent
     
-    # 5. Incrementar uso del script
-    await service.increment_script_usage(request.script_id)
+    await asyncio.gather(*(
+        dispatch(computer_id, planned) for computer_id, planned in dispatch_plan.items()
+    ))
     
     # 6. ✅ Construir respuesta con información detallada
     message = f"Warming started for {profiles_executed}/{len(request.profile_ids)} profiles"
@@ -219,17 +297,27 @@ async def execute_batch_warming(
         executions=executions
     )
 
-@router.get("/executions/{execution_id}")
+@router.get("/executions/{execution_id}", response_model=WarmingExecutionDetailResponse)
 async def get_execution(
     execution_id: int,
+    events_limit: int = Query(100, ge=1, le=1000),
+    after: Optional[int] = Query(None, description="Cursor: next_cursor de la página anterior"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Obtiene estado de ejecución."""
+    """Obtiene estado de ejecución con una página de su log de eventos."""
     service = WarmingScriptService(db)
     execution = await service.get_execution(execution_id)
     if not execution:
         raise HTTPException(status_code=404, detail="Execution not found")
-    return execution
+    
+    events, next_cursor = await service.get_execution_events(
+        execution_id, limit=events_limit, after_id=after
+    )
+    return WarmingExecutionDetailResponse(
+        **execution.model_dump(),
+        events=events,
+        next_cursor=next_cursor
+    )
 
 @router.post("/executions/{execution_id}/stop", status_code=200)
 async def stop_execution(
@@ -242,7 +330,10 @@ async def stop_execution(
     if not execution:
         raise HTTPException(status_code=404, detail="Execution not found")
     
-    if connection_manager.is_connected(execution.computer_id):
+    # Si seguía en la cola del dispatcher nunca llegó al agente
+    queued = await warming_dispatcher.cancel(execution.computer_id, execution_id)
+    
+    if not queued and connection_manager.is_connected(execution.computer_id):
         await connection_manager.stop_warming(
             computer_id=execution.computer_id,
             execution_id=execution_id
@@ -274,6 +365,7 @@ async def get_agents_status():
         computers, _ = await computer_service.list_computers(limit=1000)
         
         connected_agents = connection_manager.get_connected_agents()
+        send_queues = connection_manager.get_send_queue_stats()
         
         agents_status = []
         
@@ -290,6 +382,7 @@ async def get_agents_status():
                 "connected": is_connected,
                 "status": "online" if is_connected else "offline",
                 "state": state or {},
+                "send_queue": send_queues.get(computer.id),
                 "ip_address": computer.ip_address,
                 "max_profiles": computer.max_profiles,
                 "current_profiles": computer.current_profiles
@@ -302,6 +395,22 @@ async def get_agents_status():
             "agents": agents_status
         }
 
+@router.get("/barriers/metrics")
+async def get_barrier_metrics():
+    """Métricas de barreras: skew de llegadas y tiempo de espera"""
+    return await warming_sync_manager.get_metrics()
+
+@router.get("/dispatcher/metrics")
+async def get_dispatcher_metrics():
+    """Ejecuciones en cola y créditos por computadora"""
+    return await warming_dispatcher.get_metrics()
+
+@router.get("/agents/selectors")
+async def get_learned_selectors():
+    """Selectores aprendidos por los agentes (por dominio)"""
+    selectors = await selector_catalog.export()
+    return {"total": len(selectors), "selectors": selectors}
+
 @router.post("/agents/{computer_id}/status")
 async def request_agent_status(computer_id: int):
     """Solicita estado de agente."""
@@ -315,6 +424,84 @@ async def request_agent_status(computer_id: int):
 # WEBSOCKET ENDPOINT (sin cambios mayores)
 # =====================================================
 
+EXECUTION_EVENT_TYPES = {
+    "execution_progress",
+    "execution_progress_batch",
+    "execution_completed",
+    "execution_failed",
+}
+
+
+def _apply_execution_event(message: dict):
+    """Pasa un evento de ejecución del agente al agregador de progreso"""
+    message_type = message.get("type")
+    
+    if message_type == "execution_progress":
+        # ✅ Buffer en memoria: se persiste en lote, no por mensaje
+        execution_progress_aggregator.add(
+            execution_id=message.get("execution_id"),
+            status=ExecutionStatus.RUNNING,
+            progress=message.get("progress"),
+            log_entry=message.get("log_entry")
+        )
+    
+    elif message_type == "execution_progress_batch":
+        # ✅ Frame coalescido del agente: varias entradas de una ejecución
+        execution_id = message.get("execution_id")
+        for log_entry in message.get("log_entries", []):
+            completed = log_entry.get("completed")
+            if completed is True:
+                status = ExecutionStatus.COMPLETED
+            elif completed is False:
+                status = ExecutionStatus.FAILED
+            else:
+                status = ExecutionStatus.RUNNING
+    
+            execution_progress_aggregator.add(
+                execution_id=execution_id,
+                status=status,
+                progress=100 if status == ExecutionStatus.COMPLETED else message.get("progress"),
+                log_entry=log_entry,
+                error=log_entry.get("error") if status == ExecutionStatus.FAILED else None
+            )
+    
+    elif message_type == "execution_completed":
+        execution_progress_aggregator.add(
+            execution_id=message.get("execution_id"),
+            status=ExecutionStatus.COMPLETED,
+            progress=100,
+            log_entry=message.get("result", {})
+        )
+    
+    elif message_type == "execution_failed":
+        error = message.get("error")
+        execution_progress_aggregator.add(
+            execution_id=message.get("execution_id"),
+            status=ExecutionStatus.FAILED,
+            log_entry={"error": error},
+            error=error
+        )
+
+
+async def _resolve_script_body(script_hash: str, script_id: Optional[int]) -> Optional[List[dict]]:
+    """Cuerpo del script por hash (si no está en memoria se carga por script_id)"""
+    actions = script_bodies.get(script_hash)
+    if actions is not None or not script_id:
+        return actions
+    
+    from app.database import AsyncSessionLocal
+    
+    async with AsyncSessionLocal() as db:
+        script = await WarmingScriptService(db).get_script(script_id)
+    
+    # El script pudo editarse desde el envío: solo sirve si el hash coincide
+    if not script or script_content_hash(script.actions) != script_hash:
+        return None
+    
+    script_bodies.register(script.id, script.actions)
+    return script.actions
+
+
 @router.websocket("/ws/{computer_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -324,7 +511,17 @@ async def websocket_endpoint(
     
     await connection_manager.connect(websocket, computer_id)
     
-    from app.database import AsyncSessionLocal
+    # ✅ Selectores aprendidos por otros agentes (sin catálogo el agente arranca en frío)
+    try:
+        selectors = await selector_catalog.export()
+    except Exception as e:
+        logger.error(f"Selector catalog unavailable for computer {computer_id}: {e}")
+        selectors = []
+    if selectors:
+        await connection_manager.send_message(computer_id, {
+            "type": "selector_cache_seed",
+            "entries": selectors
+        })
     
     try:
         while True:
@@ -335,56 +532,65 @@ async def websocket_endpoint(
             
             if message_type == "heartbeat":
                 connection_manager.last_activity[computer_id] = datetime.utcnow()
-                await websocket.send_json({"type": "heartbeat_ack"})
+                if "queue_depth" in message:
+                    state = connection_manager.get_agent_state(computer_id) or {}
+                    admission = {**(state.get("admission") or {}), "queue_depth": message["queue_depth"]}
+                    connection_manager.update_agent_admission(computer_id, admission)
+                if "telemetry" in message:
+                    connection_manager.update_agent_telemetry(computer_id, message["telemetry"])
+                if "credits" in message:
+                    await warming_dispatcher.update_credits(computer_id, message["credits"], message.get("received", 0))
+                await connection_manager.send_message(computer_id, {"type": "heartbeat_ack"})
             
             elif message_type == "status_update":
                 connection_manager.update_agent_state(computer_id, message.get("state", {}))
             
-            elif message_type == "execution_progress":
-                execution_id = message.get("execution_id")
-                progress = message.get("progress")
-                log_entry = message.get("log_entry")
-                
-                async with AsyncSessionLocal() as db:
-                    service = WarmingScriptService(db)
-                    await service.update_execution_status(
-                        execution_id=execution_id,
-                        status="running",
-                        progress=progress,
-                        log_entry=log_entry
-                    )
+            elif message_type == "admission_update":
+                connection_manager.update_agent_admission(computer_id, message.get("admission", {}))
+                if "credits" in message:
+                    await warming_dispatcher.update_credits(computer_id, message["credits"], message.get("received", 0))
             
-            elif message_type == "execution_completed":
-                execution_id = message.get("execution_id")
-                result = message.get("result", {})
-                
-                async with AsyncSessionLocal() as db:
-                    service = WarmingScriptService(db)
-                    await service.update_execution_status(
-                        execution_id=execution_id,
-                        status="completed",
-                        progress=100,
-                        log_entry=result
-                    )
+            elif message_type == "selector_cache_export":
+                await selector_catalog.merge(computer_id, message.get("entries", []))
             
-            elif message_type == "execution_failed":
-                execution_id = message.get("execution_id")
-                error = message.get("error")
+            elif message_type == "barrier_arrive":
+                sync = message.get("sync") or {}
+                await warming_sync_manager.arrive(
+                    batch_id=sync.get("batch_id"),
+                    action_index=message.get("action_index"),
+                    execution_id=message.get("execution_id"),
+                    computer_id=computer_id,
+                    total_participants=sync.get("participants", 1),
+                    timeout=sync.get("timeout", 60)
+                )
+            
+            elif message_type == "script_request":
+                script_hash = message.get("script_hash")
+                actions = await _resolve_script_body(script_hash, message.get("script_id"))
+                await connection_manager.send_script_body(computer_id, script_hash, actions)
+            
+            elif message_type == "outbox_batch":
+                # ✅ Eventos del outbox del agente: en orden y una sola vez por secuencia
+                epoch = message.get("epoch")
+                last_seq = 0
+                for event in message.get("messages", []):
+                    seq = event.get("seq", 0)
+                    if connection_manager.accept_seq(computer_id, seq, epoch):
+                        _apply_execution_event(event)
+                    last_seq = max(last_seq, seq)
                 
-                async with AsyncSessionLocal() as db:
-                    service = WarmingScriptService(db)
-                    await service.update_execution_status(
-                        execution_id=execution_id,
-                        status="failed",
-                        log_entry={"error": error}
-                    )
+                if last_seq:
+                    execution_progress_aggregator.ack_after_flush(computer_id, last_seq, epoch)
+            
+            elif message_type in EXECUTION_EVENT_TYPES:
+                _apply_execution_event(message)
             
             else:
                 logger.warning(f"Unknown message type: {message_type}")
     
     except WebSocketDisconnect:
-        connection_manager.disconnect(computer_id)
+        connection_manager.disconnect(computer_id, websocket)
         logger.info(f"Agent disconnected: Computer {computer_id}")
     except Exception as e:
         logger.error(f"WebSocket error for computer {computer_id}: {e}")
-        connection_manager.disconnect(computer_id)
+        connection_manager.disconnect(computer_id, websocket)
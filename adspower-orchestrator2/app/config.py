@@ -29,6 +29,16 @@ class Settings(BaseSettings):
     # AdsPower
     ADSPOWER_DEFAULT_API_URL: str = "http://local.adspower.net:50325"
     ADSPOWER_DEFAULT_API_KEY: Optional[str] = None
+    ADSPOWER_TIMEOUT: float = 30.0
+    ADSPOWER_POOL_MAX_CONNECTIONS: int = 20
+    ADSPOWER_POOL_MAX_KEEPALIVE: int = 10
+    ADSPOWER_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    ADSPOWER_MAX_CONCURRENCY: int = 3
+    ADSPOWER_REQUESTS_PER_SECOND: float = 2.0
+    BROWSER_READY_TIMEOUT: float = 30.0
+    
+    # Bulk profiles
+    PROFILE_BULK_BATCH_SIZE: int = 25
     
     # SOAX
     SOAX_USERNAME: str
@@ -36,6 +46,12 @@ class Settings(BaseSettings):
     SOAX_HOST: str = "proxy.soax.com"
     SOAX_PORT: int = 5000
     
+    # Proxy health checks
+    PROXY_CHECK_CONCURRENCY: int = 20
+    PROXY_CHECK_TIMEOUT: float = 10.0
+    PROXY_CHECK_DEADLINE: float = 120.0
+    PROXY_PROBE_STRATEGY: str = "race"  # race | sequential
+    
     # 3X-UI
     USE_3XUI: bool = False
     THREEXUI_PANEL_URL: Optional[str] = None
@@ -45,6 +61,32 @@ class Settings(BaseSettings):
     # Monitoring
     ENABLE_METRICS: bool = True
     HEALTH_CHECK_INTERVAL: int = 300
+    COMPUTER_STATUS_DEBOUNCE_SECONDS: float = 2.0
+    COMPUTER_STATUS_RECONCILE_INTERVAL: int = 300
+    
+    # Warming progress
+    PROGRESS_FLUSH_INTERVAL_MS: int = 500
+    PROGRESS_FLUSH_MAX_MESSAGES: int = 200
+    WARMING_EVENTS_RETENTION_DAYS: int = 90
+    WARMING_EVENTS_PARTITIONS_AHEAD: int = 2
+    
+    # Agent registry (varios workers/réplicas de la API comparten conexiones vía Redis)
+    AGENT_REGISTRY_ENABLED: bool = True
+    NODE_ID: Optional[str] = None  # por defecto hostname-pid-random
+    AGENT_OWNER_TTL: int = 90
+    AGENT_REGISTRY_SYNC_INTERVAL: float = 2.0
+    
+    # Cola de envío por agente (telemetría descarta lo más viejo; comandos: block | fail)
+    AGENT_SEND_QUEUE_SIZE: int = 256
+    AGENT_COMMAND_OVERFLOW: str = "block"
+    AGENT_SEND_BLOCK_TIMEOUT: float = 5.0
+    AGENT_SEND_TIMEOUT: float = 10.0
+    
+    # Despacho por créditos (segundos antes de repartir la cola de un agente caído)
+    DISPATCH_REDISTRIBUTE_DELAY: float = 10.0
+    
+    # Catálogo de selectores aprendidos (se olvidan tras este TTL sin aciertos)
+    SELECTOR_CATALOG_TTL: int = 604800  # segundos (7 días)
     
     # Backup
     BACKUP_ENABLED: bool = True
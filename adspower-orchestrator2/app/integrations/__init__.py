@@ -1,8 +1,14 @@
 # app/integrations/__init__.py
-from app.integrations.adspower_client import AdsPowerClient
+from app.integrations.adspower_client import (
+    AdsPowerClient,
+    AdsPowerClientRegistry,
+    adspower_registry
+)
 from app.integrations.soax_client import SOAXClient
 
 __all__ = [
     "AdsPowerClient",
+    "AdsPowerClientRegistry",
+    "adspower_registry",
     "SOAXClient",
 ]
\ No newline at end of file
@@ -1,4 +1,5 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import httpx
 from loguru import logger
 
@@ -6,10 +7,17 @@ from loguru import logger
 class AdsPowerClient:
     """Cliente para interactuar con AdsPower API"""
     
-    def __init__(self, api_url: str, api_key: str):
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
         self.api_url = api_url.rstrip('/')
         self.api_key = api_key
         self.timeout = 30.0
+        # Cliente compartido (keep-alive) provisto por AdsPowerClientRegistry
+        self.http_client = http_client
     
     def _get_headers(self) -> Dict[str, str]:
         """Genera headers con Bearer token"""
@@ -30,16 +38,25 @@ class AdsPowerClient:
         headers = self._get_headers()
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.request(
+            if self.http_client is not None:
+                response = await self.http_client.request(
                     method=method,
                     url=url,
                     headers=headers,
                     params=params,
                     json=data
                 )
-                response.raise_for_status()
-                return response.json()
+            else:
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    response = await client.request(
+                        method=method,
+                        url=url,
+                        headers=headers,
+                        params=params,
+                        json=data
+                    )
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPStatusError as e:
             logger.error(f"AdsPower API error: {e.response.status_code} - {e.response.text}")
             raise Exception(f"AdsPower API error: {e.response.status_code}")
@@ -148,3 +165,87 @@ class AdsPowerClient:
             return {"status": "inactive"}
         
         return result["data"]
+
+
+class AdsPowerClientRegistry:
+    """
+    Registro de clientes AdsPower con un pool keep-alive por instancia
+    
+    Mantiene un httpx.AsyncClient por (api_url, api_key) para reutilizar
+    conexiones TCP entre llamadas en lugar de abrir una por request.
+    """
+    
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 30.0
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        
+        # (api_url, api_key) -> httpx.AsyncClient
+        self._clients: Dict[Tuple[str, str], httpx.AsyncClient] = {}
+        
+        # Loop en el que se crearon los clientes (Celery usa un loop por tarea)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def get_client(self, api_url: str, api_key: str) -> AdsPowerClient:
+        """Obtiene un AdsPowerClient que usa el pool compartido de la instancia"""
+        loop = asyncio.get_running_loop()
+        
+        if self._loop is not loop:
+            # Los pools de otro loop no se pueden reutilizar
+            if self._clients:
+                logger.debug("AdsPower registry: event loop changed, discarding stale pools")
+            self._clients = {}
+            self._loop = loop
+        
+        key = (api_url.rstrip('/'), api_key)
+        http_client = self._clients.get(key)
+        
+        if http_client is None or http_client.is_closed:
+            http_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._clients[key] = http_client
+            logger.debug(f"AdsPower pool created for {key[0]}")
+        
+        return AdsPowerClient(api_url, api_key, http_client=http_client)
+    
+    async def close_all(self):
+        """Cierra todos los pools abiertos"""
+        clients = list(self._clients.values())
+        self._clients = {}
+        self._loop = None
+        
+        for http_client in clients:
+            try:
+                await http_client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing AdsPower pool: {e}")
+        
+        if clients:
+            logger.info(f"AdsPower registry closed ({len(clients)} pools)")
+    
+    def get_pool_count(self) -> int:
+        """Cantidad de pools abiertos"""
+        return len(self._clients)
+
+
+def _build_registry() -> AdsPowerClientRegistry:
+    from app.config import settings
+    
+    return AdsPowerClientRegistry(
+        max_connections=settings.ADSPOWER_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.ADSPOWER_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.ADSPOWER_POOL_KEEPALIVE_EXPIRY,
+        timeout=settings.ADSPOWER_TIMEOUT
+    )
+
+
+# Instancia global
+adspower_registry = _build_registry()
@@ -1,11 +1,78 @@
 # app/integrations/soax_client.py
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import asyncio
 import httpx
 import random
 import string
+import time
 from loguru import logger
 
 
+# Servicios para detectar la IP de salida del proxy
+TEST_SERVICES = [
+    {
+        "name": "ipify",
+        "url": "https://api.ipify.org?format=json",
+        "geo": False,
+        "parser": lambda d: {"ip": d.get("ip")}
+    },
+    {
+        "name": "ip-api",
+        "url": "http://ip-api.com/json/",
+        "geo": True,
+        "parser": lambda d: {
+            "ip": d.get("query"),
+            "country": d.get("countryCode"),
+            "city": d.get("city"),
+            "isp": d.get("isp")
+        }
+    },
+    {
+        "name": "httpbin",
+        "url": "https://httpbin.org/ip",
+        "geo": False,
+        "parser": lambda d: {"ip": d.get("origin")}
+    }
+]
+
+
+class _TTLCache:
+    """Cache LRU con expiración (en proceso)"""
+    
+    def __init__(self, ttl_seconds: float, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+    
+    def get(self, key: str):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        
+        self._items.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value):
+        self._items[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+# IP -> {country, city, isp}
+_geo_cache = _TTLCache(ttl_seconds=6 * 3600)
+# proxy_url -> última IP detectada (sesiones sticky)
+_session_ips = _TTLCache(ttl_seconds=3600)
+# servicio -> métricas acumuladas
+_probe_stats: Dict[str, Dict] = {}
+
+
 class SOAXClient:
     """Cliente para configurar proxies SOAX"""
     
@@ -14,12 +81,14 @@ class SOAXClient:
         username: str,
         password: str,
         host: str = "proxy.soax.com",
-        port: int = 5000
+        port: int = 5000,
+        probe_strategy: str = "race"
     ):
         self.username = username
         self.password = password
         self.host = host
         self.port = port
+        self.probe_strategy = probe_strategy
     
     def get_proxy_config(
         self,
@@ -64,75 +133,206 @@ class SOAXClient:
     async def test_proxy(
         self,
         proxy_config: Dict,
-        timeout: float = 10.0
+        timeout: float = 10.0,
+        strategy: Optional[str] = None
     ) -> Dict:
-        """Prueba un proxy usando múltiples servicios"""
+        """
+        Prueba un proxy usando múltiples servicios
+        
+        strategy:
+            - "race": consulta los servicios en paralelo y usa la primera
+              respuesta válida (cancela el resto)
+            - "sequential": uno tras otro, cada uno con el timeout completo
+        """
+        strategy = strategy or self.probe_strategy
         proxy_url = self._get_proxy_url(proxy_config)
         
-        # Intentar con diferentes servicios
-        test_services = [
-            {
-                "url": "https://api.ipify.org?format=json",
-                "parser": lambda r: {"ip": r.json().get("ip")}
-            },
-            {
-                "url": "http://ip-api.com/json/",
-                "parser": lambda r: {
-                    "ip": r.json().get("query"),
-                    "country": r.json().get("countryCode"),
-                    "city": r.json().get("city"),
-                    "isp": r.json().get("isp")
-                }
-            },
-            {
-                "url": "https://httpbin.org/ip",
-                "parser": lambda r: {"ip": r.json().get("origin")}
+        # ✅ Un solo pool por URL de proxy, compartido entre los servicios de prueba
+        async with httpx.AsyncClient(
+            proxies={"http://": proxy_url, "https://": proxy_url},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=2)
+        ) as client:
+            if strategy == "race":
+                # Si ya conocemos el geo de la IP de esta sesión sticky, no hace falta ip-api
+                last_ip = _session_ips.get(proxy_url)
+                skip_geo = last_ip is not None and _geo_cache.get(last_ip) is not None
+                services = [s for s in TEST_SERVICES if not (skip_geo and s["geo"])]
+                
+                data, probe = await self._race_services(client, services)
+                
+                if data is None and skip_geo:
+                    # Los servicios solo-IP fallaron: reintentar con ip-api
+                    geo_services = [s for s in TEST_SERVICES if s["geo"]]
+                    data, geo_probe = await self._race_services(client, geo_services)
+                    probe["service"] = geo_probe["service"]
+                    probe["timings_ms"].update(geo_probe["timings_ms"])
+                    probe["errors"].update(geo_probe["errors"])
+            else:
+                data, probe = await self._sequential_services(client, TEST_SERVICES)
+        
+        self._record_probe(probe)
+        
+        if not data:
+            # Si todos los servicios fallaron
+            return {
+                "success": False,
+                "ip": None,
+                "country": None,
+                "city": None,
+                "isp": None,
+                "response_time_ms": 0,
+                "error": "All test services failed",
+                "probe": probe
             }
-        ]
         
-        start_time = None
+        ip = data.get("ip")
+        _session_ips.set(proxy_url, ip)
         
-        for service in test_services:
-            try:
-                import time
-                start_time = time.time()
+        if data.get("country") or data.get("isp"):
+            _geo_cache.set(ip, {k: data.get(k) for k in ("country", "city", "isp")})
+        else:
+            data.update(await self._lookup_geo(ip, timeout))
+        
+        return {
+            "success": True,
+            "ip": ip,
+            "country": data.get("country"),
+            "city": data.get("city"),
+            "isp": data.get("isp"),
+            "response_time_ms": probe["timings_ms"][probe["service"]],
+            "error": None,
+            "probe": probe
+        }
+    
+    async def _probe_service(self, client: httpx.AsyncClient, service: Dict) -> Dict:
+        """Consulta un servicio y retorna sus datos parseados"""
+        response = await client.get(service["url"])
+        response.raise_for_status()
+        
+        data = service["parser"](response.json())
+        if not data.get("ip"):
+            raise ValueError("No IP in response")
+        
+        return data
+    
+    async def _timed_probe(self, client: httpx.AsyncClient, service: Dict, probe: Dict) -> Dict:
+        """Probe que registra latencia y error por servicio"""
+        start_time = time.perf_counter()
+        try:
+            return await self._probe_service(client, service)
+        except Exception as e:
+            probe["errors"][service["name"]] = str(e) or type(e).__name__
+            raise
+        finally:
+            probe["timings_ms"][service["name"]] = round((time.perf_counter() - start_time) * 1000, 2)
+    
+    async def _race_services(self, client: httpx.AsyncClient, services: List[Dict]) -> Tuple[Optional[Dict], Dict]:
+        """Lanza todos los servicios a la vez y se queda con el primero válido"""
+        probe = {"strategy": "race", "service": None, "timings_ms": {}, "errors": {}}
+        
+        tasks = {
+            asyncio.create_task(self._timed_probe(client, service, probe)): service
+            for service in services
+        }
+        pending = set(tasks)
+        data = None
+        
+        try:
+            while pending and data is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
                 
-                async with httpx.AsyncClient(
-                    proxies={"http://": proxy_url, "https://": proxy_url},
-                    timeout=timeout
-                ) as client:
-                    response = await client.get(service["url"])
-                    response.raise_for_status()
-                    
-                    end_time = time.time()
-                    response_time = (end_time - start_time) * 1000
-                    
-                    # Parsear respuesta
-                    data = service["parser"](response)
-                    
-                    return {
-                        "success": True,
-                        "ip": data.get("ip"),
-                        "country": data.get("country"),
-                        "city": data.get("city"),
-                        "isp": data.get("isp"),
-                        "response_time_ms": round(response_time, 2),
-                        "error": None
-                    }
-                    
+                for task in done:
+                    if task.exception() is None and data is None:
+                        data = task.result()
+                        probe["service"] = tasks[task]["name"]
+                    elif task.exception() is not None:
+                        logger.debug(f"Service {tasks[task]['url']} failed: {task.exception()}")
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        # Los cancelados no cuentan como latencia medida
+        for task in pending:
+            probe["timings_ms"][tasks[task]["name"]] = None
+            probe["errors"].pop(tasks[task]["name"], None)
+        
+        return data, probe
+    
+    async def _sequential_services(self, client: httpx.AsyncClient, services: List[Dict]) -> Tuple[Optional[Dict], Dict]:
+        """Intenta los servicios uno tras otro"""
+        probe = {"strategy": "sequential", "service": None, "timings_ms": {}, "errors": {}}
+        
+        for service in services:
+            try:
+                data = await self._timed_probe(client, service, probe)
+                probe["service"] = service["name"]
+                return data, probe
             except Exception as e:
                 logger.debug(f"Service {service['url']} failed: {str(e)}")
                 continue
         
-        # Si todos los servicios fallaron
+        return None, probe
+    
+    async def _lookup_geo(self, ip: str, timeout: float) -> Dict:
+        """Geo/ISP de una IP (cacheado por IP, consulta directa sin proxy)"""
+        cached = _geo_cache.get(ip)
+        if cached is not None:
+            return cached
+        
+        try:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                response = await client.get(f"http://ip-api.com/json/{ip}")
+                response.raise_for_status()
+                payload = response.json()
+            
+            geo = {
+                "country": payload.get("countryCode"),
+                "city": payload.get("city"),
+                "isp": payload.get("isp")
+            }
+            _geo_cache.set(ip, geo)
+            return geo
+        
+        except Exception as e:
+            logger.debug(f"Geo lookup failed for {ip}: {e}")
+            return {}
+    
+    @staticmethod
+    def _record_probe(probe: Dict):
+        """Acumula estadísticas por servicio para tuning"""
+        for name, elapsed in probe["timings_ms"].items():
+            stats = _probe_stats.setdefault(
+                name,
+                {"wins": 0, "failures": 0, "cancelled": 0, "samples": 0, "total_ms": 0.0}
+            )
+            
+            if elapsed is None:
+                stats["cancelled"] += 1
+                continue
+            
+            if name in probe["errors"]:
+                stats["failures"] += 1
+            else:
+                stats["samples"] += 1
+                stats["total_ms"] += elapsed
+            
+            if name == probe["service"]:
+                stats["wins"] += 1
+    
+    @staticmethod
+    def get_probe_stats() -> Dict[str, Dict]:
+        """Estadísticas de los servicios de prueba (victorias, fallos, latencia media)"""
         return {
-            "success": False,
-            "ip": None,
-            "country": None,
-            "city": None,
-            "isp": None,
-            "response_time_ms": 0,
-            "error": "All test services failed"
+            name: {
+                "wins": stats["wins"],
+                "failures": stats["failures"],
+                "cancelled": stats["cancelled"],
+                "avg_response_time_ms": round(stats["total_ms"] / stats["samples"], 2) if stats["samples"] else None
+            }
+            for name, stats in _probe_stats.items()
         }
     
     def _get_proxy_url(self, proxy_config: Dict) -> str:
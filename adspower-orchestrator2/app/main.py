@@ -30,56 +30,36 @@ background_tasks = set()
 
 async def auto_health_check_loop():
     """
-    ✅ Loop automático de health check cada 60 segundos
+    ✅ Reconciliación periódica de status de computadoras
     
-    Verifica:
-    - Qué computadoras están conectadas vía WebSocket
-    - Actualiza status en DB: ONLINE si conectada, OFFLINE si no
+    Las transiciones ONLINE/OFFLINE llegan por eventos de ConnectionManager
+    al ComputerStatusWriter. Este loop solo corrige desajustes (p.ej. tras
+    un reinicio): una query liviana que retorna únicamente las computadoras
+    cuyo status en DB no coincide con la conexión WebSocket.
     """
     from app.database import AsyncSessionLocal
-    from app.services.computer_service import ComputerService
+    from app.repositories.computer_repository import ComputerRepository
+    from app.services.computer_status_sync import computer_status_writer
     from app.websocket.manager import connection_manager
-    from app.models.computer import ComputerStatus
     
     logger.info("🏥 Auto health check loop started")
     
     while True:
         try:
-            await asyncio.sleep(60)  # Cada 60 segundos
+            await asyncio.sleep(settings.COMPUTER_STATUS_RECONCILE_INTERVAL)
+            
+            connected_agents = connection_manager.get_connected_agents()
             
             async with AsyncSessionLocal() as db:
-                computer_service = ComputerService(db)
-                
-                # Obtener todas las computadoras
-                computers, _ = await computer_service.list_computers(limit=1000)
-                
-                connected_agents = connection_manager.get_connected_agents()
-                
-                for computer in computers:
-                    is_connected = computer.id in connected_agents
-                    
-                    # ✅ Actualizar status según conexión
-                    new_status = ComputerStatus.ONLINE if is_connected else ComputerStatus.OFFLINE
-                    
-                    if computer.status != new_status:
-                        from app.schemas.computer import ComputerUpdate
-                        
-                        await computer_service.update_computer(
-                            computer.id,
-                            ComputerUpdate(status=new_status)
-                        )
-                        
-                        status_emoji = "🟢" if is_connected else "🔴"
-                        logger.info(
-                            f"{status_emoji} Computer {computer.id} ({computer.name}): "
-                            f"{computer.status} -> {new_status}"
-                        )
-                
-                online_count = len(connected_agents)
-                total_count = len(computers)
-                logger.debug(
-                    f"Health check: {online_count}/{total_count} computers online"
-                )
+                mismatches = await ComputerRepository(db).get_status_mismatches(connected_agents)
+            
+            for computer_id, expected_status in mismatches:
+                computer_status_writer.record(computer_id, expected_status)
+            
+            if mismatches:
+                logger.info(f"Status reconciliation: {len(mismatches)} computers out of sync")
+            
+            logger.debug(f"Health check: {len(connected_agents)} computers online")
         
         except asyncio.CancelledError:
             logger.info("Auto health check stopped")
@@ -89,6 +69,40 @@ async def auto_health_check_loop():
             logger.error(f"Auto health check error: {e}")
             await asyncio.sleep(10)
 
+async def warming_events_maintenance_loop():
+    """
+    ✅ Mantenimiento de particiones de warming_execution_events
+    
+    Crea por adelantado las particiones mensuales y elimina las que
+    quedaron fuera de la retención (DROP de partición, sin DELETE masivo).
+    La partición DEFAULT no tiene rango: su retención es por DELETE.
+    """
+    from datetime import datetime, timedelta
+    from app.database import AsyncSessionLocal
+    from app.repositories.warming_event_repository import WarmingEventRepository
+    
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                repo = WarmingEventRepository(db)
+                cutoff = (datetime.utcnow() - timedelta(days=settings.WARMING_EVENTS_RETENTION_DAYS)).date()
+                created = await repo.ensure_partitions(settings.WARMING_EVENTS_PARTITIONS_AHEAD)
+                dropped = await repo.drop_partitions_before(cutoff)
+                pruned = await repo.prune_default_before(cutoff)
+                await db.commit()
+            
+            if created or dropped or pruned:
+                logger.info(f"Warming event partitions: created={created} dropped={dropped} default_pruned={pruned}")
+            
+            await asyncio.sleep(24 * 3600)
+        
+        except asyncio.CancelledError:
+            break
+        
+        except Exception as e:
+            logger.error(f"Warming events maintenance error: {e}")
+            await asyncio.sleep(3600)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle events"""
@@ -102,13 +116,40 @@ async def lifespan(app: FastAPI):
     logger.info("✓ Database initialized")
     
     # ✅ Iniciar warming sync manager
-    from app.services.warming_sync import WarmingSyncManager
-    warming_sync_manager = WarmingSyncManager()
+    from app.services.warming_sync import warming_sync_manager
     await warming_sync_manager.start()
     logger.info("✓ Warming sync manager started")
     
-    # Iniciar heartbeat monitor para WebSocket
+    # ✅ Sincronización de status por eventos de conexión
+    from app.services.computer_status_sync import computer_status_writer
     from app.websocket.manager import connection_manager
+    connection_manager.add_status_listener(computer_status_writer.record_connection)
+    await computer_status_writer.start()
+    logger.info("✓ Computer status writer started")
+    
+    # ✅ Agregador de progreso de ejecuciones (escrituras en lote)
+    from app.services.execution_progress import execution_progress_aggregator
+    execution_progress_aggregator.ack_sender = connection_manager.send_outbox_ack
+    await execution_progress_aggregator.start()
+    logger.info("✓ Execution progress aggregator started")
+    
+    # ✅ Despacho de ejecuciones según créditos de cada agente
+    from app.services.warming_dispatcher import warming_dispatcher
+    warming_dispatcher.sender = connection_manager.execute_warming
+    connection_manager.add_status_listener(warming_dispatcher.on_connection)
+    await warming_dispatcher.start()
+    logger.info("✓ Warming dispatcher started")
+    
+    # ✅ Registro compartido de agentes (varios workers/réplicas)
+    if settings.AGENT_REGISTRY_ENABLED:
+        from app.websocket.registry import AgentRegistry
+        await connection_manager.start_registry(
+            AgentRegistry(settings.REDIS_URL, settings.NODE_ID, settings.AGENT_OWNER_TTL),
+            sync_interval=settings.AGENT_REGISTRY_SYNC_INTERVAL
+        )
+        logger.info("✓ Agent registry started")
+    
+    # Iniciar heartbeat monitor para WebSocket
     heartbeat_task = asyncio.create_task(connection_manager.heartbeat_monitor())
     background_tasks.add(heartbeat_task)
     logger.info("✓ WebSocket heartbeat monitor started")
@@ -118,6 +159,10 @@ async def lifespan(app: FastAPI):
     background_tasks.add(health_check_task)
     logger.info("✓ Auto health check started")
     
+    # ✅ Particiones del log de ejecuciones
+    maintenance_task = asyncio.create_task(warming_events_maintenance_loop())
+    background_tasks.add(maintenance_task)
+    
     yield
     
     # Shutdown
@@ -130,6 +175,17 @@ async def lifespan(app: FastAPI):
     await asyncio.gather(*background_tasks, return_exceptions=True)
     
     await warming_sync_manager.stop()
+    await warming_dispatcher.stop()
+    await computer_status_writer.stop()
+    await execution_progress_aggregator.stop()
+    await connection_manager.stop_registry()
+    
+    from app.services.selector_catalog import selector_catalog
+    await selector_catalog.close()
+    
+    # ✅ Cerrar pools HTTP de AdsPower
+    from app.integrations.adspower_client import adspower_registry
+    await adspower_registry.close_all()
     logger.info("✓ Shutdown complete")
 
 # Create FastAPI app
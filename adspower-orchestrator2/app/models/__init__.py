@@ -7,6 +7,7 @@ from app.models.health_check import HealthCheck
 from app.models.warming_script import (
     WarmingScript,
     WarmingExecution,
+    WarmingExecutionEvent,
     AgentConnection,
     ActionType,
     ScriptStatus,
@@ -28,6 +29,7 @@ __all__ = [
     "HealthCheck",
     "WarmingScript",
     "WarmingExecution",
+    "WarmingExecutionEvent",
     "AgentConnection",
     "ActionType",
     "ScriptStatus",
@@ -1,5 +1,5 @@
 # app/models/warming_script.py
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, JSON, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, JSON, ForeignKey, Text, Index, Identity, DDL, event, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -94,7 +94,7 @@ class WarmingExecution(Base):
     # Resultados
     actions_completed = Column(Integer, default=0)
     actions_failed = Column(Integer, default=0)
-    execution_log = Column(JSON, default=list)  # Log detallado de cada acción
+    execution_log = Column(JSON, default=list)  # Legacy: el log vive en warming_execution_events
     error_message = Column(Text)
     screenshots = Column(JSON, default=list)  # URLs de screenshots
     
@@ -112,6 +112,34 @@ class WarmingExecution(Base):
     profile = relationship("Profile")
     computer = relationship("Computer")
 
+class WarmingExecutionEvent(Base):
+    """Log append-only por acción de una ejecución (particionado por mes)"""
+    __tablename__ = "warming_execution_events"
+    __table_args__ = (
+        Index('ix_warming_execution_events_execution_action', 'execution_id', 'action_index'),
+        Index('ix_warming_execution_events_execution_id_id', 'execution_id', 'id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+    
+    # La clave de partición debe formar parte de la PK
+    id = Column(BigInteger, Identity(), primary_key=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    
+    execution_id = Column(Integer, ForeignKey("warming_executions.id", ondelete="CASCADE"), nullable=False)
+    action_index = Column(Integer)  # None para eventos que no son de una acción
+    event_type = Column(String(50), nullable=False)  # action, progress, completed, failed, cancelled
+    payload = Column(JSON)
+
+# Partición DEFAULT para filas fuera de los rangos mensuales (create_all / backfill)
+event.listen(
+    WarmingExecutionEvent.__table__,
+    'after_create',
+    DDL(
+        "CREATE TABLE IF NOT EXISTS warming_execution_events_default "
+        "PARTITION OF warming_execution_events DEFAULT"
+    ).execute_if(dialect='postgresql')
+)
+
 class AgentConnection(Base):
     """Estado de conexión de agentes (Computadoras B)"""
     __tablename__ = "agent_connections"
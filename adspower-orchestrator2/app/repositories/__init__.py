@@ -4,6 +4,7 @@ from app.repositories.computer_repository import ComputerRepository
 from app.repositories.proxy_repository import ProxyRepository
 from app.repositories.profile_repository import ProfileRepository
 from app.repositories.task_repository import TaskRepository
+from app.repositories.warming_event_repository import WarmingEventRepository
 
 __all__ = [
     "BaseRepository",
@@ -11,4 +12,5 @@ __all__ = [
     "ProxyRepository",
     "ProfileRepository",
     "TaskRepository",
+    "WarmingEventRepository",
 ]
\ No newline at end of file
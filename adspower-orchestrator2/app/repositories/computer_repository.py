@@ -1,6 +1,6 @@
 # app/repositories/computer_repository.py
-from typing import Optional, List
-from sqlalchemy import select, func
+from typing import Optional, List, Dict, Tuple, Iterable
+from sqlalchemy import select, func, update, values, column, cast, false, Integer, DateTime
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.base import BaseRepository
 from app.models.computer import Computer, ComputerStatus
@@ -34,6 +34,64 @@ class ComputerRepository(BaseRepository[Computer]):
         """Actualiza last_seen_at"""
         return await self.update(id, {'last_seen_at': datetime.utcnow()})
     
+    async def bulk_update_status(self, changes: Dict[int, Tuple[ComputerStatus, datetime]]) -> int:
+        """
+        Aplica transiciones de status en un solo UPDATE ... FROM (VALUES ...)
+        
+        Solo escribe las filas cuyo status realmente cambia.
+        """
+        if not changes:
+            return 0
+        
+        status_type = Computer.__table__.c.status.type
+        changes_table = values(
+            column('id', Integer),
+            column('status', status_type),
+            column('seen_at', DateTime(timezone=True)),
+            name='changes'
+        ).data([
+            (computer_id, status, seen_at)
+            for computer_id, (status, seen_at) in changes.items()
+        ])
+        
+        stmt = (
+            update(Computer)
+            .where(
+                Computer.id == changes_table.c.id,
+                Computer.status.is_distinct_from(cast(changes_table.c.status, status_type))
+            )
+            .values(
+                status=cast(changes_table.c.status, status_type),
+                last_seen_at=changes_table.c.seen_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+        
+        result = await self.db.execute(stmt)
+        await self.db.flush()
+        return result.rowcount
+    
+    async def get_status_mismatches(self, connected_ids: Iterable[int]) -> List[Tuple[int, ComputerStatus]]:
+        """
+        Computers cuyo status en DB no coincide con la conexión WebSocket
+        
+        Retorna (computer_id, status_esperado) sin cargar filas completas.
+        """
+        connected_ids = list(connected_ids)
+        is_connected = Computer.id.in_(connected_ids) if connected_ids else false()
+        
+        result = await self.db.execute(
+            select(Computer.id, is_connected.label('connected')).where(
+                (is_connected & Computer.status.is_distinct_from(ComputerStatus.ONLINE)) |
+                (~is_connected & (Computer.status == ComputerStatus.ONLINE))
+            )
+        )
+        
+        return [
+            (row.id, ComputerStatus.ONLINE if row.connected else ComputerStatus.OFFLINE)
+            for row in result.all()
+        ]
+    
     async def increment_profiles(self, id: int, count: int = 1) -> bool:
         """Incrementa contador de perfiles"""
         computer = await self.get(id)
@@ -1,6 +1,9 @@
 # app/repositories/proxy_repository.py
-from typing import Optional, List
-from sqlalchemy import select, func, and_
+from typing import Optional, List, Tuple
+from sqlalchemy import (
+    select, func, and_, not_, update, values, column, case, cast, literal, false,
+    Integer, Boolean
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.base import BaseRepository
 from app.models.proxy import Proxy, ProxyType, ProxyStatus
@@ -45,39 +48,88 @@ class ProxyRepository(BaseRepository[Proxy]):
     
     async def update_health_check(self, id: int, check_result: dict) -> bool:
         """Actualiza métricas de health check"""
-        proxy = await self.get(id)
-        if not proxy:
-            return False
+        return await self.bulk_update_health_checks([(id, check_result)]) > 0
+    
+    async def bulk_update_health_checks(self, checks: List[Tuple[int, dict]]) -> int:
+        """
+        Aplica N resultados de health check en un solo statement
+        
+        UPDATE proxies ... FROM (VALUES ...) con contadores calculados en SQL
+        (total_checks = total_checks + 1), atómico frente a checkers concurrentes.
+        """
+        if not checks:
+            return 0
         
-        total_checks = proxy.total_checks + 1
-        failed_checks = proxy.failed_checks + (0 if check_result['success'] else 1)
-        success_rate = ((total_checks - failed_checks) / total_checks) * 100
+        # Un resultado por proxy (UPDATE ... FROM solo aplica una fila por id)
+        by_id = {proxy_id: check_result for proxy_id, check_result in checks}
         
-        update_data = {
-            'last_check_at': datetime.utcnow(),
-            'total_checks': total_checks,
-            'failed_checks': failed_checks,
-            'success_rate': success_rate,
+        columns = Proxy.__table__.c
+        column_types = {
+            'id': Integer(),
+            'success': Boolean(),
+            'ip': columns.detected_ip.type,
+            'country': columns.detected_country.type,
+            'city': columns.detected_city.type,
+            'isp': columns.detected_isp.type,
+            'response_time': columns.avg_response_time.type
         }
+        checks_table = values(
+            *(column(name, type_) for name, type_ in column_types.items()),
+            name='checks'
+        ).data([
+            (
+                proxy_id,
+                bool(check_result['success']),
+                check_result.get('ip'),
+                check_result.get('country'),
+                check_result.get('city'),
+                check_result.get('isp'),
+                check_result.get('response_time_ms')
+            )
+            for proxy_id, check_result in by_id.items()
+        ])
         
-        if check_result['success']:
-            update_data.update({
-                'last_success_at': datetime.utcnow(),
-                'status': ProxyStatus.ACTIVE,
-                'detected_ip': check_result.get('ip'),
-                'detected_country': check_result.get('country'),
-                'detected_city': check_result.get('city'),
-                'detected_isp': check_result.get('isp'),
-                'avg_response_time': check_result.get('response_time_ms')
-            })
-        else:
-            # Si falla 3 veces seguidas, marcar como failed
-            if failed_checks >= 3:
-                update_data['status'] = ProxyStatus.FAILED
-                update_data['is_available'] = False
+        # Cast explícito: una columna del VALUES toda en NULL Postgres la resuelve como text
+        checks = {name: cast(checks_table.c[name], type_) for name, type_ in column_types.items()}
+        
+        success = checks['success']
+        total_checks = func.coalesce(Proxy.total_checks, 0) + 1
+        failed_checks = func.coalesce(Proxy.failed_checks, 0) + case((success, 0), else_=1)
+        now = func.now()
+        
+        # Si falla 3 veces, marcar como failed
+        is_failing = and_(not_(success), failed_checks >= 3)
+        
+        def on_success(value, current):
+            return case((success, value), else_=current)
+        
+        stmt = (
+            update(Proxy)
+            .where(Proxy.id == checks['id'])
+            .values(
+                last_check_at=now,
+                total_checks=total_checks,
+                failed_checks=failed_checks,
+                success_rate=(total_checks - failed_checks) * 100.0 / total_checks,
+                last_success_at=on_success(now, Proxy.last_success_at),
+                status=case(
+                    (success, literal(ProxyStatus.ACTIVE, columns.status.type)),
+                    (is_failing, literal(ProxyStatus.FAILED, columns.status.type)),
+                    else_=Proxy.status
+                ),
+                is_available=case((is_failing, false()), else_=Proxy.is_available),
+                detected_ip=on_success(checks['ip'], Proxy.detected_ip),
+                detected_country=on_success(checks['country'], Proxy.detected_country),
+                detected_city=on_success(checks['city'], Proxy.detected_city),
+                detected_isp=on_success(checks['isp'], Proxy.detected_isp),
+                avg_response_time=on_success(checks['response_time'], Proxy.avg_response_time)
+            )
+            .execution_options(synchronize_session=False)
+        )
         
-        await self.update(id, update_data)
-        return True
+        result = await self.db.execute(stmt)
+        await self.db.flush()
+        return result.rowcount
     
     async def increment_usage(self, id: int) -> bool:
         """Incrementa contador de uso"""
@@ -90,7 +142,7 @@ class ProxyRepository(BaseRepository[Proxy]):
             return True
         return False
     
-    async def get_needing_check(self, minutes: int = 5) -> List[Proxy]:
+    async def get_needing_check(self, minutes: int = 5, limit: int = 50) -> List[Proxy]:
         """Obtiene proxies que necesitan health check"""
         threshold = datetime.utcnow() - timedelta(minutes=minutes)
         
@@ -100,7 +152,7 @@ class ProxyRepository(BaseRepository[Proxy]):
                     Proxy.is_available == True,
                     (Proxy.last_check_at.is_(None) | (Proxy.last_check_at < threshold))
                 )
-            ).limit(50)
+            ).limit(limit)
         )
         return list(result.scalars().all())
     
@@ -0,0 +1,170 @@
+# app/repositories/warming_event_repository.py
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import date, datetime
+from sqlalchemy import select, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.repositories.base import BaseRepository
+from app.models.warming_script import WarmingExecutionEvent, ExecutionStatus
+
+PARTITION_PREFIX = "warming_execution_events_y"
+DEFAULT_PARTITION = "warming_execution_events_default"
+EVENT_COLUMNS = "id, created_at, execution_id, action_index, event_type, payload"
+
+
+def _month_start(value: date, offset: int = 0) -> date:
+    """Primer día del mes desplazado `offset` meses"""
+    month_index = value.year * 12 + (value.month - 1) + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Nombre de la partición mensual (p.ej. warming_execution_events_y2024m01)"""
+    return f"{PARTITION_PREFIX}{month.year}m{month.month:02d}"
+
+
+def event_type_for(status: ExecutionStatus, action_index: Optional[int] = None) -> str:
+    """event_type del log: completed, failed, cancelled, action o progress"""
+    status = ExecutionStatus(status)
+    if status in (ExecutionStatus.COMPLETED, ExecutionStatus.FAILED, ExecutionStatus.CANCELLED):
+        return status.value
+    return 'action' if action_index is not None else 'progress'
+
+
+class WarmingEventRepository(BaseRepository[WarmingExecutionEvent]):
+    """Repositorio para el log de eventos de ejecuciones"""
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(WarmingExecutionEvent, db)
+
+    async def add_many(self, events: List[Dict[str, Any]]) -> int:
+        """Inserta eventos en un solo INSERT multi-fila"""
+        if not events:
+            return 0
+        await self.db.execute(insert(WarmingExecutionEvent), events)
+        return len(events)
+
+    async def get_page(
+        self,
+        execution_id: int,
+        limit: int = 100,
+        after_id: Optional[int] = None
+    ) -> Tuple[List[WarmingExecutionEvent], Optional[int]]:
+        """
+        Página de eventos de una ejecución con cursor por ID
+
+        Retorna (eventos, next_cursor); next_cursor es None en la última página.
+        """
+        query = select(WarmingExecutionEvent).where(
+            WarmingExecutionEvent.execution_id == execution_id
+        )
+        if after_id is not None:
+            query = query.where(WarmingExecutionEvent.id > after_id)
+
+        result = await self.db.execute(
+            query.order_by(WarmingExecutionEvent.id.asc()).limit(limit + 1)
+        )
+        events = list(result.scalars().all())
+
+        if len(events) > limit:
+            events = events[:limit]
+            return events, events[-1].id
+        return events, None
+
+    async def ensure_partitions(self, months_ahead: int = 2, today: Optional[date] = None) -> List[str]:
+        """Crea las particiones mensuales del mes actual y los siguientes"""
+        today = today or datetime.utcnow().date()
+        created = []
+
+        for offset in range(months_ahead + 1):
+            start = _month_start(today, offset)
+            end = _month_start(today, offset + 1)
+            name = partition_name(start)
+
+            exists = await self.db.scalar(text("SELECT to_regclass(:name)"), {"name": name})
+            if exists:
+                continue
+
+            if await self._default_has_rows(start, end):
+                await self._create_from_default(name, start, end)
+            else:
+                await self.db.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF warming_execution_events "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+            created.append(name)
+
+        return created
+
+    async def _default_has_rows(self, start: date, end: date) -> bool:
+        """La partición DEFAULT tiene filas del rango (el mes no tenía partición al insertarlas)"""
+        if not await self.db.scalar(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}):
+            return False
+        return bool(await self.db.scalar(
+            text(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+                f"WHERE created_at >= :start AND created_at < :end)"
+            ),
+            {"start": start, "end": end}
+        ))
+
+    async def _create_from_default(self, name: str, start: date, end: date):
+        """
+        Crea la partición de un mes que ya tiene filas en DEFAULT
+
+        Con esas filas en DEFAULT el CREATE ... PARTITION OF falla: se
+        desengancha DEFAULT, se crea la partición, se mueven las filas y se
+        vuelve a enganchar (todo en la transacción de la sesión).
+        """
+        await self.db.execute(text(
+            f"ALTER TABLE warming_execution_events DETACH PARTITION {DEFAULT_PARTITION}"
+        ))
+        await self.db.execute(text(
+            f"CREATE TABLE {name} PARTITION OF warming_execution_events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+        await self.db.execute(
+            text(
+                f"WITH moved AS ("
+                f"DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE created_at >= :start AND created_at < :end "
+                f"RETURNING {EVENT_COLUMNS}) "
+                f"INSERT INTO {name} ({EVENT_COLUMNS}) SELECT {EVENT_COLUMNS} FROM moved"
+            ),
+            {"start": start, "end": end}
+        )
+        await self.db.execute(text(
+            f"ALTER TABLE warming_execution_events ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"
+        ))
+
+    async def drop_partitions_before(self, cutoff: date) -> List[str]:
+        """Elimina particiones mensuales cuyo rango termina antes de cutoff"""
+        result = await self.db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'warming_execution_events'"
+        ))
+
+        dropped = []
+        for (name,) in result.all():
+            if not name.startswith(PARTITION_PREFIX):
+                continue
+
+            year, month = name[len(PARTITION_PREFIX):].split('m')
+            end = _month_start(date(int(year), int(month), 1), 1)
+
+            if end <= cutoff:
+                await self.db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped.append(name)
+
+        return dropped
+
+    async def prune_default_before(self, cutoff: date) -> int:
+        """Retención de la partición DEFAULT (backfill o meses sin partición): DELETE por fecha"""
+        if not await self.db.scalar(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}):
+            return 0
+        result = await self.db.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"),
+            {"cutoff": cutoff}
+        )
+        return result.rowcount
@@ -39,6 +39,8 @@ from app.schemas.warming_script import (
     WarmingScriptResponse,
     WarmingExecutionCreate,
     WarmingExecutionResponse,
+    WarmingExecutionEventResponse,
+    WarmingExecutionDetailResponse,
     BatchWarmingRequest,
     BatchWarmingResponse
 )
@@ -73,6 +75,8 @@ __all__ = [
     "WarmingScriptResponse",
     "WarmingExecutionCreate",
     "WarmingExecutionResponse",
+    "WarmingExecutionEventResponse",
+    "WarmingExecutionDetailResponse",
     "BatchWarmingRequest",
     "BatchWarmingResponse",
 ]
\ No newline at end of file
@@ -63,4 +63,5 @@ class ProxyTestResponse(BaseModel):
     city: Optional[str]
     isp: Optional[str]
     response_time_ms: Optional[float]
-    error: Optional[str]
\ No newline at end of file
+    error: Optional[str]
+    probe: Optional[Dict[str, Any]] = None  # servicio ganador y latencias por servicio
@@ -120,12 +120,29 @@ class WarmingExecutionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class WarmingExecutionEventResponse(BaseModel):
+    id: int
+    action_index: Optional[int]
+    event_type: str
+    payload: Optional[Dict[str, Any]]
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class WarmingExecutionDetailResponse(WarmingExecutionResponse):
+    """Ejecución + una página de su log de eventos"""
+    events: List[WarmingExecutionEventResponse] = []
+    next_cursor: Optional[int] = None
+
 class BatchWarmingRequest(BaseModel):
     """Ejecutar warming en múltiples profiles"""
     script_id: int
     profile_ids: List[int] = Field(..., min_items=1, max_items=100)
     max_parallel: int = Field(default=5, ge=1, le=20)
     computer_ids: Optional[List[int]] = None  # Computers específicas
+    synchronized: bool = False  # Barrera antes de cada acción (todos los profiles a la vez)
+    barrier_timeout: int = Field(default=60, ge=5, le=600)
 
 class BatchWarmingResponse(BaseModel):
     task_id: str
@@ -2,17 +2,21 @@
 from app.services.computer_service import ComputerService
 from app.services.proxy_service import ProxyService
 from app.services.profile_service import ProfileService
+from app.services.bulk_profile_service import BulkProfileService
 from app.services.task_service import TaskService
 from app.services.health_service import HealthService
 from app.services.automation_service import AutomationService
 from app.services.warming_sync import warming_sync_manager
+from app.services.warming_dispatcher import warming_dispatcher
 
 __all__ = [
     "ComputerService",
     "ProxyService",
     "ProfileService",
+    "BulkProfileService",
     "TaskService",
     "HealthService",
     "AutomationService",
     "warming_sync_manager",
+    "warming_dispatcher",
 ]
\ No newline at end of file
@@ -4,11 +4,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.profile_repository import ProfileRepository
 from app.repositories.computer_repository import ComputerRepository
 from app.integrations.adspower_client import AdsPowerClient
+from app.utils.browser_readiness import wait_for_devtools, browser_readiness
+from app.config import settings
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import TimeoutException
 import time
 import random
 import threading
@@ -85,6 +89,33 @@ class HumanBehavior:
     @staticmethod
     def typing_speed():
         return random.uniform(0.05, 0.15)
+    
+    @staticmethod
+    def keystroke_delays(text: str) -> List[float]:
+        """Pausa tras cada tecla: más larga en espacios y alguna pausa ocasional"""
+        delays = []
+        for char in text:
+            delay = HumanBehavior.typing_speed()
+            if char == " ":
+                delay += random.uniform(0.05, 0.2)
+            elif random.random() < 0.05:
+                delay += random.uniform(0.2, 0.6)
+            delays.append(delay)
+        return delays
+    
+    @staticmethod
+    def type_text(driver, text: str):
+        """
+        Tipeo humano en un solo round-trip
+        
+        Arma una secuencia W3C Actions (keyDown/keyUp + pausa por tecla) y
+        la envía en una sola llamada; los tiempos los aplica el navegador
+        y los eventos de teclado son reales, sobre el elemento con foco.
+        """
+        chain = ActionChains(driver)
+        for char, delay in zip(text, HumanBehavior.keystroke_delays(text)):
+            chain.send_keys(char).pause(delay)
+        chain.perform()
 
 class AutomationService:
     """Servicio para automatización de navegadores"""
@@ -266,6 +297,11 @@ class AutomationService:
             
             debug_port = result['data']['debug_port']
             
+            # ✅ Esperar a DevTools con backoff (sin sleep fijo)
+            ready_seconds = wait_for_devtools(debug_port, timeout=settings.BROWSER_READY_TIMEOUT)
+            browser_readiness.record(profile.computer_id, ready_seconds)
+            logger.debug(f"[{profile.adspower_id}] DevTools ready in {ready_seconds * 1000:.0f}ms")
+            
             # Conectar Selenium
             chrome_options = Options()
             chrome_options.add_experimental_option("debuggerAddress", f"127.0.0.1:{debug_port}")
@@ -311,7 +347,7 @@ class AutomationService:
             # Si no hay handles, crear uno
             if not all_handles:
                 driver.execute_script("window.open('about:blank');")
-                time.sleep(1)
+                WebDriverWait(driver, 5, poll_frequency=0.1).until(lambda d: d.window_handles)
                 all_handles = driver.window_handles
             
             # Cerrar pestañas extra
@@ -334,12 +370,16 @@ class AutomationService:
             for attempt in range(3):
                 try:
                     driver.get("https://www.google.com")
-                    time.sleep(2)
                     
-                    current_url = driver.current_url
-                    if "google" in current_url.lower():
+                    # driver.get ya espera el load; solo confirmar la URL
+                    try:
+                        WebDriverWait(driver, 5, poll_frequency=0.1).until(
+                            lambda d: "google" in d.current_url.lower()
+                        )
                         logger.info(f"[{profile_id}] Browser ready")
                         return True
+                    except TimeoutException:
+                        pass
                     
                     if attempt < 2:
                         time.sleep(1)
@@ -419,14 +459,10 @@ class AutomationService:
             except:
                 pass
             
-            for i, char in enumerate(search_query):
-                current_text = search_query[:i+1]
-                try:
-                    driver.execute_script(f"arguments[0].value = '{current_text}';", search_box)
-                    driver.execute_script("arguments[0].dispatchEvent(new Event('input', { bubbles: true }));", search_box)
-                except:
-                    break
-                time.sleep(behavior.typing_speed())
+            try:
+                behavior.type_text(driver, search_query)
+            except Exception as e:
+                logger.warning(f"[{profile_id}] Typing interrupted: {e}")
             
             # PASO 4: Submit
             if not barriers['submit'].wait(timeout=30):
@@ -0,0 +1,224 @@
+# app/services/bulk_profile_service.py
+"""
+Creación masiva concurrente de perfiles
+
+Reparte las creaciones en AdsPower entre computadoras con asyncio, respetando
+límites de concurrencia y de requests/segundo por instancia de AdsPower, y
+persiste los perfiles creados en lotes.
+"""
+import asyncio
+from itertools import cycle
+from typing import AsyncIterator, Dict, List, Optional, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from loguru import logger
+
+from app.config import settings
+from app.models.computer import Computer
+from app.models.proxy import Proxy
+from app.models.profile import Profile
+from app.schemas.profile import ProfileCreate
+from app.integrations.adspower_client import adspower_registry
+from app.repositories.proxy_repository import ProxyRepository
+from app.services.profile_service import ProfileService
+from app.utils.rate_limiter import AsyncRateLimiter
+
+
+class BulkProfileService:
+    """Servicio para creación masiva de perfiles"""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        max_concurrency: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.db = db
+        self.max_concurrency = max_concurrency or settings.ADSPOWER_MAX_CONCURRENCY
+        self.requests_per_second = requests_per_second or settings.ADSPOWER_REQUESTS_PER_SECOND
+        self.batch_size = batch_size or settings.PROFILE_BULK_BATCH_SIZE
+
+        # api_url -> AsyncRateLimiter (una instancia de AdsPower por URL)
+        self._limiters: Dict[str, AsyncRateLimiter] = {}
+
+    async def assign_proxies(
+        self,
+        profiles_in: List[ProfileCreate],
+        proxy_type: Optional[str] = None,
+        country: Optional[str] = None
+    ) -> List[ProfileCreate]:
+        """Asigna proxies disponibles (round-robin) a los perfiles sin proxy_id"""
+        if all(p.proxy_id for p in profiles_in):
+            return profiles_in
+
+        proxies = await ProxyRepository(self.db).get_available(
+            proxy_type=proxy_type,
+            country=country
+        )
+        if not proxies:
+            raise ValueError(f"No available proxies for type={proxy_type} country={country}")
+
+        proxy_ids = cycle([proxy.id for proxy in proxies])
+
+        return [
+            p if p.proxy_id else p.model_copy(update={"proxy_id": next(proxy_ids)})
+            for p in profiles_in
+        ]
+
+    async def create_profiles(self, profiles_in: List[ProfileCreate]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Crea perfiles de forma concurrente y emite un resultado por perfil
+
+        Los fallos se emiten en cuanto ocurren; los éxitos se emiten tras
+        persistir su lote, de modo que todo lo emitido ya está en la DB.
+        Si el consumidor aborta, no se inician más creaciones y lo que ya
+        se creó en AdsPower se persiste igual.
+        """
+        computers = await self._load_by_ids(Computer, {p.computer_id for p in profiles_in})
+        proxies = await self._load_by_ids(Proxy, {p.proxy_id for p in profiles_in if p.proxy_id})
+
+        aborted = asyncio.Event()
+        tasks = [
+            asyncio.create_task(self._create_one(index, profile_in, computers, proxies, aborted))
+            for index, profile_in in enumerate(profiles_in)
+        ]
+
+        pending: List[Dict[str, Any]] = []
+        # Índices ya recibidos de as_completed
+        seen = set()
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                seen.add(result['index'])
+
+                if not result['success']:
+                    yield self._to_output(result)
+                    continue
+
+                pending.append(result)
+
+                if len(pending) >= self.batch_size:
+                    batch, pending = pending, []
+                    for flushed in await self._flush(batch):
+                        yield flushed
+
+            if pending:
+                batch, pending = pending, []
+                for flushed in await self._flush(batch):
+                    yield flushed
+
+        finally:
+            # Consumidor abortado: las creaciones en vuelo pudieron llegar a
+            # AdsPower, se esperan en lugar de cancelarlas
+            aborted.set()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            pending.extend(
+                result for result in results
+                if isinstance(result, dict) and result['success'] and result['index'] not in seen
+            )
+
+            if pending:
+                await self._flush(pending)
+
+    async def _create_one(
+        self,
+        index: int,
+        profile_in: ProfileCreate,
+        computers: Dict[int, Computer],
+        proxies: Dict[int, Proxy],
+        aborted: asyncio.Event
+    ) -> Dict[str, Any]:
+        """Crea un perfil en AdsPower (sin tocar la DB)"""
+        result = {
+            'index': index,
+            'name': profile_in.name,
+            'computer_id': profile_in.computer_id,
+            'success': False,
+            'profile': None,
+            'error': None
+        }
+
+        try:
+            computer = computers.get(profile_in.computer_id)
+            if not computer:
+                raise ValueError(f"Computer {profile_in.computer_id} not found")
+
+            if not profile_in.proxy_id:
+                raise ValueError("proxy_id is required - AdsPower profiles need a proxy")
+
+            proxy = proxies.get(profile_in.proxy_id)
+            if not proxy:
+                raise ValueError(f"Proxy {profile_in.proxy_id} not found")
+
+            adspower_data, profile_config = ProfileService.build_adspower_payload(profile_in, proxy)
+            client = adspower_registry.get_client(computer.adspower_api_url, computer.adspower_api_key)
+
+            async with self._get_limiter(computer.adspower_api_url):
+                if aborted.is_set():
+                    result['error'] = "Aborted before creation"
+                    return result
+                adspower_id = await ProfileService.create_in_adspower(client, adspower_data)
+
+            result['profile'] = ProfileService.build_db_profile(profile_in, profile_config, adspower_id)
+            result['success'] = True
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Bulk profile {index + 1} ({profile_in.name}) failed: {e}")
+            result['error'] = str(e)
+
+        return result
+
+    async def _flush(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Inserta un lote de perfiles en una sola transacción"""
+        profiles: List[Profile] = [r['profile'] for r in results]
+
+        try:
+            self.db.add_all(profiles)
+            await self.db.commit()
+            logger.info(f"Bulk profiles persisted: {len(profiles)}")
+
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(
+                f"Failed to persist {len(profiles)} profiles "
+                f"(adspower_ids={[p.adspower_id for p in profiles]}): {e}"
+            )
+            for r in results:
+                r['success'] = False
+                r['error'] = f"Database error: {e}"
+
+        return [self._to_output(r) for r in results]
+
+    def _get_limiter(self, api_url: str) -> AsyncRateLimiter:
+        """Limiter por instancia de AdsPower"""
+        key = api_url.rstrip('/')
+        if key not in self._limiters:
+            self._limiters[key] = AsyncRateLimiter(
+                max_concurrency=self.max_concurrency,
+                requests_per_second=self.requests_per_second
+            )
+        return self._limiters[key]
+
+    async def _load_by_ids(self, model, ids) -> Dict[int, Any]:
+        """Carga filas por ID en una sola query"""
+        if not ids:
+            return {}
+        result = await self.db.execute(select(model).where(model.id.in_(ids)))
+        return {obj.id: obj for obj in result.scalars().all()}
+
+    @staticmethod
+    def _to_output(result: Dict[str, Any]) -> Dict[str, Any]:
+        profile = result['profile'] if result['success'] else None
+        return {
+            'index': result['index'],
+            'name': result['name'],
+            'computer_id': result['computer_id'],
+            'success': result['success'],
+            'id': profile.id if profile else None,
+            'adspower_id': profile.adspower_id if profile else None,
+            'error': result['error']
+        }
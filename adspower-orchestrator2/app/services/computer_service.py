@@ -2,7 +2,7 @@
 from typing import List, Optional, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.computer_repository import ComputerRepository
-from app.integrations.adspower_client import AdsPowerClient
+from app.integrations.adspower_client import adspower_registry
 from app.models.computer import Computer, ComputerStatus
 from app.schemas.computer import ComputerCreate, ComputerUpdate
 from loguru import logger
@@ -23,7 +23,7 @@ class ComputerService:
             raise ValueError(f"Computer with name '{computer_in.name}' already exists")
         
         # Verificar conexión con AdsPower
-        client = AdsPowerClient(computer_in.adspower_api_url, computer_in.adspower_api_key)
+        client = adspower_registry.get_client(computer_in.adspower_api_url, computer_in.adspower_api_key)
         if not await client.test_connection():
             raise ValueError("Cannot connect to AdsPower API. Check URL and API Key.")
         
@@ -72,7 +72,7 @@ class ComputerService:
             api_url = computer_in.adspower_api_url or computer.adspower_api_url
             api_key = computer_in.adspower_api_key or computer.adspower_api_key
             
-            client = AdsPowerClient(api_url, api_key)
+            client = adspower_registry.get_client(api_url, api_key)
             if not await client.test_connection():
                 raise ValueError("Cannot connect to AdsPower API with provided credentials")
         
@@ -110,7 +110,7 @@ class ComputerService:
             raise ValueError(f"Computer {computer_id} not found")
         
         # Verificar conexión AdsPower
-        client = AdsPowerClient(computer.adspower_api_url, computer.adspower_api_key)
+        client = adspower_registry.get_client(computer.adspower_api_url, computer.adspower_api_key)
         
         health = {
             'computer_id': computer_id,
@@ -0,0 +1,118 @@
+# app/services/computer_status_sync.py
+"""
+Sincronización de status de computadoras dirigida por eventos
+
+ConnectionManager emite transiciones ONLINE/OFFLINE al conectar/desconectar
+un agente; este writer las acumula durante una ventana de debounce y las
+persiste todas juntas en un solo UPDATE.
+"""
+import asyncio
+from typing import Dict, Optional, Tuple
+from datetime import datetime
+from loguru import logger
+
+from app.models.computer import ComputerStatus
+
+
+class ComputerStatusWriter:
+    """Writer con debounce para transiciones de status de computadoras"""
+
+    def __init__(self, debounce_seconds: float = 2.0):
+        self.debounce_seconds = debounce_seconds
+
+        # computer_id -> (status, timestamp) — la última transición gana
+        self._pending: Dict[int, Tuple[ComputerStatus, datetime]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, computer_id: int, status: ComputerStatus):
+        """Registra una transición (no bloqueante)"""
+        self._pending[computer_id] = (status, datetime.utcnow())
+        self._wakeup.set()
+
+    def record_connection(self, computer_id: int, connected: bool):
+        """Listener para ConnectionManager"""
+        self.record(
+            computer_id,
+            ComputerStatus.ONLINE if connected else ComputerStatus.OFFLINE
+        )
+
+    def get_pending_count(self) -> int:
+        """Transiciones pendientes de escribir"""
+        return len(self._pending)
+
+    async def start(self):
+        """Inicia el loop de escritura"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Computer status writer started")
+
+    async def stop(self):
+        """Detiene el loop y escribe lo pendiente"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Escribe todas las transiciones pendientes en un solo UPDATE"""
+        if not self._pending:
+            return 0
+
+        from app.database import AsyncSessionLocal
+        from app.repositories.computer_repository import ComputerRepository
+
+        changes, self._pending = self._pending, {}
+
+        try:
+            async with AsyncSessionLocal() as db:
+                updated = await ComputerRepository(db).bulk_update_status(changes)
+                await db.commit()
+
+        except Exception as e:
+            logger.error(f"Computer status flush failed: {e}")
+            # Reencolar sin pisar transiciones más nuevas
+            for computer_id, change in changes.items():
+                self._pending.setdefault(computer_id, change)
+            return 0
+
+        for computer_id, (status, _) in changes.items():
+            status_emoji = "🟢" if status == ComputerStatus.ONLINE else "🔴"
+            logger.info(f"{status_emoji} Computer {computer_id} -> {status.value}")
+
+        logger.debug(f"Computer status flush: {len(changes)} transitions, {updated} rows updated")
+        return updated
+
+    async def _run(self):
+        """Loop: espera transiciones, aplica debounce y escribe"""
+        while True:
+            try:
+                await self._wakeup.wait()
+                await asyncio.sleep(self.debounce_seconds)
+                self._wakeup.clear()
+
+                await self.flush()
+
+                # Si el flush falló, reintentar tras el debounce
+                if self._pending:
+                    self._wakeup.set()
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Computer status writer error: {e}")
+                await asyncio.sleep(self.debounce_seconds)
+
+
+def _build_writer() -> ComputerStatusWriter:
+    from app.config import settings
+    return ComputerStatusWriter(debounce_seconds=settings.COMPUTER_STATUS_DEBOUNCE_SECONDS)
+
+
+# Instancia global
+computer_status_writer = _build_writer()
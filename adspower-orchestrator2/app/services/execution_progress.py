@@ -0,0 +1,205 @@
+# app/services/execution_progress.py
+"""
+Agregador de progreso de ejecuciones de warming
+
+Los mensajes execution_progress / completed / failed de los agentes se
+acumulan en memoria por ejecución y se persisten juntos cada N ms o cada
+N mensajes, en una sola transacción, en lugar de una por mensaje. Los
+eventos del outbox de cada agente se confirman (ack) recién después de
+persistirse.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple
+from loguru import logger
+
+from app.models.warming_script import ExecutionStatus
+from app.repositories.warming_event_repository import event_type_for
+
+
+TERMINAL_STATUSES = {
+    ExecutionStatus.COMPLETED,
+    ExecutionStatus.FAILED,
+    ExecutionStatus.CANCELLED,
+}
+
+
+class ExecutionProgressAggregator:
+    """Buffer de progreso por ejecución con flush periódico"""
+
+    def __init__(self, flush_interval_ms: int = 500, max_buffered_messages: int = 200):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_buffered_messages = max_buffered_messages
+
+        # execution_id -> {'status', 'progress', 'events', 'error'}
+        self._buffers: Dict[int, Dict[str, Any]] = {}
+        self._buffered_messages = 0
+
+        # computer_id -> (epoch, última secuencia del outbox) a confirmar tras el flush
+        self._acks: Dict[int, Tuple[Optional[str], int]] = {}
+        self.ack_sender: Optional[Callable[[int, int, Optional[str]], Awaitable[Any]]] = None
+
+        self._flush_now = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(
+        self,
+        execution_id: int,
+        status: ExecutionStatus,
+        progress: Optional[int] = None,
+        log_entry: Optional[Dict] = None,
+        error: Optional[str] = None
+    ):
+        """Acumula un update de progreso (no bloqueante)"""
+        if execution_id is None:
+            return
+
+        status = ExecutionStatus(status)
+        buffer = self._buffers.setdefault(
+            execution_id,
+            {'status': status, 'progress': None, 'events': [], 'error': None}
+        )
+
+        # Un estado terminal no se pisa con "running" de mensajes atrasados
+        if buffer['status'] not in TERMINAL_STATUSES or status in TERMINAL_STATUSES:
+            buffer['status'] = status
+
+        if progress is not None:
+            buffer['progress'] = progress
+        if log_entry:
+            buffer['events'].append(self._to_event(status, log_entry))
+        if error:
+            buffer['error'] = error
+
+        self._buffered_messages += 1
+
+        # Terminales y buffers llenos se escriben de inmediato
+        if status in TERMINAL_STATUSES or self._buffered_messages >= self.max_buffered_messages:
+            self._flush_now.set()
+
+    def ack_after_flush(self, computer_id: int, seq: int, epoch: Optional[str] = None):
+        """Confirma la secuencia al agente cuando lo recibido hasta ahí esté en DB"""
+        current = self._acks.get(computer_id)
+        # Un epoch nuevo reemplaza al anterior aunque su secuencia sea menor
+        if current is None or current[0] != epoch or seq > current[1]:
+            self._acks[computer_id] = (epoch, seq)
+
+    def get_buffered_count(self) -> int:
+        """Mensajes pendientes de escribir"""
+        return self._buffered_messages
+
+    async def start(self):
+        """Inicia el loop de flush"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Execution progress aggregator started")
+
+    async def stop(self):
+        """Detiene el loop y escribe lo pendiente"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Persiste todos los buffers en una sola transacción"""
+        async with self._lock:
+            if not self._buffers and not self._acks:
+                return 0
+
+            buffers, self._buffers = self._buffers, {}
+            messages, self._buffered_messages = self._buffered_messages, 0
+            acks, self._acks = self._acks, {}
+
+            if buffers:
+                from app.database import AsyncSessionLocal
+                from app.services.warming_script_service import WarmingScriptService
+
+                try:
+                    async with AsyncSessionLocal() as db:
+                        await WarmingScriptService(db).apply_progress_batch(buffers)
+
+                except Exception as e:
+                    logger.error(f"Execution progress flush failed ({len(buffers)} executions): {e}")
+                    self._requeue(buffers, messages)
+                    for computer_id, (epoch, seq) in acks.items():
+                        if computer_id not in self._acks:
+                            self._acks[computer_id] = (epoch, seq)
+                    return 0
+
+                logger.debug(f"Execution progress flush: {messages} messages, {len(buffers)} executions")
+
+            await self._send_acks(acks)
+            return len(buffers)
+
+    async def _send_acks(self, acks: Dict[int, Tuple[Optional[str], int]]):
+        """Envía los acks pendientes (un agente desconectado reenviará)"""
+        if not self.ack_sender:
+            return
+        for computer_id, (epoch, seq) in acks.items():
+            try:
+                await self.ack_sender(computer_id, seq, epoch)
+            except Exception as e:
+                logger.error(f"Outbox ack failed for computer {computer_id}: {e}")
+
+    def _requeue(self, buffers: Dict[int, Dict[str, Any]], messages: int):
+        """Devuelve buffers no escritos delante de los nuevos"""
+        for execution_id, old in buffers.items():
+            new = self._buffers.get(execution_id)
+            if new is None:
+                self._buffers[execution_id] = old
+                continue
+
+            new['events'] = old['events'] + new['events']
+            if new['progress'] is None:
+                new['progress'] = old['progress']
+            if old['status'] in TERMINAL_STATUSES and new['status'] not in TERMINAL_STATUSES:
+                new['status'] = old['status']
+            new['error'] = new['error'] or old['error']
+
+        self._buffered_messages += messages
+
+    @staticmethod
+    def _to_event(status: ExecutionStatus, log_entry: Dict) -> Dict[str, Any]:
+        """Convierte un log_entry del agente en fila de warming_execution_events"""
+        action_index = log_entry.get('action_index') if isinstance(log_entry, dict) else None
+        return {
+            'event_type': event_type_for(status, action_index),
+            'action_index': action_index,
+            'payload': log_entry
+        }
+
+    async def _run(self):
+        """Loop: flush cada flush_interval o antes si se solicita"""
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+                self._flush_now.clear()
+                await self.flush()
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Execution progress aggregator error: {e}")
+                await asyncio.sleep(self.flush_interval)
+
+
+def _build_aggregator() -> ExecutionProgressAggregator:
+    from app.config import settings
+    return ExecutionProgressAggregator(
+        flush_interval_ms=settings.PROGRESS_FLUSH_INTERVAL_MS,
+        max_buffered_messages=settings.PROGRESS_FLUSH_MAX_MESSAGES
+    )
+
+
+# Instancia global
+execution_progress_aggregator = _build_aggregator()
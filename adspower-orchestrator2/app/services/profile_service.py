@@ -7,7 +7,7 @@ from app.models.profile import Profile
 from app.models.computer import Computer
 from app.models.proxy import Proxy
 from app.schemas.profile import ProfileCreate, ProfileUpdate
-from app.integrations.adspower_client import AdsPowerClient
+from app.integrations.adspower_client import AdsPowerClient, adspower_registry
 from app.utils.profile_generator import ProfileGenerator
 
 
@@ -37,6 +37,28 @@ class ProfileService:
         if not proxy:
             raise ValueError(f"Proxy {profile_in.proxy_id} not found")
         
+        # Create profile in AdsPower
+        adspower_client = adspower_registry.get_client(
+            api_url=computer.adspower_api_url,
+            api_key=computer.adspower_api_key
+        )
+        
+        adspower_data, profile_config = self.build_adspower_payload(profile_in, proxy)
+        adspower_id = await self.create_in_adspower(adspower_client, adspower_data)
+        
+        # Create in database
+        db_profile = self.build_db_profile(profile_in, profile_config, adspower_id)
+        
+        self.db.add(db_profile)
+        await self.db.commit()
+        await self.db.refresh(db_profile)
+        
+        return db_profile
+
+    @staticmethod
+    def build_adspower_payload(profile_in: ProfileCreate, proxy: Proxy) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Genera el fingerprint y el payload de AdsPower para un perfil"""
+        
         # Generate profile config
         profile_config = ProfileGenerator.generate_profile(
             name=profile_in.name,
@@ -47,12 +69,6 @@ class ProfileService:
             device_type=profile_in.device_type
         )
         
-        # Create profile in AdsPower
-        adspower_client = AdsPowerClient(
-            api_url=computer.adspower_api_url,
-            api_key=computer.adspower_api_key
-        )
-        
         # Convert screen_resolution format
         screen_res = profile_config.get("screen_resolution", "1920x1080")
         screen_res = screen_res.replace("x", "_")
@@ -102,7 +118,11 @@ class ProfileService:
             "proxy_password": proxy.password or ""
         }
         
-        # Create in AdsPower
+        return adspower_data, profile_config
+
+    @staticmethod
+    async def create_in_adspower(adspower_client: AdsPowerClient, adspower_data: Dict[str, Any]) -> str:
+        """Crea el perfil en AdsPower y retorna su adspower_id"""
         adspower_response = await adspower_client.create_profile(adspower_data)
         
         # Handle response validation
@@ -121,13 +141,19 @@ class ProfileService:
         if not data or "id" not in data:
             raise RuntimeError(f"Invalid AdsPower response: {adspower_response}")
         
-        adspower_id = data["id"]  # ✅ FIX: Usar variable correcta
-        
-        # Create in database
-        db_profile = Profile(
+        return data["id"]
+
+    @staticmethod
+    def build_db_profile(
+        profile_in: ProfileCreate,
+        profile_config: Dict[str, Any],
+        adspower_id: str
+    ) -> Profile:
+        """Construye la fila Profile (sin persistir)"""
+        return Profile(
             computer_id=profile_in.computer_id,
             proxy_id=profile_in.proxy_id,
-            adspower_id=adspower_id,  # ✅ FIX: Campo correcto
+            adspower_id=adspower_id,
             name=profile_in.name,
             age=profile_in.age,
             gender=profile_in.gender,
@@ -152,12 +178,6 @@ class ProfileService:
             status="ready",  # ✅ Cambiar a "ready" ya que se creó exitosamente
             is_warmed=False
         )
-        
-        self.db.add(db_profile)
-        await self.db.commit()
-        await self.db.refresh(db_profile)
-        
-        return db_profile
 
     async def get_profile(self, profile_id: int) -> Optional[Profile]:
         result = await self.db.execute(
@@ -165,6 +185,15 @@ class ProfileService:
         )
         return result.scalar_one_or_none()
 
+    async def get_profiles_by_ids(self, profile_ids: List[int]) -> Dict[int, Profile]:
+        """Profiles existentes de la lista en una sola consulta (id -> profile)"""
+        if not profile_ids:
+            return {}
+        result = await self.db.execute(
+            select(Profile).where(Profile.id.in_(set(profile_ids)))
+        )
+        return {profile.id: profile for profile in result.scalars().all()}
+
     async def list_profiles(
         self,
         computer_id: Optional[int] = None,
@@ -227,7 +256,7 @@ class ProfileService:
         
         if computer:
             try:
-                adspower_client = AdsPowerClient(
+                adspower_client = adspower_registry.get_client(
                     api_url=computer.adspower_api_url,
                     api_key=computer.adspower_api_key
                 )
@@ -1,6 +1,8 @@
 # app/services/proxy_service.py
 from typing import List, Optional, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import time
 from app.repositories.proxy_repository import ProxyRepository
 from app.integrations.soax_client import SOAXClient
 from app.models.proxy import Proxy, ProxyType, ProxyStatus
@@ -18,7 +20,8 @@ class ProxyService:
             username=settings.SOAX_USERNAME,
             password=settings.SOAX_PASSWORD,
             host=settings.SOAX_HOST,
-            port=settings.SOAX_PORT
+            port=settings.SOAX_PORT,
+            probe_strategy=settings.PROXY_PROBE_STRATEGY
         )
     
     async def create_proxy(self, proxy_in: ProxyCreate) -> Proxy:
@@ -120,17 +123,8 @@ class ProxyService:
         if not proxy:
             raise ValueError(f"Proxy {proxy_id} not found")
         
-        # Configurar proxy
-        proxy_config = {
-            'type': 'http',
-            'host': proxy.host,
-            'port': proxy.port,
-            'username': proxy.username,
-            'password': proxy.password
-        }
-        
         # Probar
-        result = await self.soax.test_proxy(proxy_config, timeout=30)
+        result = await self.soax.test_proxy(self._get_test_config(proxy), timeout=30)
         
         # Actualizar health check
         await self.repo.update_health_check(proxy_id, result)
@@ -154,29 +148,92 @@ class ProxyService:
             return proxies[0]
         return None
     
-    async def health_check_batch(self, limit: int = 50) -> Dict:
-        """Health check en batch"""
-        proxies = await self.repo.get_needing_check(minutes=5)
+    async def health_check_batch(
+        self,
+        limit: int = 50,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None
+    ) -> Dict:
+        """
+        Health check en batch (concurrente)
+        
+        Prueba hasta `concurrency` proxies a la vez, corta todo al llegar al
+        `deadline` global y escribe los resultados en un solo UPDATE.
+        """
+        concurrency = concurrency or settings.PROXY_CHECK_CONCURRENCY
+        timeout = timeout or settings.PROXY_CHECK_TIMEOUT
+        deadline = deadline or settings.PROXY_CHECK_DEADLINE
+        
+        proxies = await self.repo.get_needing_check(minutes=5, limit=limit)
         
         results = {
             'total': len(proxies),
             'success': 0,
-            'failed': 0
+            'failed': 0,
+            'timed_out': 0,
+            'duration_seconds': 0
         }
         
-        for proxy in proxies[:limit]:
-            try:
-                result = await self.test_proxy(proxy.id)
-                if result['success']:
-                    results['success'] += 1
-                else:
-                    results['failed'] += 1
-            except Exception as e:
-                logger.error(f"Error checking proxy {proxy.id}: {e}")
+        if not proxies:
+            return results
+        
+        start_time = time.monotonic()
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def _check(proxy: Proxy) -> Dict:
+            async with semaphore:
+                try:
+                    return await self.soax.test_proxy(self._get_test_config(proxy), timeout=timeout)
+                except Exception as e:
+                    logger.error(f"Error checking proxy {proxy.id}: {e}")
+                    return {'success': False, 'error': str(e)}
+        
+        tasks = {asyncio.create_task(_check(proxy)): proxy for proxy in proxies}
+        done, pending = await asyncio.wait(tasks.keys(), timeout=deadline)
+        
+        # ✅ Deadline global: cancelar lo que quede sin registrar resultado
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"Proxy health check deadline ({deadline}s) reached, {len(pending)} proxies not checked")
+        
+        checks = []
+        for task in done:
+            result = task.result()
+            checks.append((tasks[task].id, result))
+            
+            if result['success']:
+                results['success'] += 1
+            else:
                 results['failed'] += 1
         
+        results['timed_out'] = len(pending)
+        
+        await self.repo.bulk_update_health_checks(checks)
+        await self.db.commit()
+        
+        results['duration_seconds'] = round(time.monotonic() - start_time, 2)
+        logger.info(
+            f"Proxy health check: {results['success']}/{results['total']} successful "
+            f"in {results['duration_seconds']}s"
+        )
+        
         return results
     
+    def _get_test_config(self, proxy: Proxy) -> Dict:
+        """Configuración de prueba a partir de un proxy guardado"""
+        return {
+            'type': 'http',
+            'host': proxy.host,
+            'port': proxy.port,
+            'username': proxy.username,
+            'password': proxy.password
+        }
+    
     async def get_stats(self) -> Dict:
         """Obtiene estadísticas de proxies"""
-        return await self.repo.get_stats()
\ No newline at end of file
+        stats = await self.repo.get_stats()
+        stats['probe_services'] = SOAXClient.get_probe_stats()
+        return stats
\ No newline at end of file
@@ -0,0 +1,106 @@
+# app/services/selector_catalog.py
+"""
+Catálogo de selectores aprendidos por los agentes
+
+Cada agente exporta qué selector encontró cada elemento por dominio
+(selector_cache_export). El catálogo los combina y se envía a los agentes
+al conectarse (selector_cache_seed) para que arranquen con la tabla caliente.
+
+Vive en Redis (un HASH compartido por todas las réplicas): un agente
+conectado a cualquier worker recibe lo aprendido por todos.
+"""
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+import redis.asyncio as aioredis
+
+ENTRIES_KEY = "selector_catalog:entries"  # HASH [dominio, grupo, computer_id] -> entrada
+
+
+class SelectorCatalog:
+    """Selectores por (dominio, grupo), combinando lo reportado por cada agente"""
+
+    def __init__(self, redis_url: Optional[str] = None, ttl: float = 7 * 24 * 3600):
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self._client: Optional[aioredis.Redis] = None
+
+    def _get_client(self) -> aioredis.Redis:
+        if self._client is None:
+            if self.redis_url is None:
+                from app.config import settings
+                self.redis_url = settings.REDIS_URL
+            self._client = aioredis.from_url(self.redis_url, decode_responses=True)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def merge(self, computer_id: int, entries: List[Dict]) -> int:
+        """Reemplaza lo reportado por un agente; retorna entradas aceptadas"""
+        accepted = {}
+        for item in entries:
+            try:
+                field = json.dumps([str(item['domain']), str(item['group']), int(computer_id)])
+                accepted[field] = json.dumps({
+                    'selector': str(item['selector']),
+                    'hits': int(item.get('hits', 0)),
+                    'last_hit': float(item.get('last_hit', time.time()))
+                })
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        if accepted:
+            await self._get_client().hset(ENTRIES_KEY, mapping=accepted)
+        return len(accepted)
+
+    async def export(self) -> List[Dict]:
+        """Por (dominio, grupo), el selector con más aciertos sumando agentes"""
+        client = self._get_client()
+        now = time.time()
+
+        # (dominio, grupo) -> selector -> {'hits', 'last_hit'}
+        totals: Dict[Tuple[str, str], Dict[str, Dict]] = {}
+        expired = []
+
+        for field, value in (await client.hgetall(ENTRIES_KEY)).items():
+            try:
+                domain, group, _ = json.loads(field)
+                entry = json.loads(value)
+            except ValueError:
+                expired.append(field)
+                continue
+
+            if now - entry['last_hit'] > self.ttl:
+                expired.append(field)
+                continue
+
+            total = totals.setdefault((domain, group), {}).setdefault(
+                entry['selector'], {'hits': 0, 'last_hit': 0.0}
+            )
+            total['hits'] += entry['hits']
+            total['last_hit'] = max(total['last_hit'], entry['last_hit'])
+
+        if expired:
+            await client.hdel(ENTRIES_KEY, *expired)
+
+        result = []
+        for (domain, group), by_selector in totals.items():
+            selector, best = max(by_selector.items(), key=lambda item: item[1]['hits'])
+            result.append({'domain': domain, 'group': group, 'selector': selector, **best})
+        return result
+
+    async def size(self) -> int:
+        """Entradas guardadas (por dominio, grupo y agente)"""
+        return await self._get_client().hlen(ENTRIES_KEY)
+
+
+def _build_selector_catalog() -> SelectorCatalog:
+    from app.config import settings
+    return SelectorCatalog(ttl=settings.SELECTOR_CATALOG_TTL)
+
+
+# Instancia global
+selector_catalog = _build_selector_catalog()
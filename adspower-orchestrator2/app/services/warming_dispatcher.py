@@ -0,0 +1,422 @@
+# app/services/warming_dispatcher.py
+"""
+Despacho de ejecuciones con control de flujo por créditos
+
+Las ejecuciones de un batch quedan en una cola por computadora y se envían
+solo cuando el agente anuncia créditos libres (según
+MAX_CONCURRENT_EXECUTIONS y su carga). El agente informa además cuántos
+execute_warming recibió en la conexión actual, así los comandos en vuelo
+no se cuentan dos veces. Si el agente se desconecta, lo que seguía en cola
+se reparte entre otras computadoras de la misma cuenta AdsPower.
+
+Las colas viven en Redis (compartidas por todas las réplicas): cualquier
+nodo puede encolar o cancelar, y el nodo owner del socket del agente es el
+que envía cuando hay créditos. Un evento por pub/sub avisa a los nodos que
+una cola recibió trabajo.
+"""
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import redis.asyncio as aioredis
+from loguru import logger
+
+QUEUE_KEY = "warming_dispatch:queue:{computer_id}"  # LIST de execution_ids en orden
+ITEMS_KEY = "warming_dispatch:items:{computer_id}"  # HASH execution_id -> comando
+CREDITS_KEY = "warming_dispatch:credits"  # HASH computer_id -> créditos anunciados
+EVENTS_CHANNEL = "warming_dispatch:events"
+
+# Saca hasta N ejecuciones; los IDs sin item (canceladas) se descartan
+# KEYS: queue, items | ARGV: n
+_TAKE = """
+local out = {}
+while #out < tonumber(ARGV[1]) do
+    local id = redis.call('LPOP', KEYS[1])
+    if not id then break end
+    local item = redis.call('HGET', KEYS[2], id)
+    if item then
+        redis.call('HDEL', KEYS[2], id)
+        table.insert(out, item)
+    end
+end
+return out
+"""
+
+
+class WarmingDispatcher:
+    """Colas por computadora (Redis) + créditos anunciados por cada agente"""
+
+    def __init__(self, redis_url: Optional[str] = None, redistribute_delay: float = 10.0):
+        self.redis_url = redis_url
+        self.redistribute_delay = redistribute_delay
+
+        self._client: Optional[aioredis.Redis] = None
+        self._take_script = None
+        self._listener_task: Optional[asyncio.Task] = None
+
+        # Conexión actual de los agentes de este nodo: créditos anunciados,
+        # comandos recibidos (según el agente) y enviados
+        self._credits: Dict[int, int] = {}
+        self._received: Dict[int, int] = {}
+        self._sent: Dict[int, int] = {}
+
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._background: Set[asyncio.Task] = set()
+
+        # Envío del comando: connection_manager.execute_warming (se asigna en main)
+        self.sender: Optional[Callable[..., Awaitable[bool]]] = None
+
+        self.stats = {'dispatched': 0, 'skipped': 0, 'redistributed': 0}
+
+    def _get_client(self) -> aioredis.Redis:
+        if self._client is None:
+            if self.redis_url is None:
+                from app.config import settings
+                self.redis_url = settings.REDIS_URL
+            self._client = aioredis.from_url(self.redis_url, decode_responses=True)
+            self._take_script = self._client.register_script(_TAKE)
+        return self._client
+
+    async def start(self):
+        """Se suscribe a los avisos de colas con trabajo nuevo"""
+        if self._listener_task is None:
+            self._get_client()
+            self._listener_task = asyncio.create_task(self._listen())
+            logger.info("WarmingDispatcher listening for dispatch events")
+
+    async def stop(self):
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+        for task in list(self._background):
+            task.cancel()
+
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    # ---------- Créditos ----------
+
+    def supports_credits(self, computer_id: int) -> bool:
+        """El agente (conectado a este nodo) anunció créditos en la conexión actual"""
+        return computer_id in self._credits
+
+    async def accepts_credits(self, computer_id: int) -> bool:
+        """El agente anunció créditos, en este nodo o en otro"""
+        if self.supports_credits(computer_id):
+            return True
+        return bool(await self._get_client().hexists(CREDITS_KEY, str(computer_id)))
+
+    def available(self, computer_id: int) -> int:
+        """Créditos utilizables: anunciados menos comandos aún no vistos por el agente"""
+        in_flight = max(0, self._sent.get(computer_id, 0) - self._received.get(computer_id, 0))
+        return self._credits.get(computer_id, 0) - in_flight
+
+    async def update_credits(self, computer_id: int, credits: int, received: int):
+        """Anuncio del agente (admission_update / heartbeat)"""
+        self._credits[computer_id] = max(0, int(credits))
+        self._received[computer_id] = int(received)
+        self._sent.setdefault(computer_id, 0)
+        await self._get_client().hset(CREDITS_KEY, str(computer_id), self._credits[computer_id])
+        await self._pump(computer_id)
+
+    # ---------- Colas ----------
+
+    async def submit(self, computer_id: int, items: List[Dict]):
+        """
+        Encola ejecuciones para la computadora
+
+        items: comandos execute_warming (execution_id, profile_id,
+        script_hash, script_id, sync). Las envía el nodo owner del agente.
+        """
+        if not items:
+            return
+
+        client = self._get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                ITEMS_KEY.format(computer_id=computer_id),
+                mapping={str(item['execution_id']): json.dumps(item) for item in items}
+            )
+            pipe.rpush(QUEUE_KEY.format(computer_id=computer_id), *[item['execution_id'] for item in items])
+            pipe.publish(EVENTS_CHANNEL, json.dumps({"computer_id": computer_id}))
+            await pipe.execute()
+
+        await self._pump(computer_id)
+
+    async def cancel(self, computer_id: int, execution_id: int) -> bool:
+        """Quita una ejecución que todavía no se envió; True si estaba en cola"""
+        removed = await self._get_client().hdel(ITEMS_KEY.format(computer_id=computer_id), str(execution_id))
+        return bool(removed)
+
+    async def get_queue_depth(self, computer_id: int) -> int:
+        return await self._get_client().hlen(ITEMS_KEY.format(computer_id=computer_id))
+
+    async def _take(self, computer_id: int, count: int) -> List[Dict]:
+        self._get_client()
+        raw = await self._take_script(
+            keys=[QUEUE_KEY.format(computer_id=computer_id), ITEMS_KEY.format(computer_id=computer_id)],
+            args=[count]
+        )
+        return [json.loads(item) for item in raw]
+
+    async def _put_back(self, computer_id: int, items: List[Dict]):
+        """Devuelve ejecuciones no enviadas al frente de la cola, en su orden"""
+        if not items:
+            return
+        async with self._get_client().pipeline(transaction=True) as pipe:
+            pipe.hset(
+                ITEMS_KEY.format(computer_id=computer_id),
+                mapping={str(item['execution_id']): json.dumps(item) for item in items}
+            )
+            pipe.lpush(QUEUE_KEY.format(computer_id=computer_id), *[item['execution_id'] for item in reversed(items)])
+            await pipe.execute()
+
+    @staticmethod
+    async def _still_queued(execution_ids: List[int]) -> Set[int]:
+        """Ejecuciones que siguen QUEUED en DB (pudieron cancelarse mientras esperaban)"""
+        from sqlalchemy import select
+        from app.database import AsyncSessionLocal
+        from app.models.warming_script import WarmingExecution, ExecutionStatus
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(WarmingExecution.id).where(
+                    WarmingExecution.id.in_(execution_ids),
+                    WarmingExecution.status == ExecutionStatus.QUEUED
+                )
+            )
+            return set(result.scalars().all())
+
+    async def _pump(self, computer_id: int):
+        """Envía lo que permitan los créditos (solo en el nodo owner del agente)"""
+        if not self.supports_credits(computer_id):
+            return
+
+        lock = self._locks.setdefault(computer_id, asyncio.Lock())
+        async with lock:
+            while self.available(computer_id) > 0:
+                items = await self._take(computer_id, self.available(computer_id))
+                if not items:
+                    return
+
+                # Lo sacado de Redis y no enviado vuelve a la cola aunque algo falle
+                pending = items
+                error = None
+                try:
+                    queued = await self._still_queued([item['execution_id'] for item in items])
+                    skipped = [item for item in items if item['execution_id'] not in queued]
+                    if skipped:
+                        self.stats['skipped'] += len(skipped)
+                        logger.info(f"Skipping {len(skipped)} executions no longer queued: Computer {computer_id}")
+
+                    pending = [item for item in items if item['execution_id'] in queued]
+                    while pending and await self._send(computer_id, pending[0]):
+                        pending.pop(0)
+                        self.stats['dispatched'] += 1
+                except Exception as e:
+                    error = e
+
+                if pending:
+                    # Socket lleno o error: al frente de la cola hasta el próximo anuncio
+                    await self._put_back(computer_id, pending)
+                    if error:
+                        logger.error(
+                            f"Dispatch to computer {computer_id} failed, "
+                            f"{len(pending)} executions returned to the queue: {error}"
+                        )
+                    return
+
+    async def _send(self, computer_id: int, item: Dict) -> bool:
+        """Envía un comando contándolo como en vuelo solo si el socket lo aceptó"""
+        self._sent[computer_id] = self._sent.get(computer_id, 0) + 1
+        accepted = False
+        try:
+            accepted = await self.sender(computer_id=computer_id, **item)
+        finally:
+            if not accepted:
+                self._sent[computer_id] -= 1
+        return accepted
+
+    async def _listen(self):
+        while True:
+            pubsub = self._get_client().pubsub()
+            try:
+                await pubsub.subscribe(EVENTS_CHANNEL)
+                async for item in pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    try:
+                        event = json.loads(item["data"])
+                        await self._pump(int(event["computer_id"]))
+                    except Exception as e:
+                        logger.error(f"Dispatch event error: {e}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Dispatch listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    # ---------- Conexión / desconexión ----------
+
+    def on_connection(self, computer_id: int, connected: bool):
+        """Listener de ConnectionManager: los contadores son por conexión"""
+        self._credits.pop(computer_id, None)
+        self._received.pop(computer_id, None)
+        self._sent.pop(computer_id, None)
+
+        if not connected:
+            self._spawn(self._redistribute_later(computer_id))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _redistribute_later(self, computer_id: int):
+        from app.websocket.manager import connection_manager
+
+        try:
+            await self._get_client().hdel(CREDITS_KEY, str(computer_id))
+
+            # Un corte breve no justifica mover el trabajo a otra máquina
+            await asyncio.sleep(self.redistribute_delay)
+
+            # Reconectado (a este nodo o a otro): su owner envía desde la misma cola
+            if connection_manager.is_connected(computer_id):
+                return
+
+            await self.redistribute(computer_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Redistribution from computer {computer_id} failed: {e}")
+
+    async def redistribute(self, computer_id: int) -> int:
+        """
+        Reparte la cola de una computadora caída entre las que pueden correr
+        sus perfiles (misma cuenta AdsPower, conectadas y con créditos)
+        """
+        depth = await self.get_queue_depth(computer_id)
+        if not depth:
+            return 0
+
+        targets = await self._targets(computer_id)
+        if not targets:
+            logger.warning(
+                f"⚠ Computer {computer_id} offline with {depth} queued executions - "
+                f"no other computer can run them, waiting for reconnection"
+            )
+            return 0
+
+        items = await self._take(computer_id, depth)
+
+        # Lo que sigue asignado en DB a esta computadora vuelve a su cola si algo falla
+        remaining = items
+        moved = 0
+        try:
+            queued = await self._still_queued([item['execution_id'] for item in items])
+            remaining = [item for item in items if item['execution_id'] in queued]
+
+            # Cada ejecución a la computadora con menos trabajo pendiente
+            load = {cid: await self.get_queue_depth(cid) - free for cid, free in targets.items()}
+            assignments: Dict[int, List[Dict]] = {cid: [] for cid in targets}
+            for item in remaining:
+                target = min(targets, key=lambda cid: load[cid] + len(assignments[cid]))
+                assignments[target].append(item)
+
+            for target, assigned in assignments.items():
+                if not assigned:
+                    continue
+
+                execution_ids = [item['execution_id'] for item in assigned]
+                await self._reassign(execution_ids, target)
+                remaining = [item for item in remaining if item not in assigned]
+
+                try:
+                    await self.submit(target, assigned)
+                except Exception:
+                    logger.error(f"Executions {execution_ids} reassigned to computer {target} but not queued")
+                    raise
+
+                logger.info(f"↪ {len(assigned)} executions moved from computer {computer_id} to {target}")
+                moved += len(assigned)
+
+        except Exception as e:
+            await self._put_back(computer_id, remaining)
+            logger.error(
+                f"Redistribution from computer {computer_id} failed, "
+                f"{len(remaining)} executions returned to its queue: {e}"
+            )
+
+        self.stats['redistributed'] += moved
+        return moved
+
+    async def _targets(self, computer_id: int) -> Dict[int, int]:
+        """Computadoras de la misma cuenta AdsPower con créditos anunciados -> créditos"""
+        from sqlalchemy import select
+        from app.database import AsyncSessionLocal
+        from app.models.computer import Computer
+
+        async with AsyncSessionLocal() as db:
+            account = (
+                select(Computer.adspower_api_key)
+                .where(Computer.id == computer_id)
+                .scalar_subquery()
+            )
+            result = await db.execute(
+                select(Computer.id).where(
+                    Computer.adspower_api_key == account,
+                    Computer.id != computer_id,
+                    Computer.is_active == True
+                )
+            )
+            candidates = list(result.scalars().all())
+
+        if not candidates:
+            return {}
+
+        credits = await self._get_client().hmget(CREDITS_KEY, [str(cid) for cid in candidates])
+        return {cid: int(value) for cid, value in zip(candidates, credits) if value is not None}
+
+    @staticmethod
+    async def _reassign(execution_ids: List[int], computer_id: int):
+        from app.database import AsyncSessionLocal
+        from app.services.warming_script_service import WarmingScriptService
+
+        async with AsyncSessionLocal() as db:
+            await WarmingScriptService(db).reassign_executions(execution_ids, computer_id)
+
+    async def get_metrics(self) -> Dict:
+        credits = await self._get_client().hgetall(CREDITS_KEY)
+        computer_ids = {int(cid) for cid in credits} | set(self._credits)
+        return {
+            **self.stats,
+            "computers": {
+                computer_id: {
+                    "queued": await self.get_queue_depth(computer_id),
+                    "credits": int(credits[str(computer_id)]) if str(computer_id) in credits else None,
+                    "available": self.available(computer_id) if self.supports_credits(computer_id) else None
+                }
+                for computer_id in sorted(computer_ids)
+            }
+        }
+
+
+def _build_dispatcher() -> WarmingDispatcher:
+    from app.config import settings
+    return WarmingDispatcher(redistribute_delay=settings.DISPATCH_REDISTRIBUTE_DELAY)
+
+
+# Instancia global
+warming_dispatcher = _build_dispatcher()
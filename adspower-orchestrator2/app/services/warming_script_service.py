@@ -1,13 +1,15 @@
 # app/services/warming_script_service.py
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, insert, and_, func, update, values, column, cast, case, Integer, Text
 from app.models.warming_script import WarmingScript, WarmingExecution, ExecutionStatus
+from app.repositories.warming_event_repository import WarmingEventRepository, event_type_for
 from app.schemas.warming_script import (
     WarmingScriptCreate, 
     WarmingScriptUpdate,
     WarmingScriptResponse,  # ✅ AÑADIDO
-    WarmingExecutionResponse  # ✅ AÑADIDO
+    WarmingExecutionResponse,  # ✅ AÑADIDO
+    WarmingExecutionEventResponse
 )
 from loguru import logger
 
@@ -176,6 +178,63 @@ class WarmingScriptService:
         # ✅ Convertir a Pydantic schema
         return WarmingExecutionResponse.model_validate(execution)
     
+    async def create_executions(
+        self,
+        script_id: int,
+        targets: List[Tuple[int, int]]
+    ) -> List[int]:
+        """
+        Crea las ejecuciones de un batch en una transacción
+        
+        targets: [(profile_id, computer_id)]. Un INSERT multi-fila con
+        RETURNING (IDs en el mismo orden que targets) y el uso del script
+        se incrementa en el mismo commit.
+        """
+        if not targets:
+            return []
+        
+        stmt = insert(WarmingExecution).returning(
+            WarmingExecution.id, sort_by_parameter_order=True
+        )
+        result = await self.db.execute(stmt, [
+            {
+                'script_id': script_id,
+                'profile_id': profile_id,
+                'computer_id': computer_id,
+                'status': ExecutionStatus.QUEUED
+            }
+            for profile_id, computer_id in targets
+        ])
+        execution_ids = list(result.scalars().all())
+        
+        await self.db.execute(
+            update(WarmingScript)
+            .where(WarmingScript.id == script_id)
+            .values(times_used=WarmingScript.times_used + 1)
+        )
+        
+        await self.db.commit()
+        
+        logger.info(f"Warming executions created: Script {script_id}, {len(execution_ids)} profiles")
+        return execution_ids
+    
+    async def reassign_executions(self, execution_ids: List[int], computer_id: int) -> int:
+        """Mueve ejecuciones aún no enviadas a otra computadora"""
+        if not execution_ids:
+            return 0
+        
+        result = await self.db.execute(
+            update(WarmingExecution)
+            .where(
+                WarmingExecution.id.in_(execution_ids),
+                WarmingExecution.status == ExecutionStatus.QUEUED
+            )
+            .values(computer_id=computer_id)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return result.rowcount
+    
     async def get_execution(self, execution_id: int) -> Optional[WarmingExecutionResponse]:
         """Obtiene ejecución por ID"""
         result = await self.db.execute(
@@ -212,13 +271,98 @@ class WarmingScriptService:
             execution.progress = progress
         
         if log_entry:
-            if execution.execution_log is None:
-                execution.execution_log = []
-            execution.execution_log.append(log_entry)
+            await WarmingEventRepository(self.db).add_many([{
+                'execution_id': execution_id,
+                'action_index': log_entry.get('action_index'),
+                'event_type': event_type_for(status, log_entry.get('action_index')),
+                'payload': log_entry
+            }])
         
         await self.db.commit()
         return True
     
+    async def apply_progress_batch(self, buffers: Dict[int, Dict[str, Any]]) -> int:
+        """
+        Aplica progreso acumulado de varias ejecuciones en una transacción
+        
+        buffers: {execution_id: {'status', 'progress', 'events', 'error'}}
+        Un UPDATE ... FROM (VALUES ...) para status/progreso y un INSERT
+        multi-fila en warming_execution_events para el log.
+        """
+        if not buffers:
+            return 0
+        
+        status_type = WarmingExecution.__table__.c.status.type
+        batch = values(
+            column('id', Integer),
+            column('status', Text),
+            column('progress', Integer),
+            column('error', Text),
+            name='batch'
+        ).data([
+            (
+                execution_id,
+                ExecutionStatus(buffer['status']).name,
+                buffer['progress'],
+                buffer['error']
+            )
+            for execution_id, buffer in buffers.items()
+        ])
+        
+        # Cast explícito: si todas las filas traen NULL, Postgres tipa la columna como text
+        new_status = cast(batch.c.status, status_type)
+        batch_progress = cast(batch.c.progress, Integer)
+        batch_error = cast(batch.c.error, Text)
+        terminal = [ExecutionStatus.COMPLETED, ExecutionStatus.FAILED, ExecutionStatus.CANCELLED]
+        
+        stmt = (
+            update(WarmingExecution)
+            .where(WarmingExecution.id == cast(batch.c.id, Integer))
+            .values(
+                # Un estado terminal (p.ej. cancelled) no vuelve a "running"
+                status=case(
+                    (
+                        and_(
+                            WarmingExecution.status.in_(terminal),
+                            new_status == ExecutionStatus.RUNNING
+                        ),
+                        WarmingExecution.status
+                    ),
+                    else_=new_status
+                ),
+                progress=func.coalesce(batch_progress, WarmingExecution.progress),
+                error_message=func.coalesce(batch_error, WarmingExecution.error_message)
+            )
+            .returning(WarmingExecution.id)
+            .execution_options(synchronize_session=False)
+        )
+        
+        result = await self.db.execute(stmt)
+        updated_ids = set(result.scalars().all())
+        
+        # Solo eventos de ejecuciones existentes (evita violar la FK)
+        await WarmingEventRepository(self.db).add_many([
+            {'execution_id': execution_id, **event}
+            for execution_id, buffer in buffers.items()
+            if execution_id in updated_ids
+            for event in buffer['events']
+        ])
+        
+        await self.db.commit()
+        return len(updated_ids)
+    
+    async def get_execution_events(
+        self,
+        execution_id: int,
+        limit: int = 100,
+        after_id: Optional[int] = None
+    ) -> Tuple[List[WarmingExecutionEventResponse], Optional[int]]:
+        """Página de eventos de una ejecución (cursor por ID)"""
+        events, next_cursor = await WarmingEventRepository(self.db).get_page(
+            execution_id, limit=limit, after_id=after_id
+        )
+        return [WarmingExecutionEventResponse.model_validate(e) for e in events], next_cursor
+    
     async def get_script_templates(self) -> List[WarmingScriptResponse]:
         """Obtiene plantillas de scripts"""
         result = await self.db.execute(
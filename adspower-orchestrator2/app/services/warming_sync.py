@@ -1,235 +1,268 @@
-# app/services/warming_sync.py - NUEVO ARCHIVO
+# app/services/warming_sync.py
 """
 Sistema de sincronización para ejecuciones paralelas distribuidas
+
+Barreras en Redis compartidas por todas las réplicas del orquestador: los
+agentes envían barrier_arrive antes de cada acción sincronizada y esperan
+barrier_release. La llegada es un script Lua atómico (contador + estado);
+cuando llega el último participante se publica un solo evento y cada nodo
+libera a sus propios participantes (un mensaje por participante).
 """
 import asyncio
-from typing import Dict, Set, Optional
-from datetime import datetime, timedelta
+import json
+import time
+from typing import Dict, Optional, Tuple
+import redis.asyncio as aioredis
 from loguru import logger
 
-class WarmingBarrier:
-    """
-    Barrera de sincronización distribuida para warming paralelo
-    
-    Coordina múltiples agentes para que ejecuten acciones simultáneamente
-    """
-    
-    def __init__(self, barrier_id: str, total_participants: int, timeout: int = 60):
-        self.barrier_id = barrier_id
-        self.total_participants = total_participants
-        self.timeout = timeout
-        
-        # Participantes que han llegado a la barrera
-        self.arrived: Set[int] = set()
-        
-        # Evento para liberar a todos cuando todos lleguen
-        self.release_event = asyncio.Event()
-        
-        # Timestamp de creación
-        self.created_at = datetime.utcnow()
-        
-        # Estado
-        self.is_released = False
-        self.is_cancelled = False
-    
-    async def wait(self, execution_id: int) -> bool:
-        """
-        Espera en la barrera hasta que todos lleguen o timeout
-        
-        Returns:
-            True si se liberó correctamente, False si timeout o cancelado
-        """
-        
-        # Marcar como llegado
-        self.arrived.add(execution_id)
-        
-        logger.debug(
-            f"Barrier {self.barrier_id}: {len(self.arrived)}/{self.total_participants} arrived"
-        )
-        
-        # Si todos llegaron, liberar
-        if len(self.arrived) >= self.total_participants:
-            self.is_released = True
-            self.release_event.set()
-            logger.info(f"✓ Barrier {self.barrier_id} released (all arrived)")
-            return True
-        
-        # Esperar con timeout
-        try:
-            await asyncio.wait_for(
-                self.release_event.wait(),
-                timeout=self.timeout
-            )
-            return not self.is_cancelled
-        
-        except asyncio.TimeoutError:
-            logger.warning(f"⚠ Barrier {self.barrier_id} timeout")
-            self.is_cancelled = True
-            self.release_event.set()  # Liberar a los que esperan
-            return False
-    
-    def cancel(self):
-        """Cancela la barrera"""
-        self.is_cancelled = True
-        self.release_event.set()
-        logger.info(f"Barrier {self.barrier_id} cancelled")
-    
-    def is_expired(self, expiry_minutes: int = 10) -> bool:
-        """Verifica si la barrera ha expirado"""
-        age = datetime.utcnow() - self.created_at
-        return age > timedelta(minutes=expiry_minutes)
+BARRIER_KEY = "warming_barrier:{barrier_id}"
+ARRIVED_KEY = "warming_barrier:{barrier_id}:arrived"
+METRICS_KEY = "warming_barrier:metrics"
+EVENTS_CHANNEL = "warming_barrier:events"
+
+# KEYS: barrier, arrived, metrics | ARGV: miembro, total, ttl, canal, barrier_id
+_ARRIVE = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local state = redis.call('HGET', KEYS[1], 'state')
+if not state then
+    redis.call('HSET', KEYS[1], 'state', 'open', 'total', ARGV[2], 'first_ms', now)
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    state = 'open'
+end
+if state ~= 'open' then
+    return {state, redis.call('SCARD', KEYS[2])}
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+local count = redis.call('SCARD', KEYS[2])
+if count < tonumber(redis.call('HGET', KEYS[1], 'total')) then
+    return {'open', count}
+end
+redis.call('HSET', KEYS[1], 'state', 'released')
+local skew = now - tonumber(redis.call('HGET', KEYS[1], 'first_ms'))
+redis.call('HINCRBY', KEYS[3], 'released', 1)
+redis.call('HINCRBY', KEYS[3], 'skew_ms_sum', skew)
+if skew > tonumber(redis.call('HGET', KEYS[3], 'skew_ms_max') or '0') then
+    redis.call('HSET', KEYS[3], 'skew_ms_max', skew)
+end
+redis.call('PUBLISH', ARGV[4], cjson.encode({barrier_id = ARGV[5], state = 'released'}))
+return {'released', count}
+"""
+
+# KEYS: barrier, metrics | ARGV: canal, barrier_id
+_CANCEL = """
+if redis.call('HGET', KEYS[1], 'state') ~= 'open' then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'state', 'cancelled')
+redis.call('HINCRBY', KEYS[2], 'cancelled', 1)
+redis.call('PUBLISH', ARGV[1], cjson.encode({barrier_id = ARGV[2], state = 'cancelled'}))
+return 1
+"""
+
+
+def barrier_id_for(batch_id: str, action_index: int) -> str:
+    return f"{batch_id}:{action_index}"
 
 
 class WarmingSyncManager:
     """
-    Gestor global de sincronización para warming distribuido
-    
-    Singleton que coordina barreras entre múltiples agentes
+    Barreras de sincronización distribuidas para warming paralelo
+
+    Cada nodo solo guarda los participantes conectados a él
+    (barrier_id -> execution_id -> (computer_id, llegada)) y un timer por
+    barrera; el estado compartido vive en Redis.
     """
-    
-    _instance = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
-    
-    def __init__(self):
-        if self._initialized:
-            return
-        
-        # Barreras activas: {batch_id-action_index: WarmingBarrier}
-        self.barriers: Dict[str, WarmingBarrier] = {}
-        
-        # Lock para operaciones thread-safe
-        self.lock = asyncio.Lock()
-        
-        # Tarea de limpieza
-        self.cleanup_task = None
-        
-        self._initialized = True
-        
-        logger.info("WarmingSyncManager initialized")
-    
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self._client: Optional[aioredis.Redis] = None
+        self._arrive_script = None
+        self._cancel_script = None
+
+        self._waiters: Dict[str, Dict[int, Tuple[int, float]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._listener_task: Optional[asyncio.Task] = None
+
+    def _get_client(self) -> aioredis.Redis:
+        if self._client is None:
+            if self.redis_url is None:
+                from app.config import settings
+                self.redis_url = settings.REDIS_URL
+            self._client = aioredis.from_url(self.redis_url, decode_responses=True)
+            self._arrive_script = self._client.register_script(_ARRIVE)
+            self._cancel_script = self._client.register_script(_CANCEL)
+        return self._client
+
     async def start(self):
-        """Inicia el gestor de sincronización"""
-        if self.cleanup_task is None:
-            self.cleanup_task = asyncio.create_task(self._cleanup_loop())
-            logger.info("WarmingSyncManager cleanup task started")
-    
+        """Se suscribe a los eventos de liberación"""
+        if self._listener_task is None:
+            self._get_client()
+            self._listener_task = asyncio.create_task(self._listen())
+            logger.info("WarmingSyncManager listening for barrier events")
+
     async def stop(self):
         """Detiene el gestor"""
-        if self.cleanup_task:
-            self.cleanup_task.cancel()
+        if self._listener_task:
+            self._listener_task.cancel()
             try:
-                await self.cleanup_task
+                await self._listener_task
             except asyncio.CancelledError:
                 pass
-    
-    async def create_barrier(
+            self._listener_task = None
+
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def arrive(
         self,
         batch_id: str,
         action_index: int,
+        execution_id: int,
+        computer_id: int,
         total_participants: int,
         timeout: int = 60
-    ) -> WarmingBarrier:
-        """Crea una nueva barrera de sincronización"""
-        
-        barrier_id = f"{batch_id}_action_{action_index}"
-        
-        async with self.lock:
-            if barrier_id in self.barriers:
-                # Barrera ya existe, retornar existente
-                return self.barriers[barrier_id]
-            
-            barrier = WarmingBarrier(
-                barrier_id=barrier_id,
-                total_participants=total_participants,
-                timeout=timeout
-            )
-            
-            self.barriers[barrier_id] = barrier
-            
-            logger.info(
-                f"Created barrier: {barrier_id} "
-                f"(participants: {total_participants}, timeout: {timeout}s)"
-            )
-            
-            return barrier
-    
-    async def wait_at_barrier(
-        self,
-        batch_id: str,
-        action_index: int,
-        execution_id: int
-    ) -> bool:
+    ):
         """
-        Espera en una barrera de sincronización
-        
-        Returns:
-            True si sincronización exitosa, False si fallo
+        Registra la llegada de un participante
+
+        La respuesta (barrier_release) llega cuando todos llegaron, o con
+        released=False si la barrera vence o ya estaba cancelada.
         """
-        
-        barrier_id = f"{batch_id}_action_{action_index}"
-        
-        async with self.lock:
-            if barrier_id not in self.barriers:
-                logger.error(f"Barrier {barrier_id} not found!")
-                return False
-            
-            barrier = self.barriers[barrier_id]
-        
-        # Esperar en la barrera (fuera del lock)
-        success = await barrier.wait(execution_id)
-        
-        return success
-    
-    async def cancel_barrier(self, batch_id: str, action_index: int):
-        """Cancela una barrera"""
-        
-        barrier_id = f"{batch_id}_action_{action_index}"
-        
-        async with self.lock:
-            if barrier_id in self.barriers:
-                self.barriers[barrier_id].cancel()
-    
-    async def remove_barrier(self, batch_id: str, action_index: int):
-        """Elimina una barrera"""
-        
-        barrier_id = f"{batch_id}_action_{action_index}"
-        
-        async with self.lock:
-            if barrier_id in self.barriers:
-                del self.barriers[barrier_id]
-                logger.debug(f"Removed barrier: {barrier_id}")
-    
-    async def _cleanup_loop(self):
-        """Loop de limpieza de barreras expiradas"""
-        
+        barrier_id = barrier_id_for(batch_id, action_index)
+
+        # Registrar antes del script: el evento de liberación puede llegar
+        # por el listener antes de que esta corrutina continúe
+        self._waiters.setdefault(barrier_id, {})[execution_id] = (computer_id, time.monotonic())
+        if barrier_id not in self._timers:
+            self._timers[barrier_id] = asyncio.get_running_loop().call_later(
+                timeout,
+                lambda: asyncio.ensure_future(self._expire(barrier_id))
+            )
+
+        self._get_client()
+        state, count = await self._arrive_script(
+            keys=[
+                BARRIER_KEY.format(barrier_id=barrier_id),
+                ARRIVED_KEY.format(barrier_id=barrier_id),
+                METRICS_KEY
+            ],
+            args=[execution_id, total_participants, timeout * 2, EVENTS_CHANNEL, barrier_id]
+        )
+
+        logger.debug(f"Barrier {barrier_id}: {count}/{total_participants} arrived ({state})")
+
+        if state == 'cancelled':
+            # Llegó tarde a una barrera vencida: responder solo a este participante
+            waiter = self._waiters.get(barrier_id, {}).pop(execution_id, None)
+            if waiter:
+                await self._send_release(barrier_id, execution_id, waiter, released=False)
+
+    async def _expire(self, barrier_id: str):
+        """Timeout de la barrera: la cancela (si sigue abierta) para todos los nodos"""
+        self._timers.pop(barrier_id, None)
+        try:
+            cancelled = await self._cancel_script(
+                keys=[BARRIER_KEY.format(barrier_id=barrier_id), METRICS_KEY],
+                args=[EVENTS_CHANNEL, barrier_id]
+            )
+            if cancelled:
+                logger.warning(f"⚠ Barrier {barrier_id} timeout")
+                return
+
+            # Ya estaba liberada/cancelada y no vimos el evento (pub/sub caído)
+            if barrier_id in self._waiters:
+                state = await self._client.hget(BARRIER_KEY.format(barrier_id=barrier_id), 'state')
+                await self._release_local(barrier_id, state or 'cancelled')
+
+        except Exception as e:
+            logger.error(f"Barrier {barrier_id} expiry error: {e}")
+
+    async def _listen(self):
         while True:
+            pubsub = self._get_client().pubsub()
             try:
-                await asyncio.sleep(60)  # Cada minuto
-                
-                async with self.lock:
-                    expired = [
-                        barrier_id
-                        for barrier_id, barrier in self.barriers.items()
-                        if barrier.is_expired()
-                    ]
-                    
-                    for barrier_id in expired:
-                        logger.info(f"Cleaning expired barrier: {barrier_id}")
-                        del self.barriers[barrier_id]
-                    
-                    if expired:
-                        logger.info(f"Cleaned {len(expired)} expired barriers")
-            
+                await pubsub.subscribe(EVENTS_CHANNEL)
+                async for item in pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    try:
+                        event = json.loads(item["data"])
+                        await self._release_local(event["barrier_id"], event["state"])
+                    except Exception as e:
+                        logger.error(f"Barrier event error: {e}")
+
             except asyncio.CancelledError:
-                break
+                raise
             except Exception as e:
-                logger.error(f"Cleanup error: {e}")
+                logger.error(f"Barrier listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    async def _release_local(self, barrier_id: str, state: str):
+        """Libera a los participantes de esta barrera conectados a este nodo"""
+        timer = self._timers.pop(barrier_id, None)
+        if timer:
+            timer.cancel()
+
+        waiters = self._waiters.pop(barrier_id, None)
+        if not waiters:
+            return
+
+        released = state == 'released'
+        now = time.monotonic()
+        for execution_id, waiter in waiters.items():
+            await self._send_release(barrier_id, execution_id, waiter, released)
+
+        # Tiempo de espera de cada participante (llegada -> liberación)
+        wait_ms = [int((now - arrived_at) * 1000) for _, arrived_at in waiters.values()]
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(METRICS_KEY, 'wait_count', len(wait_ms))
+            pipe.hincrby(METRICS_KEY, 'wait_ms_sum', sum(wait_ms))
+            await pipe.execute()
+
+        if released:
+            logger.info(f"✓ Barrier {barrier_id} released ({len(waiters)} local participants)")
+
+    async def _send_release(self, barrier_id: str, execution_id: int, waiter: Tuple[int, float], released: bool):
+        from app.websocket.manager import connection_manager
+
+        computer_id, _ = waiter
+        batch_id, _, action_index = barrier_id.rpartition(":")
+        await connection_manager.send_message(computer_id, {
+            "type": "barrier_release",
+            "batch_id": batch_id,
+            "action_index": int(action_index),
+            "execution_id": execution_id,
+            "released": released
+        })
+
+    async def get_metrics(self) -> Dict:
+        """Barreras liberadas/canceladas, skew de llegadas y tiempo de espera"""
+        raw = await self._get_client().hgetall(METRICS_KEY)
+        values = {k: int(v) for k, v in raw.items()}
+
+        released = values.get('released', 0)
+        wait_count = values.get('wait_count', 0)
+        return {
+            "released": released,
+            "cancelled": values.get('cancelled', 0),
+            "arrival_skew_ms_avg": round(values.get('skew_ms_sum', 0) / released, 1) if released else None,
+            "arrival_skew_ms_max": values.get('skew_ms_max'),
+            "wait_ms_avg": round(values.get('wait_ms_sum', 0) / wait_count, 1) if wait_count else None,
+            "local_waiting": sum(len(w) for w in self._waiters.values())
+        }
 
 
 # Instancia global
-warming_sync_manager = WarmingSyncManager()
\ No newline at end of file
+warming_sync_manager = WarmingSyncManager()
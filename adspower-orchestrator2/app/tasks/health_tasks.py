@@ -3,6 +3,7 @@ from app.tasks import celery_app
 from app.database import AsyncSessionLocal
 from app.services.computer_service import ComputerService
 from app.services.proxy_service import ProxyService
+from app.integrations.adspower_client import adspower_registry
 from loguru import logger
 
 @celery_app.task(name='tasks.health_check_all_computers')
@@ -41,7 +42,14 @@ def health_check_all_computers_task():
             logger.info(f"Health check completed: {results['healthy']}/{results['total']} healthy")
             return results
     
-    return asyncio.run(_health_check())
+    async def _run():
+        try:
+            return await _health_check()
+        finally:
+            # Los pools pertenecen al loop de esta tarea
+            await adspower_registry.close_all()
+    
+    return asyncio.run(_run())
 
 @celery_app.task(name='tasks.health_check_proxies')
 def health_check_proxies_task():
@@ -1,8 +1,8 @@
 # app/tasks/profile_tasks.py
 from app.tasks import celery_app
 from app.database import AsyncSessionLocal
-from app.services.profile_service import ProfileService
 from app.repositories.profile_repository import ProfileRepository
+from app.integrations.adspower_client import adspower_registry
 from loguru import logger
 
 @celery_app.task(name='tasks.warmup_profile')
@@ -46,6 +46,7 @@ def bulk_create_profiles_task(bulk_data: dict):
     
     async def _bulk_create():
         from app.schemas.profile import ProfileCreate, ProfileBulkCreate
+        from app.services.bulk_profile_service import BulkProfileService
         
         bulk_in = ProfileBulkCreate(**bulk_data)
         results = {
@@ -55,39 +56,52 @@ def bulk_create_profiles_task(bulk_data: dict):
             'profiles': []
         }
         
+        profiles_in = [
+            ProfileCreate(
+                name=f"Profile_{i+1}",
+                computer_id=bulk_in.computer_id,
+                proxy_type=bulk_in.proxy_type,
+                country=bulk_in.country,
+                city=bulk_in.city,
+                device_type=bulk_in.device_type,
+                auto_warmup=bulk_in.auto_warmup,
+                warmup_duration_minutes=bulk_in.warmup_duration_minutes,
+                tags=bulk_in.tags
+            )
+            for i in range(bulk_in.count)
+        ]
+        
         async with AsyncSessionLocal() as db:
-            service = ProfileService(db)
+            service = BulkProfileService(db)
+            profiles_in = await service.assign_proxies(
+                profiles_in,
+                proxy_type=bulk_in.proxy_type,
+                country=bulk_in.country
+            )
             
-            for i in range(bulk_in.count):
-                try:
-                    # Crear profile individual
-                    profile_in = ProfileCreate(
-                        name=f"Profile_{i+1}",
-                        computer_id=bulk_in.computer_id,
-                        proxy_type=bulk_in.proxy_type,
-                        country=bulk_in.country,
-                        city=bulk_in.city,
-                        device_type=bulk_in.device_type,
-                        auto_warmup=bulk_in.auto_warmup,
-                        warmup_duration_minutes=bulk_in.warmup_duration_minutes,
-                        tags=bulk_in.tags
-                    )
-                    
-                    profile = await service.create_profile(profile_in)
-                    
+            # ✅ Resultados en streaming: lo ya persistido no se pierde
+            async for result in service.create_profiles(profiles_in):
+                if result['success']:
                     results['successful'] += 1
                     results['profiles'].append({
-                        'id': profile.id,
-                        'name': profile.name,
-                        'adspower_id': profile.adspower_id
+                        'id': result['id'],
+                        'name': result['name'],
+                        'adspower_id': result['adspower_id']
                     })
-                    
-                    logger.info(f"Bulk profile {i+1}/{bulk_in.count} created")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to create profile {i+1}: {e}")
+                    logger.info(
+                        f"Bulk profile {result['index']+1}/{bulk_in.count} created "
+                        f"({results['successful'] + results['failed']}/{bulk_in.count} done)"
+                    )
+                else:
+                    logger.error(f"Failed to create profile {result['index']+1}: {result['error']}")
                     results['failed'] += 1
         
         return results
     
-    return asyncio.run(_bulk_create())
\ No newline at end of file
+    async def _run():
+        try:
+            return await _bulk_create()
+        finally:
+            await adspower_registry.close_all()
+    
+    return asyncio.run(_run())
\ No newline at end of file
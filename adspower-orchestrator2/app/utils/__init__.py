@@ -1,5 +1,8 @@
 # app/utils/__init__.py
 from app.utils.profile_generator import ProfileGenerator
+from app.utils.rate_limiter import AsyncRateLimiter
+from app.utils.browser_readiness import wait_for_devtools, browser_readiness
+from app.utils.script_store import script_content_hash, script_bodies
 from app.utils.mobile_devices import (
     get_random_mobile_device,
     get_device_by_id,
@@ -11,6 +14,11 @@ from app.utils.mobile_devices import (
 
 __all__ = [
     "ProfileGenerator",
+    "AsyncRateLimiter",
+    "wait_for_devtools",
+    "browser_readiness",
+    "script_content_hash",
+    "script_bodies",
     "get_random_mobile_device",
     "get_device_by_id",
     "get_all_devices",
@@ -0,0 +1,123 @@
+# app/utils/browser_readiness.py
+"""
+Readiness de navegadores AdsPower
+
+En lugar de dormir un tiempo fijo tras /browser/start, se consulta el
+endpoint DevTools (/json/version) con backoff exponencial hasta que responde
+o vence el deadline. La latencia open→ready se acumula en un histograma por
+computadora (en Redis, para que sea visible desde la API y los workers).
+"""
+import time
+from typing import Dict, List, Optional
+import httpx
+import redis
+from loguru import logger
+
+from app.config import settings
+
+# Límites superiores de los buckets (ms); el último bucket es +Inf
+READINESS_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000)
+
+REDIS_KEY_PREFIX = "browser_readiness:"
+
+
+def wait_for_devtools(
+    debug_port: int,
+    host: str = "127.0.0.1",
+    timeout: float = 30.0,
+    initial_delay: float = 0.05,
+    max_delay: float = 1.0
+) -> float:
+    """
+    Espera a que el puerto DevTools responda (sync)
+
+    Retorna los segundos transcurridos; lanza TimeoutError si vence el deadline.
+    """
+    url = f"http://{host}:{debug_port}/json/version"
+    start = time.monotonic()
+    deadline = start + timeout
+    delay = initial_delay
+    last_error: Optional[Exception] = None
+
+    with httpx.Client(timeout=min(2.0, timeout)) as client:
+        while True:
+            try:
+                response = client.get(url)
+                if response.status_code == 200:
+                    return time.monotonic() - start
+            except httpx.HTTPError as e:
+                last_error = e
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(
+                    f"DevTools port {debug_port} not ready after {timeout}s: {last_error}"
+                )
+
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+
+def bucket_label(elapsed_ms: float) -> str:
+    """Bucket del histograma para una latencia"""
+    for upper in READINESS_BUCKETS_MS:
+        if elapsed_ms <= upper:
+            return f"le_{upper}"
+    return "le_inf"
+
+
+class BrowserReadinessRecorder:
+    """Histograma de latencia open→ready por computadora (Redis)"""
+
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self._client: Optional[redis.Redis] = None
+
+    def _get_client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(self.redis_url)
+        return self._client
+
+    def record(self, computer_id: int, elapsed_seconds: float):
+        """Registra una observación (best-effort: nunca falla la automatización)"""
+        elapsed_ms = elapsed_seconds * 1000
+        key = f"{REDIS_KEY_PREFIX}{computer_id}"
+
+        try:
+            pipe = self._get_client().pipeline()
+            pipe.hincrby(key, bucket_label(elapsed_ms), 1)
+            pipe.hincrby(key, "count", 1)
+            pipe.hincrbyfloat(key, "sum_ms", elapsed_ms)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Could not record browser readiness for computer {computer_id}: {e}")
+
+    def get_histograms(self) -> Dict[int, Dict]:
+        """Histogramas de todas las computadoras"""
+        client = self._get_client()
+        histograms = {}
+
+        for key in client.scan_iter(match=f"{REDIS_KEY_PREFIX}*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            computer_id = int(key[len(REDIS_KEY_PREFIX):])
+            raw = {
+                (k.decode() if isinstance(k, bytes) else k): float(v)
+                for k, v in client.hgetall(key).items()
+            }
+            histograms[computer_id] = self._to_snapshot(raw)
+
+        return histograms
+
+    @staticmethod
+    def _to_snapshot(raw: Dict[str, float]) -> Dict:
+        count = int(raw.get("count", 0))
+        labels: List[str] = [f"le_{upper}" for upper in READINESS_BUCKETS_MS] + ["le_inf"]
+        return {
+            "count": count,
+            "avg_ms": round(raw.get("sum_ms", 0) / count, 1) if count else None,
+            "buckets": {label: int(raw.get(label, 0)) for label in labels}
+        }
+
+
+# Instancia global
+browser_readiness = BrowserReadinessRecorder(settings.REDIS_URL)
@@ -0,0 +1,55 @@
+# app/utils/rate_limiter.py
+"""
+Rate limiting asíncrono para APIs locales que aplican throttling (AdsPower)
+"""
+import asyncio
+import time
+from typing import Optional
+
+
+class AsyncRateLimiter:
+    """
+    Limita concurrencia y frecuencia de requests a un mismo destino
+    
+    - max_concurrency: requests en vuelo simultáneamente
+    - requests_per_second: separación mínima entre inicios de request
+    """
+    
+    def __init__(self, max_concurrency: int = 3, requests_per_second: Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+    
+    async def acquire(self):
+        """Espera un slot de concurrencia y respeta el intervalo mínimo"""
+        await self._semaphore.acquire()
+        
+        if self._interval <= 0:
+            return
+        
+        try:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next_slot - now
+                self._next_slot = max(now, self._next_slot) + self._interval
+            
+            if wait > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._semaphore.release()
+            raise
+    
+    def release(self):
+        """Libera el slot de concurrencia"""
+        self._semaphore.release()
+    
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,50 @@
+# app/utils/script_store.py
+"""
+Scripts de warming direccionados por contenido
+
+Los comandos execute_warming llevan solo el hash del script; el agente
+pide el cuerpo (script_request) únicamente si no lo tiene en su caché.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def script_content_hash(actions: List[Dict[str, Any]]) -> str:
+    """sha256 del JSON canónico de las acciones (mismo cálculo en el agente)"""
+    canonical = json.dumps(actions, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ScriptBodyStore:
+    """LRU hash -> (script_id, acciones) para responder script_request"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._bodies: "OrderedDict[str, Tuple[Optional[int], List[Dict]]]" = OrderedDict()
+
+    def register(self, script_id: Optional[int], actions: List[Dict[str, Any]]) -> str:
+        """Guarda el cuerpo y retorna su hash"""
+        content_hash = script_content_hash(actions)
+        self._bodies[content_hash] = (script_id, actions)
+        self._bodies.move_to_end(content_hash)
+
+        while len(self._bodies) > self.max_entries:
+            self._bodies.popitem(last=False)
+
+        return content_hash
+
+    def get(self, content_hash: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._bodies.get(content_hash)
+        if entry is None:
+            return None
+        self._bodies.move_to_end(content_hash)
+        return entry[1]
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+
+# Instancia global
+script_bodies = ScriptBodyStore()
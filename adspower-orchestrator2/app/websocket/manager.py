@@ -1,29 +1,179 @@
 # app/websocket/manager.py
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Set
 from fastapi import WebSocket
 from loguru import logger
 import json
 import asyncio
 from datetime import datetime
+from app.websocket.registry import AgentRegistry
+from app.websocket.send_queue import AgentSendQueue, SendQueueFull
 
 class ConnectionManager:
-    """Gestor de conexiones WebSocket para agentes (Computadoras B)"""
+    """
+    Gestor de conexiones WebSocket para agentes (Computadoras B)
     
-    def __init__(self):
+    Los sockets locales se usan directo. Con registry (Redis), los agentes
+    conectados a otros workers/réplicas también son visibles y los comandos
+    hacia ellos se rutean al nodo owner por pub/sub.
+    
+    Cada socket local escribe desde su propia cola acotada (AgentSendQueue):
+    enviar es solo encolar, así un agente lento no frena a los demás.
+    """
+    
+    def __init__(
+        self,
+        send_queue_size: int = 256,
+        command_overflow: str = "block",
+        send_block_timeout: float = 5.0,
+        send_timeout: float = 10.0
+    ):
         # computer_id -> WebSocket
         self.active_connections: Dict[int, WebSocket] = {}
+        # computer_id -> cola de envío (writer task propia)
+        self.send_queues: Dict[int, AgentSendQueue] = {}
+        self.send_queue_size = send_queue_size
+        self.command_overflow = command_overflow
+        self.send_block_timeout = send_block_timeout
+        self.send_timeout = send_timeout
         # computer_id -> última actividad
         self.last_activity: Dict[int, datetime] = {}
         # computer_id -> estado del agente
         self.agent_states: Dict[int, Dict] = {}
+        # computer_id -> última secuencia de outbox procesada
+        # (se conserva al desconectar para descartar reenvíos duplicados)
+        self.last_seq: Dict[int, int] = {}
+        # computer_id -> epoch del journal del agente (si cambia, las secuencias reiniciaron)
+        self.outbox_epoch: Dict[int, Optional[str]] = {}
+        # Listeners de transiciones: callback(computer_id, connected)
+        self.status_listeners: List[Callable[[int, bool], None]] = []
+        
+        # Registry compartido: agentes de otros nodos -> último estado publicado
+        self.registry: Optional[AgentRegistry] = None
+        self.remote_agents: Dict[int, Dict] = {}
+        self._registry_task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+    
+    async def start_registry(self, registry: AgentRegistry, sync_interval: float = 2.0):
+        """Activa el registro compartido y el ruteo entre nodos"""
+        self.registry = registry
+        await registry.start_listener(self._deliver_local)
+        self._registry_task = asyncio.create_task(self._registry_sync_loop(sync_interval))
+        logger.info(f"Agent registry enabled (node {registry.node_id})")
+    
+    async def stop_registry(self):
+        """Libera los agentes de este nodo y cierra el registro"""
+        if not self.registry:
+            return
+        
+        if self._registry_task:
+            self._registry_task.cancel()
+            try:
+                await self._registry_task
+            except asyncio.CancelledError:
+                pass
+            self._registry_task = None
+        
+        for computer_id in list(self.active_connections):
+            try:
+                await self.registry.unregister(computer_id)
+            except Exception as e:
+                logger.error(f"Registry unregister failed for computer {computer_id}: {e}")
+        
+        await self.registry.close()
+        self.registry = None
+        self.remote_agents = {}
+    
+    async def _registry_sync_loop(self, interval: float):
+        """Renueva los owners locales y refresca la vista de agentes remotos"""
+        while True:
+            try:
+                await self.registry.refresh(self.active_connections.keys())
+                computer_ids, states = await self.registry.snapshot()
+                self.remote_agents = {
+                    computer_id: states.get(computer_id, {})
+                    for computer_id in computer_ids
+                    if computer_id not in self.active_connections
+                }
+                await asyncio.sleep(interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Agent registry sync error: {e}")
+                await asyncio.sleep(interval)
+    
+    def _spawn(self, coro):
+        """Tarea en background (escrituras al registry sin bloquear al caller)"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+    
+    def _on_background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Agent registry write failed: {task.exception()}")
+    
+    def _publish_state(self, computer_id: int):
+        if self.registry and computer_id in self.active_connections:
+            self._spawn(self.registry.publish_state(computer_id, self.agent_states.get(computer_id, {})))
+    
+    async def _deliver_local(self, computer_id: int, message: Dict) -> bool:
+        """Comando ruteado desde otro nodo para un agente de este nodo"""
+        if computer_id not in self.active_connections:
+            logger.warning(f"Routed command for computer {computer_id} but it is not connected here")
+            return False
+        return await self._send_local(computer_id, message)
+    
+    def add_status_listener(self, listener: Callable[[int, bool], None]):
+        """Registra un listener de conexión/desconexión de agentes"""
+        self.status_listeners.append(listener)
+    
+    def _emit_status(self, computer_id: int, connected: bool):
+        """Notifica una transición a los listeners (no bloqueante)"""
+        for listener in self.status_listeners:
+            try:
+                listener(computer_id, connected)
+            except Exception as e:
+                logger.error(f"Status listener error for computer {computer_id}: {e}")
     
     async def connect(self, websocket: WebSocket, computer_id: int):
         """Conecta un agente"""
         await websocket.accept()
+        
+        # Reconexión: descartar la cola del socket anterior
+        old_queue = self.send_queues.pop(computer_id, None)
+        if old_queue:
+            old_queue.close()
+        
+        queue = AgentSendQueue(
+            computer_id,
+            websocket,
+            max_size=self.send_queue_size,
+            command_overflow=self.command_overflow,
+            block_timeout=self.send_block_timeout,
+            send_timeout=self.send_timeout,
+            on_error=self._on_send_error
+        )
+        queue.start()
+        self.send_queues[computer_id] = queue
         self.active_connections[computer_id] = websocket
         self.last_activity[computer_id] = datetime.utcnow()
+        self.remote_agents.pop(computer_id, None)
+        
+        if self.registry:
+            try:
+                await self.registry.register(computer_id, {})
+                # Secuencias del outbox ya procesadas por cualquier nodo
+                epoch, seq = await self.registry.get_last_seq(computer_id)
+                if epoch and epoch != self.outbox_epoch.get(computer_id):
+                    self.outbox_epoch[computer_id] = epoch
+                    self.last_seq[computer_id] = seq
+                else:
+                    self.last_seq[computer_id] = max(self.last_seq.get(computer_id, 0), seq)
+            except Exception as e:
+                logger.error(f"Registry register failed for computer {computer_id}: {e}")
         
         logger.info(f"Agent connected: Computer {computer_id}")
+        self._emit_status(computer_id, True)
         
         # Enviar mensaje de bienvenida
         await self.send_message(computer_id, {
@@ -33,8 +183,19 @@ class ConnectionManager:
             "timestamp": datetime.utcnow().isoformat()
         })
     
-    def disconnect(self, computer_id: int):
-        """Desconecta un agente"""
+    def disconnect(self, computer_id: int, websocket: Optional[WebSocket] = None):
+        """
+        Desconecta un agente
+        
+        Con websocket, solo si sigue siendo el socket actual: el handler de
+        una conexión reemplazada por una reconexión no debe tirar la nueva.
+        """
+        if websocket is not None and self.active_connections.get(computer_id) is not websocket:
+            logger.debug(f"Stale socket closed for computer {computer_id}, keeping current connection")
+            return
+        
+        was_connected = computer_id in self.active_connections
+        
         if computer_id in self.active_connections:
             del self.active_connections[computer_id]
         if computer_id in self.last_activity:
@@ -42,54 +203,97 @@ class ConnectionManager:
         if computer_id in self.agent_states:
             del self.agent_states[computer_id]
         
+        queue = self.send_queues.pop(computer_id, None)
+        if queue:
+            queue.close()
+        
+        if was_connected and self.registry:
+            self._spawn(self.registry.unregister(computer_id))
+        
         logger.info(f"Agent disconnected: Computer {computer_id}")
+        
+        if was_connected:
+            self._emit_status(computer_id, False)
     
     async def send_message(self, computer_id: int, message: Dict):
-        """Envía mensaje a un agente específico"""
+        """Envía mensaje a un agente (socket local o ruteado al nodo owner)"""
         if computer_id in self.active_connections:
+            return await self._send_local(computer_id, message)
+        
+        if self.registry:
             try:
-                websocket = self.active_connections[computer_id]
-                await websocket.send_json(message)
-                self.last_activity[computer_id] = datetime.utcnow()
-                return True
+                owner = await self.registry.get_owner(computer_id)
+                if owner and owner != self.registry.node_id:
+                    return await self.registry.route(owner, computer_id, message)
             except Exception as e:
-                logger.error(f"Error sending message to computer {computer_id}: {e}")
-                self.disconnect(computer_id)
-                return False
+                logger.error(f"Routing to computer {computer_id} failed: {e}")
+        
         return False
     
+    async def _send_local(self, computer_id: int, message: Dict) -> bool:
+        """
+        Encola el mensaje para el socket de este nodo
+        
+        True = encolado; la escritura la hace el writer del agente. Si la
+        cola está llena, la telemetría descarta lo más viejo y los comandos
+        esperan (o fallan, según AGENT_COMMAND_OVERFLOW).
+        """
+        queue = self.send_queues.get(computer_id)
+        if queue is None:
+            return False
+        try:
+            return await queue.put(message)
+        except SendQueueFull as e:
+            logger.error(f"{e} - dropping {message.get('type')}")
+            return False
+    
+    def _on_send_error(self, queue: AgentSendQueue):
+        """El writer no pudo escribir en el socket: desconectar (si sigue siendo el actual)"""
+        if self.send_queues.get(queue.computer_id) is queue:
+            self.disconnect(queue.computer_id, queue.websocket)
+    
     async def broadcast(self, message: Dict):
         """Envía mensaje a todos los agentes conectados"""
-        disconnected = []
+        # Solo encolar: no depende del agente más lento
+        await asyncio.gather(*(
+            self._send_local(computer_id, message)
+            for computer_id in list(self.send_queues)
+        ))
         
-        for computer_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_json(message)
-                self.last_activity[computer_id] = datetime.utcnow()
-            except Exception as e:
-                logger.error(f"Error broadcasting to computer {computer_id}: {e}")
-                disconnected.append(computer_id)
-        
-        # Limpiar conexiones fallidas
-        for computer_id in disconnected:
-            self.disconnect(computer_id)
+        # Agentes conectados a otros nodos
+        for computer_id in list(self.remote_agents):
+            await self.send_message(computer_id, message)
     
     async def execute_warming(
         self,
         computer_id: int,
         execution_id: int,
         profile_id: str,  # ✅ CAMBIAR: Ahora es adspower_id (string)
-        script_actions: List[Dict]
+        script_actions: Optional[List[Dict]] = None,
+        script_hash: Optional[str] = None,
+        script_id: Optional[int] = None,
+        sync: Optional[Dict] = None
     ) -> bool:
-        """Ejecuta warming en un agente"""
+        """
+        Ejecuta warming en un agente
+        
+        Con script_hash solo viaja la referencia; el agente pide el cuerpo
+        (script_request) si no lo tiene en caché.
+        """
         
         command = {
             "type": "execute_warming",
             "execution_id": execution_id,
             "profile_id": profile_id,  # ✅ Ahora envía adspower_id
-            "actions": script_actions,
             "timestamp": datetime.utcnow().isoformat()
         }
+        if script_hash:
+            command["script_hash"] = script_hash
+            command["script_id"] = script_id
+        else:
+            command["actions"] = script_actions
+        if sync:
+            command["sync"] = sync
         
         success = await self.send_message(computer_id, command)
         
@@ -100,6 +304,22 @@ class ConnectionManager:
         
         return success
     
+    async def send_script_body(
+        self,
+        computer_id: int,
+        script_hash: str,
+        actions: Optional[List[Dict]]
+    ) -> bool:
+        """Responde un script_request del agente"""
+        
+        message = {"type": "script_body", "script_hash": script_hash}
+        if actions is None:
+            message["error"] = "Script not found"
+        else:
+            message["actions"] = actions
+        
+        return await self.send_message(computer_id, message)
+    
     async def stop_warming(self, computer_id: int, execution_id: int) -> bool:
         """Detiene warming en ejecución"""
         
@@ -121,25 +341,90 @@ class ConnectionManager:
         
         return await self.send_message(computer_id, command)
     
+    def accept_seq(self, computer_id: int, seq: int, epoch: Optional[str] = None) -> bool:
+        """
+        True si la secuencia del outbox es nueva (y la registra)
+        
+        Un epoch distinto es un journal nuevo (outbox.db borrado o movido):
+        sus secuencias empiezan de nuevo en 1.
+        """
+        if epoch and epoch != self.outbox_epoch.get(computer_id):
+            if computer_id in self.outbox_epoch or self.last_seq.get(computer_id):
+                logger.warning(f"Computer {computer_id} outbox epoch changed, resetting sequence")
+            self.outbox_epoch[computer_id] = epoch
+            self.last_seq[computer_id] = 0
+        
+        if seq <= self.last_seq.get(computer_id, 0):
+            return False
+        self.last_seq[computer_id] = seq
+        return True
+    
+    async def send_outbox_ack(self, computer_id: int, seq: int, epoch: Optional[str] = None) -> bool:
+        """
+        Confirma al agente los eventos del outbox hasta seq
+        
+        Se llama tras persistirlos; la secuencia queda en el registry para
+        que otro nodo descarte los reenvíos si el agente se reconecta allí.
+        """
+        if self.registry:
+            try:
+                await self.registry.save_last_seq(computer_id, seq, epoch)
+            except Exception as e:
+                logger.error(f"Registry seq save failed for computer {computer_id}: {e}")
+        return await self.send_message(computer_id, {"type": "outbox_ack", "seq": seq, "epoch": epoch})
+    
     def update_agent_state(self, computer_id: int, state: Dict):
         """Actualiza estado del agente"""
         self.agent_states[computer_id] = {
             **state,
             "last_updated": datetime.utcnow()
         }
+        self._publish_state(computer_id)
+    
+    def update_agent_admission(self, computer_id: int, admission: Dict):
+        """Actualiza solo el estado de admisión (cola/carga) del agente"""
+        state = self.agent_states.setdefault(computer_id, {})
+        state["admission"] = admission
+        state["last_updated"] = datetime.utcnow()
+        self._publish_state(computer_id)
+    
+    def update_agent_telemetry(self, computer_id: int, telemetry: Dict):
+        """Guarda el resumen de telemetría que llega en cada heartbeat"""
+        state = self.agent_states.setdefault(computer_id, {})
+        state["telemetry"] = telemetry
+        state["last_updated"] = datetime.utcnow()
+        self._publish_state(computer_id)
+    
+    def get_agent_queue_depth(self, computer_id: int) -> int:
+        """Ejecuciones en cola en el agente (según su último reporte)"""
+        state = self.agent_states.get(computer_id) or {}
+        return (state.get("admission") or {}).get("queue_depth", 0)
     
     def get_agent_state(self, computer_id: int) -> Optional[Dict]:
         """Obtiene estado del agente"""
-        return self.agent_states.get(computer_id)
+        if computer_id in self.agent_states:
+            return self.agent_states[computer_id]
+        return self.remote_agents.get(computer_id)
     
     def get_connected_agents(self) -> List[int]:
-        """Lista de computer_ids conectados"""
-        return list(self.active_connections.keys())
+        """Lista de computer_ids conectados (en este nodo o en otros)"""
+        return list(self.active_connections.keys()) + [
+            computer_id for computer_id in self.remote_agents
+            if computer_id not in self.active_connections
+        ]
     
     def is_connected(self, computer_id: int) -> bool:
         """Verifica si agente está conectado"""
+        return computer_id in self.active_connections or computer_id in self.remote_agents
+    
+    def is_local(self, computer_id: int) -> bool:
+        """El socket del agente está en este nodo"""
         return computer_id in self.active_connections
     
+    def get_send_queue_stats(self) -> Dict[int, Dict]:
+        """Mensajes enviados/encolados/descartados por agente local"""
+        return {computer_id: queue.get_stats() for computer_id, queue in self.send_queues.items()}
+    
     async def heartbeat_monitor(self):
         """Monitor de heartbeat (ejecutar en background)"""
         while True:
@@ -158,5 +443,15 @@ class ConnectionManager:
             for computer_id in disconnected:
                 self.disconnect(computer_id)
 
+def _build_manager() -> ConnectionManager:
+    from app.config import settings
+    return ConnectionManager(
+        send_queue_size=settings.AGENT_SEND_QUEUE_SIZE,
+        command_overflow=settings.AGENT_COMMAND_OVERFLOW,
+        send_block_timeout=settings.AGENT_SEND_BLOCK_TIMEOUT,
+        send_timeout=settings.AGENT_SEND_TIMEOUT
+    )
+
+
 # Instancia global
-connection_manager = ConnectionManager()
\ No newline at end of file
+connection_manager = _build_manager()
\ No newline at end of file
@@ -0,0 +1,199 @@
+# app/websocket/registry.py
+"""
+Registro compartido (Redis) de conexiones de agentes
+
+Permite correr la API con varios workers/réplicas: cada nodo registra
+qué agentes tiene conectados (owner con TTL), publica su estado y recibe
+por pub/sub los comandos dirigidos a sus agentes desde otros nodos.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import redis.asyncio as aioredis
+from loguru import logger
+
+
+OWNER_KEY = "agent_registry:owner:{computer_id}"
+STATE_KEY = "agent_registry:state:{computer_id}"
+CONNECTED_KEY = "agent_registry:connected"
+SEQ_KEY = "agent_registry:outbox_seq"
+EPOCH_KEY = "agent_registry:outbox_epoch"
+COMMAND_CHANNEL = "agent_registry:commands:{node_id}"
+
+# Borra el owner solo si sigue siendo este nodo (el agente pudo reconectarse a otro)
+_RELEASE_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def default_node_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class AgentRegistry:
+    """Owner de cada socket de agente y ruteo de comandos entre nodos"""
+
+    def __init__(self, redis_url: str, node_id: Optional[str] = None, owner_ttl: int = 90):
+        self.redis_url = redis_url
+        self.node_id = node_id or default_node_id()
+        self.owner_ttl = owner_ttl
+
+        self._client: Optional[aioredis.Redis] = None
+        self._release_owner = None
+        self._listener_task: Optional[asyncio.Task] = None
+
+    def _get_client(self) -> aioredis.Redis:
+        if self._client is None:
+            self._client = aioredis.from_url(self.redis_url, decode_responses=True)
+            self._release_owner = self._client.register_script(_RELEASE_OWNER)
+        return self._client
+
+    async def close(self):
+        await self.stop_listener()
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    # ---------- Ownership ----------
+
+    async def register(self, computer_id: int, state: Optional[Dict] = None):
+        """Este nodo pasa a ser owner del socket del agente"""
+        client = self._get_client()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.set(OWNER_KEY.format(computer_id=computer_id), self.node_id, ex=self.owner_ttl)
+            pipe.zadd(CONNECTED_KEY, {str(computer_id): time.time()})
+            if state is not None:
+                pipe.set(STATE_KEY.format(computer_id=computer_id), json.dumps(state, default=str), ex=self.owner_ttl)
+            await pipe.execute()
+
+    async def unregister(self, computer_id: int):
+        """Libera el agente si este nodo sigue siendo su owner"""
+        client = self._get_client()
+        released = await self._release_owner(
+            keys=[OWNER_KEY.format(computer_id=computer_id)],
+            args=[self.node_id]
+        )
+        if released:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zrem(CONNECTED_KEY, str(computer_id))
+                pipe.delete(STATE_KEY.format(computer_id=computer_id))
+                await pipe.execute()
+
+    async def refresh(self, computer_ids: Iterable[int]):
+        """Renueva el TTL de los agentes conectados a este nodo"""
+        computer_ids = list(computer_ids)
+        if not computer_ids:
+            return
+        now = time.time()
+        async with self._get_client().pipeline(transaction=False) as pipe:
+            for computer_id in computer_ids:
+                pipe.set(OWNER_KEY.format(computer_id=computer_id), self.node_id, ex=self.owner_ttl)
+                pipe.expire(STATE_KEY.format(computer_id=computer_id), self.owner_ttl)
+            pipe.zadd(CONNECTED_KEY, {str(cid): now for cid in computer_ids})
+            await pipe.execute()
+
+    async def get_owner(self, computer_id: int) -> Optional[str]:
+        return await self._get_client().get(OWNER_KEY.format(computer_id=computer_id))
+
+    async def publish_state(self, computer_id: int, state: Dict):
+        """Estado del agente visible para los demás nodos"""
+        await self._get_client().set(
+            STATE_KEY.format(computer_id=computer_id),
+            json.dumps(state, default=str),
+            ex=self.owner_ttl
+        )
+
+    async def snapshot(self) -> Tuple[List[int], Dict[int, Dict]]:
+        """Agentes conectados en cualquier nodo (vivos según TTL) y sus estados"""
+        client = self._get_client()
+        cutoff = time.time() - self.owner_ttl
+        await client.zremrangebyscore(CONNECTED_KEY, 0, cutoff)
+        computer_ids = [int(cid) for cid in await client.zrange(CONNECTED_KEY, 0, -1)]
+        if not computer_ids:
+            return [], {}
+
+        raw = await client.mget([STATE_KEY.format(computer_id=cid) for cid in computer_ids])
+        states = {}
+        for computer_id, value in zip(computer_ids, raw):
+            if value:
+                try:
+                    states[computer_id] = json.loads(value)
+                except ValueError:
+                    continue
+        return computer_ids, states
+
+    # ---------- Secuencias del outbox ----------
+
+    async def get_last_seq(self, computer_id: int) -> Tuple[Optional[str], int]:
+        """(epoch del journal del agente, última secuencia procesada)"""
+        async with self._get_client().pipeline(transaction=False) as pipe:
+            pipe.hget(EPOCH_KEY, str(computer_id))
+            pipe.hget(SEQ_KEY, str(computer_id))
+            epoch, seq = await pipe.execute()
+        return epoch, int(seq) if seq else 0
+
+    async def save_last_seq(self, computer_id: int, seq: int, epoch: Optional[str] = None):
+        async with self._get_client().pipeline(transaction=True) as pipe:
+            pipe.hset(SEQ_KEY, str(computer_id), seq)
+            if epoch:
+                pipe.hset(EPOCH_KEY, str(computer_id), epoch)
+            await pipe.execute()
+
+    # ---------- Ruteo de comandos ----------
+
+    async def route(self, node_id: str, computer_id: int, message: Dict) -> bool:
+        """Publica un comando para el nodo owner; True si algún nodo lo recibió"""
+        receivers = await self._get_client().publish(
+            COMMAND_CHANNEL.format(node_id=node_id),
+            json.dumps({"computer_id": computer_id, "message": message}, default=str)
+        )
+        return receivers > 0
+
+    async def start_listener(self, deliver: Callable[[int, Dict], Awaitable[bool]]):
+        """Recibe comandos de otros nodos para los agentes de este nodo"""
+        if self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen(deliver))
+            logger.info(f"Agent registry listening as node {self.node_id}")
+
+    async def stop_listener(self):
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+    async def _listen(self, deliver: Callable[[int, Dict], Awaitable[bool]]):
+        channel = COMMAND_CHANNEL.format(node_id=self.node_id)
+
+        while True:
+            pubsub = self._get_client().pubsub()
+            try:
+                await pubsub.subscribe(channel)
+                async for item in pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    try:
+                        payload = json.loads(item["data"])
+                        await deliver(int(payload["computer_id"]), payload["message"])
+                    except Exception as e:
+                        logger.error(f"Routed command delivery failed: {e}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Agent registry listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
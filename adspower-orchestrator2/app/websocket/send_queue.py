@@ -0,0 +1,145 @@
+# app/websocket/send_queue.py
+"""
+Cola de envío por conexión de agente
+
+Cada socket tiene su cola acotada y su propia tarea escritora: encolar es
+inmediato y un agente lento o medio caído solo frena su propia cola, no
+los envíos al resto de los agentes.
+"""
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+from fastapi import WebSocket
+from loguru import logger
+
+
+# Mensajes informativos: si la cola está llena se descarta el más viejo (nunca un comando)
+DROPPABLE_TYPES = {
+    "heartbeat_ack",
+    "status_request",
+    "selector_cache_seed",
+}
+
+
+class SendQueueFull(Exception):
+    """La cola del agente está llena y la política no permite descartar"""
+
+
+class AgentSendQueue:
+    """Cola acotada + writer task para un WebSocket de agente"""
+
+    def __init__(
+        self,
+        computer_id: int,
+        websocket: WebSocket,
+        max_size: int = 256,
+        command_overflow: str = "block",  # block | fail
+        block_timeout: float = 5.0,
+        send_timeout: float = 10.0,
+        on_error: Optional[Callable[["AgentSendQueue"], None]] = None
+    ):
+        self.computer_id = computer_id
+        self.websocket = websocket
+        self.max_size = max_size
+        self.command_overflow = command_overflow
+        self.block_timeout = block_timeout
+        self.send_timeout = send_timeout
+        self.on_error = on_error
+
+        # (mensaje, descartable)
+        self._items: Deque[Tuple[Dict, bool]] = deque()
+        self._not_empty = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._writer: Optional[asyncio.Task] = None
+        self.closed = False
+
+        self.stats = {'sent': 0, 'dropped': 0, 'rejected': 0}
+
+    def start(self):
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def close(self):
+        """Detiene el writer y descarta lo pendiente"""
+        self.closed = True
+        if self._writer and not self._writer.done():
+            self._writer.cancel()
+        self._items.clear()
+        self._space.set()  # despertar a los que esperan espacio
+
+    async def put(self, message: Dict) -> bool:
+        """Encola un mensaje según la política de overflow de su tipo"""
+        if self.closed:
+            return False
+
+        droppable = message.get("type") in DROPPABLE_TYPES
+
+        if len(self._items) >= self.max_size:
+            if droppable:
+                if not self._drop_oldest():
+                    # Cola llena solo de comandos: se descarta el mensaje nuevo
+                    self.stats['dropped'] += 1
+                    return False
+            elif self.command_overflow == "block":
+                if not await self._wait_for_space():
+                    self.stats['rejected'] += 1
+                    raise SendQueueFull(f"Send queue full for computer {self.computer_id}")
+            else:
+                self.stats['rejected'] += 1
+                raise SendQueueFull(f"Send queue full for computer {self.computer_id}")
+
+            if self.closed:
+                return False
+
+        self._items.append((message, droppable))
+        self._not_empty.set()
+        return True
+
+    def _drop_oldest(self) -> bool:
+        """Descarta el mensaje descartable más viejo; False si solo hay comandos"""
+        for index, (_, droppable) in enumerate(self._items):
+            if droppable:
+                del self._items[index]
+                self.stats['dropped'] += 1
+                return True
+        return False
+
+    async def _wait_for_space(self) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.block_timeout
+        while len(self._items) >= self.max_size and not self.closed:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            self._space.clear()
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _write_loop(self):
+        while True:
+            try:
+                while not self._items:
+                    self._not_empty.clear()
+                    await self._not_empty.wait()
+
+                message, _ = self._items.popleft()
+                self._space.set()
+
+                await asyncio.wait_for(self.websocket.send_json(message), timeout=self.send_timeout)
+                self.stats['sent'] += 1
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error sending message to computer {self.computer_id}: {e}")
+                self.closed = True
+                if self.on_error:
+                    self.on_error(self)
+                break
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'queued': len(self._items)}
@@ -5,7 +5,8 @@ from rich.console import Console
 from rich.progress import Progress
 import asyncio
 from app.database import AsyncSessionLocal
-from app.services.profile_service import ProfileService
+from app.services.bulk_profile_service import BulkProfileService
+from app.integrations.adspower_client import adspower_registry
 from app.schemas.profile import ProfileCreate
 
 app = typer.Typer()
@@ -23,36 +24,49 @@ def create_profiles(
     
     async def _bulk_create():
         async with AsyncSessionLocal() as db:
-            service = ProfileService(db)
+            service = BulkProfileService(db)
             
             results = {
                 'successful': 0,
                 'failed': 0
             }
             
+            profiles_in = [
+                ProfileCreate(
+                    computer_id=computer_id,
+                    name=f"Bulk_Profile_{i+1}",
+                    proxy_type=proxy_type,
+                    proxy_country=country,
+                    auto_warmup=auto_warmup,
+                    warmup_duration_minutes=15
+                )
+                for i in range(count)
+            ]
+            
+            try:
+                profiles_in = await service.assign_proxies(
+                    profiles_in,
+                    proxy_type=proxy_type,
+                    country=country
+                )
+            except ValueError as e:
+                console.print(f"[red]{e}[/red]")
+                return
+            
             with Progress() as progress:
                 task = progress.add_task(f"Creating {count} profiles...", total=count)
                 
-                for i in range(count):
-                    try:
-                        profile_in = ProfileCreate(
-                            computer_id=computer_id,
-                            name=f"Bulk_Profile_{i+1}",
-                            proxy_type=proxy_type,
-                            proxy_country=country,
-                            auto_warmup=auto_warmup,
-                            warmup_duration_minutes=15
-                        )
-                        
-                        await service.create_profile(profile_in)
+                async for result in service.create_profiles(profiles_in):
+                    if result['success']:
                         results['successful'] += 1
-                        
-                    except Exception as e:
-                        console.print(f"[red]Error creating profile {i+1}: {e}[/red]")
+                    else:
+                        console.print(f"[red]Error creating profile {result['index']+1}: {result['error']}[/red]")
                         results['failed'] += 1
                     
                     progress.update(task, advance=1)
             
+            await adspower_registry.close_all()
+            
             console.print(f"[green]✓ Bulk creation completed[/green]")
             console.print(f"  Successful: {results['successful']}")
             console.print(f"  Failed: {results['failed']}")
@@ -64,6 +64,8 @@ def proxies(limit: int = typer.Option(50, help="Max proxies to check")):
             console.print(f"  Total checked: {result['total']}")
             console.print(f"  Successful: {result['success']}")
             console.print(f"  Failed: {result['failed']}")
+            console.print(f"  Not checked (deadline): {result['timed_out']}")
+            console.print(f"  Duration: {result['duration_seconds']}s")
     
     asyncio.run(_check())
 
@@ -0,0 +1,53 @@
+# tests/test_api/test_warming.py
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.computer import Computer
+from app.models.profile import Profile
+from app.models.warming_script import WarmingScript, WarmingExecution
+from app.websocket.manager import connection_manager
+
+
+async def _script_with_profiles(db: AsyncSession, count: int):
+    computer = Computer(
+        name="Sync Computer",
+        hostname="sync-host",
+        ip_address="192.168.1.100",
+        adspower_api_url="http://localhost:50325",
+        adspower_api_key="test-key"
+    )
+    script = WarmingScript(name="Sync Script", actions=[{"type": "navigate", "url": "https://google.com"}])
+    db.add_all([computer, script])
+    await db.flush()
+
+    profiles = [
+        Profile(adspower_id=f"ads_sync_{i}", name=f"Profile {i}", computer_id=computer.id)
+        for i in range(count)
+    ]
+    db.add_all(profiles)
+    await db.commit()
+    return script.id, computer.id, [p.id for p in profiles]
+
+
+@pytest.mark.asyncio
+async def test_synchronized_batch_over_agent_capacity_is_rejected(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    monkeypatch
+):
+    """Test que un batch sincronizado con más profiles que max_running se rechaza"""
+    script_id, computer_id, profile_ids = await _script_with_profiles(db_session, 3)
+    monkeypatch.setitem(connection_manager.active_connections, computer_id, object())
+    monkeypatch.setitem(connection_manager.agent_states, computer_id, {"admission": {"max_running": 2}})
+
+    response = await client.post("/api/v1/warming/execute/batch", json={
+        "script_id": script_id,
+        "profile_ids": profile_ids,
+        "synchronized": True
+    })
+
+    assert response.status_code == 400
+    assert f"Computer {computer_id} runs at most 2" in response.json()["detail"]
+    assert await db_session.scalar(select(func.count()).select_from(WarmingExecution)) == 0
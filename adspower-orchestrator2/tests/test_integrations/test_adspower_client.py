@@ -0,0 +1,35 @@
+# tests/test_integrations/test_adspower_client.py
+import pytest
+from app.integrations.adspower_client import AdsPowerClientRegistry
+
+@pytest.mark.asyncio
+async def test_registry_reuses_pool_per_instance():
+    """Test mismo (api_url, api_key) comparte pool"""
+    registry = AdsPowerClientRegistry()
+    
+    client_a = registry.get_client("http://localhost:50325/", "key-a")
+    client_b = registry.get_client("http://localhost:50325", "key-a")
+    client_c = registry.get_client("http://localhost:50325", "key-b")
+    
+    assert client_a.http_client is client_b.http_client
+    assert client_a.http_client is not client_c.http_client
+    assert registry.get_pool_count() == 2
+    
+    await registry.close_all()
+
+@pytest.mark.asyncio
+async def test_registry_close_all():
+    """Test cerrar todos los pools"""
+    registry = AdsPowerClientRegistry()
+    
+    client = registry.get_client("http://localhost:50325", "key-a")
+    await registry.close_all()
+    
+    assert client.http_client.is_closed
+    assert registry.get_pool_count() == 0
+    
+    # Un nuevo get_client crea un pool nuevo
+    new_client = registry.get_client("http://localhost:50325", "key-a")
+    assert not new_client.http_client.is_closed
+    
+    await registry.close_all()
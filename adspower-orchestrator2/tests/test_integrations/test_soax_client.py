@@ -0,0 +1,117 @@
+# tests/test_integrations/test_soax_client.py
+import asyncio
+
+import pytest
+
+from app.integrations import soax_client
+from app.integrations.soax_client import SOAXClient, TEST_SERVICES, _TTLCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    """Caches de módulo vacíos en cada test"""
+    monkeypatch.setattr(soax_client, "_geo_cache", _TTLCache(ttl_seconds=3600))
+    monkeypatch.setattr(soax_client, "_session_ips", _TTLCache(ttl_seconds=3600))
+    monkeypatch.setattr(soax_client, "_probe_stats", {})
+
+
+def _stub_services(client, monkeypatch, behaviour):
+    """behaviour: nombre de servicio -> (segundos, datos o excepción)"""
+    calls = []
+
+    async def probe_service(http_client, service):
+        calls.append(service["name"])
+        delay, result = behaviour[service["name"]]
+        await asyncio.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return dict(result)
+
+    monkeypatch.setattr(client, "_probe_service", probe_service)
+    return calls
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    """Test que una entrada vencida ya no se retorna"""
+    now = [1000.0]
+    monkeypatch.setattr(soax_client.time, "monotonic", lambda: now[0])
+    cache = _TTLCache(ttl_seconds=60)
+
+    cache.set("ip", {"country": "US"})
+    now[0] += 59
+    assert cache.get("ip") == {"country": "US"}
+
+    now[0] += 2
+    assert cache.get("ip") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test que al superar max_size se descarta el menos usado"""
+    cache = _TTLCache(ttl_seconds=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+@pytest.mark.asyncio
+async def test_race_uses_first_successful_service(monkeypatch):
+    """Test que gana el primer servicio que responde bien y el resto se cancela"""
+    client = SOAXClient("user", "pass")
+    _stub_services(client, monkeypatch, {
+        "ipify": (0.0, RuntimeError("blocked")),
+        "ip-api": (0.05, {"ip": "1.2.3.4", "country": "US"}),
+        "httpbin": (1.0, {"ip": "5.6.7.8"}),
+    })
+
+    data, probe = await client._race_services(None, TEST_SERVICES)
+
+    assert data == {"ip": "1.2.3.4", "country": "US"}
+    assert probe["service"] == "ip-api"
+    assert "ipify" in probe["errors"]
+    assert probe["timings_ms"]["httpbin"] is None
+    assert "httpbin" not in probe["errors"]
+
+
+@pytest.mark.asyncio
+async def test_race_returns_none_when_all_services_fail(monkeypatch):
+    """Test que sin respuestas válidas no hay datos"""
+    client = SOAXClient("user", "pass")
+    _stub_services(client, monkeypatch, {
+        name: (0.0, RuntimeError("down")) for name in ("ipify", "ip-api", "httpbin")
+    })
+
+    data, probe = await client._race_services(None, TEST_SERVICES)
+
+    assert data is None
+    assert probe["service"] is None
+    assert set(probe["errors"]) == {"ipify", "ip-api", "httpbin"}
+
+
+@pytest.mark.asyncio
+async def test_sticky_session_skips_geo_service_once_known(monkeypatch):
+    """Test que con la IP y el geo de la sesión en caché no se consulta ip-api"""
+    client = SOAXClient("user", "pass")
+    calls = _stub_services(client, monkeypatch, {
+        "ipify": (0.02, {"ip": "1.2.3.4"}),
+        "ip-api": (0.0, {"ip": "1.2.3.4", "country": "US", "city": "Miami", "isp": "SOAX"}),
+        "httpbin": (0.05, {"ip": "1.2.3.4"}),
+    })
+    proxy_config = client.get_proxy_config(country="us", session_id="abc")
+
+    first = await client.test_proxy(proxy_config)
+    assert first["success"]
+    assert first["country"] == "US"
+    assert "ip-api" in calls
+
+    calls.clear()
+    second = await client.test_proxy(proxy_config)
+
+    assert second["success"]
+    assert second["country"] == "US"
+    assert "ip-api" not in calls
+    assert second["probe"]["service"] == "ipify"
@@ -69,4 +69,45 @@ async def test_get_available_computers(db_session: AsyncSession):
     # Get available
     computers = await repo.get_available(min_capacity=1)
     
-    assert len(computers) >= 1
\ No newline at end of file
+    assert len(computers) >= 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_status(db_session: AsyncSession):
+    """Test aplicar transiciones de status en un solo UPDATE"""
+    from datetime import datetime
+    from app.models.computer import ComputerStatus
+    
+    repo = ComputerRepository(db_session)
+    
+    online = await repo.create({
+        "name": "Online Computer",
+        "hostname": "online-host",
+        "ip_address": "192.168.1.101",
+        "adspower_api_url": "http://host.docker.internal:50325",
+        "adspower_api_key": "0cbbd771ae5f6fad7ff4917bc66c95be",
+        "status": ComputerStatus.OFFLINE
+    })
+    offline = await repo.create({
+        "name": "Offline Computer",
+        "hostname": "offline-host",
+        "ip_address": "192.168.1.102",
+        "adspower_api_url": "http://host.docker.internal:50325",
+        "adspower_api_key": "0cbbd771ae5f6fad7ff4917bc66c95be",
+        "status": ComputerStatus.OFFLINE
+    })
+    await db_session.commit()
+    
+    now = datetime.utcnow()
+    updated = await repo.bulk_update_status({
+        online.id: (ComputerStatus.ONLINE, now),
+        offline.id: (ComputerStatus.OFFLINE, now),  # sin cambio, no se escribe
+    })
+    await db_session.commit()
+    
+    assert updated == 1
+    
+    mismatches = await repo.get_status_mismatches([offline.id])
+    
+    assert (online.id, ComputerStatus.OFFLINE) in mismatches
+    assert (offline.id, ComputerStatus.ONLINE) in mismatches
@@ -0,0 +1,70 @@
+# tests/test_repositories/test_proxy_repository.py
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.repositories.proxy_repository import ProxyRepository
+from app.models.proxy import ProxyStatus
+
+def _proxy_data(session_id: str) -> dict:
+    return {
+        "proxy_type": "mobile",
+        "host": "proxy.soax.com",
+        "port": 5000,
+        "username": f"user-sessionid-{session_id}",
+        "password": "secret",
+        "country": "ec",
+        "session_id": session_id,
+        "status": ProxyStatus.ACTIVE,
+        "total_checks": 0,
+        "failed_checks": 0
+    }
+
+@pytest.mark.asyncio
+async def test_bulk_update_health_checks(db_session: AsyncSession):
+    """Test aplicar varios resultados en un solo statement"""
+    repo = ProxyRepository(db_session)
+    
+    ok = await repo.create(_proxy_data("ok-session"))
+    ko = await repo.create(_proxy_data("ko-session"))
+    await db_session.commit()
+    
+    updated = await repo.bulk_update_health_checks([
+        (ok.id, {"success": True, "ip": "1.2.3.4", "country": "EC", "response_time_ms": 120.5}),
+        (ko.id, {"success": False}),
+    ])
+    await db_session.commit()
+    
+    assert updated == 2
+    
+    ok = await repo.get(ok.id)
+    ko = await repo.get(ko.id)
+    await db_session.refresh(ok)
+    await db_session.refresh(ko)
+    
+    assert ok.total_checks == 1
+    assert ok.failed_checks == 0
+    assert ok.success_rate == 100.0
+    assert ok.detected_ip == "1.2.3.4"
+    
+    assert ko.total_checks == 1
+    assert ko.failed_checks == 1
+    assert ko.success_rate == 0.0
+    assert ko.status == ProxyStatus.ACTIVE
+
+@pytest.mark.asyncio
+async def test_update_health_check_marks_failed(db_session: AsyncSession):
+    """Test 3 fallos marcan el proxy como failed"""
+    repo = ProxyRepository(db_session)
+    
+    proxy = await repo.create(_proxy_data("failing-session"))
+    await db_session.commit()
+    
+    for _ in range(3):
+        await repo.update_health_check(proxy.id, {"success": False})
+    await db_session.commit()
+    
+    proxy = await repo.get(proxy.id)
+    await db_session.refresh(proxy)
+    
+    assert proxy.failed_checks == 3
+    assert proxy.status == ProxyStatus.FAILED
+    assert proxy.is_available is False
@@ -0,0 +1,135 @@
+# tests/test_repositories/test_warming_event_repository.py
+from datetime import date, datetime, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.computer import Computer
+from app.models.profile import Profile
+from app.models.warming_script import WarmingScript, WarmingExecution, ExecutionStatus
+from app.repositories.warming_event_repository import (
+    WarmingEventRepository,
+    _month_start,
+    event_type_for,
+    partition_name,
+)
+
+
+def test_month_start_rolls_over_year():
+    """Test desplazamiento de meses cruzando año"""
+    assert _month_start(date(2024, 11, 17)) == date(2024, 11, 1)
+    assert _month_start(date(2024, 11, 17), 2) == date(2025, 1, 1)
+    assert _month_start(date(2024, 1, 5), -1) == date(2023, 12, 1)
+
+
+def test_partition_name():
+    """Test nombre de partición mensual"""
+    assert partition_name(date(2024, 3, 1)) == "warming_execution_events_y2024m03"
+
+
+def test_event_type_for_statuses():
+    """Test vocabulario único de event_type para el log"""
+    assert event_type_for(ExecutionStatus.RUNNING, 3) == "action"
+    assert event_type_for(ExecutionStatus.RUNNING) == "progress"
+    assert event_type_for(ExecutionStatus.COMPLETED, 3) == "completed"
+    assert event_type_for(ExecutionStatus.FAILED) == "failed"
+    assert event_type_for(ExecutionStatus.CANCELLED) == "cancelled"
+
+
+async def _execution_with_events(db: AsyncSession, count: int, created_at: datetime = None) -> int:
+    computer = Computer(
+        name="Test Computer",
+        hostname="test-host",
+        ip_address="192.168.1.100",
+        adspower_api_url="http://localhost:50325",
+        adspower_api_key="test-key"
+    )
+    script = WarmingScript(name="Test Script", actions=[{"type": "navigate", "url": "https://google.com"}])
+    db.add_all([computer, script])
+    await db.flush()
+
+    profile = Profile(adspower_id="ads_events", name="Profile", computer_id=computer.id)
+    db.add(profile)
+    await db.flush()
+
+    execution = WarmingExecution(script_id=script.id, profile_id=profile.id, computer_id=computer.id)
+    db.add(execution)
+    await db.flush()
+
+    events = [
+        {"execution_id": execution.id, "action_index": i, "event_type": "action", "payload": {"i": i}}
+        for i in range(count)
+    ]
+    if created_at:
+        for e in events:
+            e["created_at"] = created_at
+    await WarmingEventRepository(db).add_many(events)
+    await db.commit()
+    return execution.id
+
+
+@pytest.mark.asyncio
+async def test_get_page_follows_cursor(db_session: AsyncSession):
+    """Test paginación por cursor hasta la última página"""
+    execution_id = await _execution_with_events(db_session, 5)
+    repo = WarmingEventRepository(db_session)
+
+    first, cursor = await repo.get_page(execution_id, limit=2)
+    second, cursor2 = await repo.get_page(execution_id, limit=2, after_id=cursor)
+    last, cursor3 = await repo.get_page(execution_id, limit=2, after_id=cursor2)
+
+    assert [e.action_index for e in first + second + last] == [0, 1, 2, 3, 4]
+    assert cursor == first[-1].id
+    assert cursor3 is None
+
+
+@pytest.mark.asyncio
+async def test_get_execution_events_after_cursor(client: AsyncClient, db_session: AsyncSession):
+    """Test GET /executions/{id} con events_limit y after"""
+    execution_id = await _execution_with_events(db_session, 3)
+
+    response = await client.get(f"/api/v1/warming/executions/{execution_id}", params={"events_limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert [e["action_index"] for e in page["events"]] == [0, 1]
+    assert page["next_cursor"] is not None
+
+    response = await client.get(
+        f"/api/v1/warming/executions/{execution_id}",
+        params={"events_limit": 2, "after": page["next_cursor"]}
+    )
+    page = response.json()
+    assert [e["action_index"] for e in page["events"]] == [2]
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_moves_rows_from_default(db_session: AsyncSession):
+    """Test que un mes con filas en DEFAULT igual obtiene su partición"""
+    month = date(2031, 5, 1)
+    execution_id = await _execution_with_events(
+        db_session, 3, created_at=datetime(2031, 5, 10, tzinfo=timezone.utc)
+    )
+    repo = WarmingEventRepository(db_session)
+
+    created = await repo.ensure_partitions(months_ahead=0, today=month)
+    await db_session.commit()
+
+    assert created == [partition_name(month)]
+    assert await db_session.scalar(text(f"SELECT count(*) FROM {partition_name(month)}")) == 3
+    assert await db_session.scalar(text("SELECT count(*) FROM warming_execution_events_default")) == 0
+
+    events, _ = await repo.get_page(execution_id)
+    assert [e.action_index for e in events] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_prune_default_before_cutoff(db_session: AsyncSession):
+    """Test retención por DELETE en la partición DEFAULT"""
+    await _execution_with_events(db_session, 2, created_at=datetime(2020, 1, 15, tzinfo=timezone.utc))
+    repo = WarmingEventRepository(db_session)
+
+    assert await repo.prune_default_before(date(2019, 12, 1)) == 0
+    assert await repo.prune_default_before(date(2020, 2, 1)) == 2
@@ -0,0 +1,125 @@
+# tests/test_services/test_bulk_profile_service.py
+import asyncio
+
+import pytest
+
+from app.models.computer import Computer
+from app.models.proxy import Proxy
+from app.schemas.profile import ProfileCreate
+from app.services import bulk_profile_service
+from app.services.bulk_profile_service import BulkProfileService
+
+
+class FakeAdsPowerClient:
+    """Cliente de AdsPower falso: cada create_profile tarda `delay`"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.created = []
+
+    async def create_profile(self, data):
+        await asyncio.sleep(self.delay)
+        adspower_id = f"ads_{len(self.created) + 1}"
+        self.created.append(adspower_id)
+        return {"code": 0, "data": {"id": adspower_id}}
+
+
+class FakeSession:
+    """Sesión falsa: registra cada commit"""
+
+    def __init__(self):
+        self.commits = []
+        self._added = []
+
+    def add_all(self, objects):
+        self._added.extend(objects)
+
+    async def commit(self):
+        self.commits.append([p.adspower_id for p in self._added])
+        self._added = []
+
+    async def rollback(self):
+        self._added = []
+
+
+@pytest.fixture
+def adspower(monkeypatch):
+    client = FakeAdsPowerClient()
+    monkeypatch.setattr(bulk_profile_service.adspower_registry, "get_client", lambda url, key: client)
+    return client
+
+
+def _service(session, **kwargs):
+    service = BulkProfileService(session, requests_per_second=1000, **kwargs)
+    rows = {
+        Computer: {1: Computer(id=1, adspower_api_url="http://adspower:50325", adspower_api_key="key")},
+        Proxy: {1: Proxy(id=1, proxy_type="residential", host="proxy", port=8080)}
+    }
+
+    async def load_by_ids(model, ids):
+        return {i: rows[model][i] for i in ids if i in rows[model]}
+
+    service._load_by_ids = load_by_ids
+    return service
+
+
+def _profiles(count, computer_id=1):
+    return [
+        ProfileCreate(name=f"Profile {i}", computer_id=computer_id, proxy_id=1)
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bulk_persists_in_batches(adspower):
+    """Test que los perfiles se persisten de a batch_size por commit"""
+    session = FakeSession()
+    service = _service(session, batch_size=2)
+
+    outputs = [output async for output in service.create_profiles(_profiles(5))]
+
+    assert all(output["success"] for output in outputs)
+    assert [len(batch) for batch in session.commits] == [2, 2, 1]
+    assert sorted(output["adspower_id"] for output in outputs) == sorted(adspower.created)
+
+
+@pytest.mark.asyncio
+async def test_bulk_emits_failures_before_batch_flush(adspower):
+    """Test que un fallo se emite sin esperar a que se complete el lote"""
+    adspower.delay = 0.05
+    session = FakeSession()
+    service = _service(session, batch_size=10)
+    profiles = _profiles(3) + [ProfileCreate(name="Orphan", computer_id=99, proxy_id=1)]
+
+    results = service.create_profiles(profiles)
+    first = await results.__anext__()
+
+    assert not first["success"]
+    assert first["index"] == 3
+    assert "Computer 99 not found" in first["error"]
+    assert session.commits == []
+
+    rest = [output async for output in results]
+    assert len(rest) == 3
+    assert all(output["success"] for output in rest)
+
+
+@pytest.mark.asyncio
+async def test_bulk_abort_persists_profiles_created_in_adspower(adspower):
+    """Test que si el consumidor aborta, lo ya creado en AdsPower queda en la DB"""
+    adspower.delay = 0.05
+    session = FakeSession()
+    service = _service(session, max_concurrency=2, batch_size=10)
+    profiles = [ProfileCreate(name="Orphan", computer_id=99, proxy_id=1)] + _profiles(4)
+
+    results = service.create_profiles(profiles)
+    first = await results.__anext__()
+    assert not first["success"]
+
+    # El consumidor se va con 2 creaciones en vuelo y 2 esperando
+    await asyncio.sleep(0.01)
+    await results.aclose()
+
+    persisted = [adspower_id for batch in session.commits for adspower_id in batch]
+    assert len(adspower.created) == 2
+    assert sorted(persisted) == sorted(adspower.created)
@@ -0,0 +1,78 @@
+# tests/test_services/test_connection_manager.py
+import asyncio
+
+import pytest
+
+from app.websocket.manager import ConnectionManager
+from app.websocket.registry import AgentRegistry
+
+
+class FakeWebSocket:
+    """WebSocket falso que guarda lo enviado"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+
+async def _wait_for(condition, timeout: float = 2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not met"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_stale_socket_disconnect_keeps_new_connection():
+    """Test que el cierre del socket reemplazado no desconecta la reconexión"""
+    manager = ConnectionManager()
+    transitions = []
+    manager.add_status_listener(lambda computer_id, connected: transitions.append(connected))
+
+    old_socket, new_socket = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(old_socket, 1)
+    await manager.connect(new_socket, 1)
+
+    # El handler viejo recibe WebSocketDisconnect recién ahora
+    manager.disconnect(1, old_socket)
+
+    assert manager.is_connected(1)
+    assert manager.active_connections[1] is new_socket
+    assert not manager.send_queues[1].closed
+    assert transitions == [True, True]
+
+    manager.disconnect(1, new_socket)
+    assert not manager.is_connected(1)
+    assert transitions == [True, True, False]
+
+
+@pytest.mark.asyncio
+async def test_command_routed_to_owner_node(redis_url):
+    """Test que un comando para un agente de otro nodo llega por pub/sub"""
+    owner = ConnectionManager()
+    other = ConnectionManager()
+    await owner.start_registry(AgentRegistry(redis_url, node_id="node-a"), sync_interval=0.05)
+    await other.start_registry(AgentRegistry(redis_url, node_id="node-b"), sync_interval=0.05)
+
+    websocket = FakeWebSocket()
+    await owner.connect(websocket, 1)
+    await asyncio.sleep(0.1)  # listener suscrito
+
+    assert await other.stop_warming(1, execution_id=42)
+    await _wait_for(lambda: any(m.get("type") == "stop_warming" for m in websocket.sent))
+
+    await _wait_for(lambda: 1 in other.remote_agents)
+
+    # Al desconectarse en el owner, el otro nodo ya no lo ve
+    owner.disconnect(1, websocket)
+    await _wait_for(lambda: 1 not in other.remote_agents)
+    assert not await other.stop_warming(1, execution_id=42)
+
+    await owner.stop_registry()
+    await other.stop_registry()
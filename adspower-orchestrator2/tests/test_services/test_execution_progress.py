@@ -0,0 +1,64 @@
+# tests/test_services/test_execution_progress.py
+import pytest
+
+from app.services.execution_progress import ExecutionProgressAggregator
+from app.websocket.manager import ConnectionManager
+
+
+@pytest.mark.asyncio
+async def test_acks_sent_after_flush():
+    """Test que el ack del outbox sale en el flush con la secuencia más alta"""
+    aggregator = ExecutionProgressAggregator()
+    sent = []
+
+    async def sender(computer_id, seq, epoch=None):
+        sent.append((computer_id, seq))
+
+    aggregator.ack_sender = sender
+    aggregator.ack_after_flush(1, 5)
+    aggregator.ack_after_flush(1, 3)
+    aggregator.ack_after_flush(2, 7)
+
+    assert sent == []
+    await aggregator.flush()
+    assert sorted(sent) == [(1, 5), (2, 7)]
+
+
+def test_accept_seq_discards_replayed_events():
+    """Test que eventos reenviados con secuencia ya vista se descartan"""
+    manager = ConnectionManager()
+
+    assert manager.accept_seq(1, 1)
+    assert manager.accept_seq(1, 2)
+    assert not manager.accept_seq(1, 2)
+    assert not manager.accept_seq(1, 1)
+    assert manager.accept_seq(2, 1)
+
+
+def test_accept_seq_resets_when_outbox_epoch_changes():
+    """Test que un journal nuevo del agente (secuencias desde 1) no se descarta"""
+    manager = ConnectionManager()
+
+    assert manager.accept_seq(1, 41, "epoch-a")
+    assert manager.accept_seq(1, 42, "epoch-a")
+    assert not manager.accept_seq(1, 42, "epoch-a")
+
+    assert manager.accept_seq(1, 1, "epoch-b")
+    assert not manager.accept_seq(1, 1, "epoch-b")
+
+
+@pytest.mark.asyncio
+async def test_ack_of_new_epoch_replaces_pending_ack():
+    """Test que el ack pendiente de un journal anterior no se envía al nuevo"""
+    aggregator = ExecutionProgressAggregator()
+    sent = []
+
+    async def sender(computer_id, seq, epoch=None):
+        sent.append((computer_id, seq, epoch))
+
+    aggregator.ack_sender = sender
+    aggregator.ack_after_flush(1, 500, "epoch-a")
+    aggregator.ack_after_flush(1, 3, "epoch-b")
+
+    await aggregator.flush()
+    assert sent == [(1, 3, "epoch-b")]
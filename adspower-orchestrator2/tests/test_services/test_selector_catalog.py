@@ -0,0 +1,59 @@
+# tests/test_services/test_selector_catalog.py
+import time
+
+import pytest
+
+from app.services.selector_catalog import SelectorCatalog
+
+
+@pytest.mark.asyncio
+async def test_export_picks_selector_with_most_hits(redis_url):
+    """Test que se exporta el selector con más aciertos sumando agentes"""
+    catalog = SelectorCatalog(redis_url)
+    now = time.time()
+
+    await catalog.merge(1, [{"domain": "google.com", "group": "search_box", "selector": "textarea[name='q']", "hits": 5, "last_hit": now}])
+    await catalog.merge(2, [{"domain": "google.com", "group": "search_box", "selector": "input[name='q']", "hits": 3, "last_hit": now}])
+    await catalog.merge(3, [{"domain": "google.com", "group": "search_box", "selector": "input[name='q']", "hits": 4, "last_hit": now}])
+
+    [entry] = await catalog.export()
+    assert entry["selector"] == "input[name='q']"
+    assert entry["hits"] == 7
+    await catalog.close()
+
+
+@pytest.mark.asyncio
+async def test_repeated_export_does_not_double_count(redis_url):
+    """Test que un agente que re-exporta reemplaza sus propios contadores"""
+    catalog = SelectorCatalog(redis_url)
+    item = {"domain": "google.com", "group": "search_box", "selector": "textarea[name='q']", "hits": 5}
+
+    await catalog.merge(1, [item])
+    await catalog.merge(1, [item])
+
+    assert (await catalog.export())[0]["hits"] == 5
+    await catalog.close()
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_dropped(redis_url):
+    """Test que las entradas sin aciertos dentro del TTL se descartan"""
+    catalog = SelectorCatalog(redis_url, ttl=60)
+    await catalog.merge(1, [{"domain": "a.com", "group": "g", "selector": "#x", "hits": 1, "last_hit": time.time() - 120}])
+
+    assert await catalog.export() == []
+    assert await catalog.size() == 0
+    await catalog.close()
+
+
+@pytest.mark.asyncio
+async def test_catalog_is_shared_between_workers(redis_url):
+    """Test que lo exportado a un worker lo ve otro (misma base de Redis)"""
+    worker_a = SelectorCatalog(redis_url)
+    worker_b = SelectorCatalog(redis_url)
+
+    await worker_a.merge(1, [{"domain": "a.com", "group": "g", "selector": "#x", "hits": 2}])
+
+    assert [e["selector"] for e in await worker_b.export()] == ["#x"]
+    await worker_a.close()
+    await worker_b.close()
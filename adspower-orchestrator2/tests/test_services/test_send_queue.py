@@ -0,0 +1,85 @@
+# tests/test_services/test_send_queue.py
+import asyncio
+
+import pytest
+
+from app.websocket.send_queue import AgentSendQueue, SendQueueFull
+
+
+class SlowWebSocket:
+    """WebSocket falso que tarda en escribir"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = []
+
+    async def send_json(self, message):
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+
+@pytest.mark.asyncio
+async def test_put_does_not_wait_for_slow_socket():
+    """Test que encolar es inmediato aunque el socket sea lento"""
+    websocket = SlowWebSocket(delay=10)
+    queue = AgentSendQueue(1, websocket, max_size=10)
+    queue.start()
+
+    await asyncio.wait_for(queue.put({"type": "execute_warming", "execution_id": 1}), timeout=0.1)
+    assert queue.get_stats()["queued"] <= 1
+
+    queue.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_oldest_telemetry():
+    """Test que con la cola llena se descarta el mensaje informativo más viejo"""
+    queue = AgentSendQueue(1, SlowWebSocket(), max_size=2)
+
+    await queue.put({"type": "heartbeat_ack", "n": 1})
+    await queue.put({"type": "stop_warming", "execution_id": 1})
+    await queue.put({"type": "heartbeat_ack", "n": 2})
+
+    assert [m for m, _ in queue._items] == [
+        {"type": "stop_warming", "execution_id": 1},
+        {"type": "heartbeat_ack", "n": 2}
+    ]
+    assert queue.stats["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_telemetry_never_evicts_commands():
+    """Test que con la cola llena de comandos se descarta la telemetría nueva"""
+    queue = AgentSendQueue(1, SlowWebSocket(), max_size=2)
+
+    await queue.put({"type": "execute_warming", "execution_id": 1})
+    await queue.put({"type": "execute_warming", "execution_id": 2})
+    assert not await queue.put({"type": "heartbeat_ack"})
+
+    assert [m["execution_id"] for m, _ in queue._items] == [1, 2]
+    assert queue.stats["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_fails_commands():
+    """Test que con política fail un comando no entra en la cola llena"""
+    queue = AgentSendQueue(1, SlowWebSocket(), max_size=1, command_overflow="fail")
+    await queue.put({"type": "execute_warming", "execution_id": 1})
+
+    with pytest.raises(SendQueueFull):
+        await queue.put({"type": "execute_warming", "execution_id": 2})
+
+
+@pytest.mark.asyncio
+async def test_blocked_command_enters_when_writer_drains():
+    """Test que un comando bloqueado entra cuando el writer libera espacio"""
+    websocket = SlowWebSocket(delay=0.05)
+    queue = AgentSendQueue(1, websocket, max_size=1, block_timeout=1)
+    await queue.put({"type": "execute_warming", "execution_id": 1})
+    queue.start()
+
+    await queue.put({"type": "execute_warming", "execution_id": 2})
+    await asyncio.sleep(0.2)
+
+    assert [m["execution_id"] for m in websocket.sent] == [1, 2]
+    queue.close()
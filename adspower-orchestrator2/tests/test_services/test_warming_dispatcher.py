@@ -0,0 +1,241 @@
+# tests/test_services/test_warming_dispatcher.py
+import pytest
+
+from app.services.warming_dispatcher import WarmingDispatcher
+
+
+def _items(*execution_ids):
+    return [
+        {"execution_id": eid, "profile_id": f"ads_{eid}", "script_hash": "abc", "script_id": 1, "sync": None}
+        for eid in execution_ids
+    ]
+
+
+def _dispatcher(queue, cancelled=(), fail_on=()):
+    """Dispatcher con la cola de Redis y la consulta a DB reemplazadas por memoria"""
+    dispatcher = WarmingDispatcher()
+    sent = []
+
+    async def sender(computer_id, **command):
+        if command["execution_id"] in fail_on:
+            return False
+        sent.append((computer_id, command["execution_id"]))
+        return True
+
+    async def take(computer_id, count):
+        taken = queue[:count]
+        del queue[:count]
+        return taken
+
+    async def put_back(computer_id, items):
+        queue[:0] = items
+
+    async def still_queued(execution_ids):
+        return {eid for eid in execution_ids if eid not in cancelled}
+
+    dispatcher.sender = sender
+    dispatcher._take = take
+    dispatcher._put_back = put_back
+    dispatcher._still_queued = still_queued
+    return dispatcher, sent
+
+
+def _advertise(dispatcher, computer_id, credits, received):
+    dispatcher._credits[computer_id] = credits
+    dispatcher._received[computer_id] = received
+    dispatcher._sent.setdefault(computer_id, 0)
+
+
+@pytest.mark.asyncio
+async def test_sends_only_up_to_advertised_credits():
+    """Test que sin créditos las ejecuciones quedan en la cola"""
+    queue = _items(10, 11, 12)
+    dispatcher, sent = _dispatcher(queue)
+
+    await dispatcher._pump(1)
+    assert sent == []
+
+    _advertise(dispatcher, 1, credits=2, received=0)
+    await dispatcher._pump(1)
+    assert sent == [(1, 10), (1, 11)]
+    assert [item["execution_id"] for item in queue] == [12]
+
+
+@pytest.mark.asyncio
+async def test_in_flight_commands_are_not_counted_twice():
+    """Test que un anuncio anterior a recibir los comandos no libera créditos extra"""
+    queue = _items(10, 11, 12)
+    dispatcher, sent = _dispatcher(queue)
+    _advertise(dispatcher, 1, credits=2, received=0)
+    await dispatcher._pump(1)
+
+    # El agente aún no vio los 2 comandos enviados
+    _advertise(dispatcher, 1, credits=2, received=0)
+    await dispatcher._pump(1)
+    assert [eid for _, eid in sent] == [10, 11]
+
+    # Ya los recibió y terminó uno: 1 crédito libre
+    _advertise(dispatcher, 1, credits=1, received=2)
+    await dispatcher._pump(1)
+    assert [eid for _, eid in sent] == [10, 11, 12]
+
+
+@pytest.mark.asyncio
+async def test_skips_executions_no_longer_queued():
+    """Test que una ejecución cancelada mientras esperaba no se envía"""
+    queue = _items(10, 11)
+    dispatcher, sent = _dispatcher(queue, cancelled={10})
+    _advertise(dispatcher, 1, credits=5, received=0)
+
+    await dispatcher._pump(1)
+
+    assert sent == [(1, 11)]
+    assert dispatcher.stats["skipped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_send_returns_items_in_order():
+    """Test que si el socket no acepta el comando, lo pendiente vuelve al frente"""
+    queue = _items(10, 11, 12)
+    dispatcher, sent = _dispatcher(queue, fail_on={11})
+    _advertise(dispatcher, 1, credits=3, received=0)
+
+    await dispatcher._pump(1)
+
+    assert sent == [(1, 10)]
+    assert [item["execution_id"] for item in queue] == [11, 12]
+    assert dispatcher.available(1) == 2
+
+
+def test_reconnection_resets_connection_counters():
+    """Test que los contadores de créditos son por conexión"""
+    dispatcher, _ = _dispatcher([])
+    _advertise(dispatcher, 1, credits=3, received=7)
+
+    dispatcher.on_connection(1, True)
+
+    assert not dispatcher.supports_credits(1)
+    assert dispatcher.available(1) == 0
+
+
+def _redis_dispatcher(redis_url, fail_on=(), raise_on=()):
+    """Dispatcher sobre Redis real con el envío y la consulta a DB reemplazados"""
+    dispatcher = WarmingDispatcher(redis_url=redis_url)
+    sent = []
+
+    async def sender(computer_id, **command):
+        if command["execution_id"] in raise_on:
+            raise RuntimeError("routing error")
+        if command["execution_id"] in fail_on:
+            return False
+        sent.append((computer_id, command["execution_id"]))
+        return True
+
+    async def still_queued(execution_ids):
+        return set(execution_ids)
+
+    dispatcher.sender = sender
+    dispatcher._still_queued = still_queued
+    return dispatcher, sent
+
+
+async def _queued_ids(dispatcher, computer_id):
+    items = await dispatcher._take(computer_id, 100)
+    await dispatcher._put_back(computer_id, items)
+    return [item["execution_id"] for item in items]
+
+
+@pytest.mark.asyncio
+async def test_take_skips_cancelled_and_put_back_keeps_order(redis_url):
+    """Test de los scripts de Redis: cancelar, sacar y devolver al frente"""
+    dispatcher, _ = _redis_dispatcher(redis_url)
+    await dispatcher.submit(1, _items(10, 11, 12))
+
+    assert await dispatcher.cancel(1, 11)
+    assert not await dispatcher.cancel(1, 11)
+
+    taken = await dispatcher._take(1, 1)
+    assert [item["execution_id"] for item in taken] == [10]
+    await dispatcher._put_back(1, taken)
+
+    assert await dispatcher.get_queue_depth(1) == 2
+    assert await _queued_ids(dispatcher, 1) == [10, 12]
+    await dispatcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_pump_error_after_take_loses_nothing(redis_url):
+    """Test que si la consulta a DB falla lo sacado de Redis vuelve a la cola"""
+    dispatcher, sent = _redis_dispatcher(redis_url)
+    await dispatcher.submit(1, _items(10, 11, 12))
+
+    async def db_down(execution_ids):
+        raise RuntimeError("db down")
+
+    dispatcher._still_queued = db_down
+    _advertise(dispatcher, 1, credits=5, received=0)
+    await dispatcher._pump(1)
+
+    assert sent == []
+    assert await _queued_ids(dispatcher, 1) == [10, 11, 12]
+    assert dispatcher.available(1) == 5
+    await dispatcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_sender_error_returns_unsent_items(redis_url):
+    """Test que un error de ruteo a mitad del envío no pierde lo pendiente"""
+    dispatcher, sent = _redis_dispatcher(redis_url, raise_on={11})
+    await dispatcher.submit(1, _items(10, 11, 12))
+
+    _advertise(dispatcher, 1, credits=5, received=0)
+    await dispatcher._pump(1)
+
+    assert sent == [(1, 10)]
+    assert await _queued_ids(dispatcher, 1) == [11, 12]
+    assert dispatcher.available(1) == 4
+    await dispatcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_redistribute_moves_queue_to_target(redis_url):
+    """Test que la cola de una computadora caída pasa a otra con créditos"""
+    dispatcher, _ = _redis_dispatcher(redis_url)
+    await dispatcher.submit(1, _items(10, 11))
+    reassigned = []
+
+    async def targets(computer_id):
+        return {2: 3}
+
+    async def reassign(execution_ids, computer_id):
+        reassigned.append((execution_ids, computer_id))
+
+    dispatcher._targets = targets
+    dispatcher._reassign = reassign
+
+    assert await dispatcher.redistribute(1) == 2
+    assert reassigned == [([10, 11], 2)]
+    assert await dispatcher.get_queue_depth(1) == 0
+    assert await _queued_ids(dispatcher, 2) == [10, 11]
+    await dispatcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_redistribute_error_returns_items_to_source(redis_url):
+    """Test que si falla la reasignación en DB la cola original queda intacta"""
+    dispatcher, _ = _redis_dispatcher(redis_url)
+    await dispatcher.submit(1, _items(10, 11, 12))
+
+    async def targets(computer_id):
+        return {2: 3}
+
+    async def reassign(execution_ids, computer_id):
+        raise RuntimeError("commit failed")
+
+    dispatcher._targets = targets
+    dispatcher._reassign = reassign
+
+    assert await dispatcher.redistribute(1) == 0
+    assert await _queued_ids(dispatcher, 1) == [10, 11, 12]
+    assert await dispatcher.get_queue_depth(2) == 0
+    await dispatcher.stop()
@@ -0,0 +1,86 @@
+# tests/test_services/test_warming_script_service.py
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.computer import Computer
+from app.models.profile import Profile
+from app.models.warming_script import WarmingScript, WarmingExecution, ExecutionStatus
+from app.services.profile_service import ProfileService
+from app.services.warming_script_service import WarmingScriptService
+
+
+async def _seed(db: AsyncSession, profile_count: int):
+    computer = Computer(
+        name="Test Computer",
+        hostname="test-host",
+        ip_address="192.168.1.100",
+        adspower_api_url="http://localhost:50325",
+        adspower_api_key="test-key"
+    )
+    script = WarmingScript(name="Test Script", actions=[{"type": "navigate", "url": "https://google.com"}])
+    db.add_all([computer, script])
+    await db.flush()
+
+    profiles = [
+        Profile(adspower_id=f"ads_{i}", name=f"Profile {i}", computer_id=computer.id)
+        for i in range(profile_count)
+    ]
+    db.add_all(profiles)
+    await db.commit()
+    return computer, script, profiles
+
+
+@pytest.mark.asyncio
+async def test_get_profiles_by_ids_skips_missing(db_session: AsyncSession):
+    """Test cargar profiles en una consulta ignorando IDs inexistentes"""
+    _, _, profiles = await _seed(db_session, 3)
+
+    found = await ProfileService(db_session).get_profiles_by_ids([profiles[0].id, profiles[2].id, 999999])
+
+    assert set(found) == {profiles[0].id, profiles[2].id}
+
+
+@pytest.mark.asyncio
+async def test_create_executions_returns_ids_in_order(db_session: AsyncSession):
+    """Test crear ejecuciones del batch en un INSERT con IDs en orden"""
+    computer, script, profiles = await _seed(db_session, 5)
+    service = WarmingScriptService(db_session)
+
+    targets = [(profile.id, computer.id) for profile in reversed(profiles)]
+    execution_ids = await service.create_executions(script.id, targets)
+
+    result = await db_session.execute(
+        select(WarmingExecution.id, WarmingExecution.profile_id, WarmingExecution.status)
+    )
+    rows = {row.id: row for row in result}
+
+    assert [rows[eid].profile_id for eid in execution_ids] == [pid for pid, _ in targets]
+    assert all(row.status == ExecutionStatus.QUEUED for row in rows.values())
+
+    await db_session.refresh(script)
+    assert script.times_used == 1
+
+
+@pytest.mark.asyncio
+async def test_apply_progress_batch_with_only_null_columns(db_session: AsyncSession):
+    """Test flush con solo ejecuciones fallidas (progress/error en NULL en todas las filas)"""
+    computer, script, profiles = await _seed(db_session, 2)
+    service = WarmingScriptService(db_session)
+    execution_ids = await service.create_executions(script.id, [(p.id, computer.id) for p in profiles])
+
+    updated = await service.apply_progress_batch({
+        execution_id: {
+            'status': ExecutionStatus.FAILED,
+            'progress': None,
+            'events': [{'event_type': 'failed', 'action_index': None, 'payload': {'error': 'boom'}}],
+            'error': None
+        }
+        for execution_id in execution_ids
+    })
+
+    assert updated == 2
+    result = await db_session.execute(
+        select(WarmingExecution.status, WarmingExecution.progress).where(WarmingExecution.id.in_(execution_ids))
+    )
+    assert {(row.status, row.progress) for row in result} == {(ExecutionStatus.FAILED, 0)}
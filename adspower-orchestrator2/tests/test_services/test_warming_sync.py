@@ -0,0 +1,72 @@
+# tests/test_services/test_warming_sync.py
+import asyncio
+
+import pytest
+
+from app.services.warming_sync import WarmingSyncManager
+from app.websocket.manager import connection_manager
+
+
+@pytest.fixture
+def releases(monkeypatch):
+    """barrier_release enviados a los agentes: (computer_id, execution_id, released)"""
+    sent = []
+
+    async def send_message(computer_id, message):
+        sent.append((computer_id, message["execution_id"], message["released"]))
+        return True
+
+    monkeypatch.setattr(connection_manager, "send_message", send_message)
+    return sent
+
+
+async def _wait_for(condition, timeout: float = 2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not met"
+        await asyncio.sleep(0.01)
+
+
+async def _started(redis_url):
+    manager = WarmingSyncManager(redis_url=redis_url)
+    await manager.start()
+    await asyncio.sleep(0.05)  # listener suscrito
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_barrier_released_across_nodes(redis_url, releases):
+    """Test que el último participante libera a los de todos los nodos"""
+    node_a = await _started(redis_url)
+    node_b = await _started(redis_url)
+
+    await node_a.arrive("batch_1", 0, execution_id=10, computer_id=1, total_participants=2)
+    await asyncio.sleep(0.05)
+    assert releases == []
+
+    await node_b.arrive("batch_1", 0, execution_id=11, computer_id=2, total_participants=2)
+    await _wait_for(lambda: len(releases) == 2)
+
+    assert sorted(releases) == [(1, 10, True), (2, 11, True)]
+    metrics = await node_a.get_metrics()
+    assert metrics["released"] == 1
+    assert metrics["cancelled"] == 0
+
+    await node_a.stop()
+    await node_b.stop()
+
+
+@pytest.mark.asyncio
+async def test_barrier_timeout_cancels_and_late_arrival_is_refused(redis_url, releases):
+    """Test que una barrera vencida se cancela y quien llega tarde no espera"""
+    manager = await _started(redis_url)
+
+    await manager.arrive("batch_2", 3, execution_id=20, computer_id=1, total_participants=2, timeout=1)
+    await _wait_for(lambda: releases == [(1, 20, False)], timeout=3.0)
+
+    await manager.arrive("batch_2", 3, execution_id=21, computer_id=2, total_participants=2, timeout=1)
+    assert releases == [(1, 20, False), (2, 21, False)]
+    assert (await manager.get_metrics())["cancelled"] == 1
+
+    await manager.stop()
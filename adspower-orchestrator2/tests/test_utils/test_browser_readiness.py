@@ -0,0 +1,19 @@
+# tests/test_utils/test_browser_readiness.py
+import pytest
+
+from app.utils.browser_readiness import bucket_label, wait_for_devtools
+
+
+def test_bucket_label():
+    """Test asignación de buckets del histograma"""
+    assert bucket_label(100) == "le_250"
+    assert bucket_label(250) == "le_250"
+    assert bucket_label(1500) == "le_2000"
+    assert bucket_label(60000) == "le_inf"
+
+
+def test_wait_for_devtools_times_out():
+    """Test que el deadline se respeta si el puerto no responde"""
+    with pytest.raises(TimeoutError):
+        # Puerto 9 (discard) no corre DevTools
+        wait_for_devtools(9, timeout=0.3, initial_delay=0.05, max_delay=0.1)
@@ -0,0 +1,39 @@
+# tests/test_utils/test_rate_limiter.py
+import asyncio
+import time
+import pytest
+from app.utils.rate_limiter import AsyncRateLimiter
+
+@pytest.mark.asyncio
+async def test_rate_limiter_bounds_concurrency():
+    """Test no más de max_concurrency requests en vuelo"""
+    limiter = AsyncRateLimiter(max_concurrency=2)
+    in_flight = 0
+    peak = 0
+    
+    async def worker():
+        nonlocal in_flight, peak
+        async with limiter:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+    
+    await asyncio.gather(*(worker() for _ in range(10)))
+    
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_requests():
+    """Test separación mínima entre inicios de request"""
+    limiter = AsyncRateLimiter(max_concurrency=10, requests_per_second=50)
+    starts = []
+    
+    async def worker():
+        async with limiter:
+            starts.append(time.monotonic())
+    
+    await asyncio.gather(*(worker() for _ in range(5)))
+    
+    # 5 requests a 50 req/s -> al menos 4 intervalos de 20ms
+    assert starts[-1] - starts[0] >= 0.075
@@ -0,0 +1,25 @@
+# tests/test_utils/test_script_store.py
+from app.utils.script_store import ScriptBodyStore, script_content_hash
+
+
+def test_script_hash_ignores_key_order():
+    """Test que el hash depende del contenido, no del orden de las claves"""
+    a = [{"type": "navigate", "url": "https://example.com", "wait": 2}]
+    b = [{"wait": 2, "url": "https://example.com", "type": "navigate"}]
+
+    assert script_content_hash(a) == script_content_hash(b)
+    assert script_content_hash(a) != script_content_hash([{"type": "wait", "seconds": 2}])
+
+
+def test_script_body_store_evicts_lru():
+    """Test que el store descarta el script usado hace más tiempo"""
+    store = ScriptBodyStore(max_entries=2)
+    first = store.register(1, [{"type": "wait", "seconds": 1}])
+    second = store.register(2, [{"type": "wait", "seconds": 2}])
+
+    store.get(first)
+    store.register(3, [{"type": "wait", "seconds": 3}])
+
+    assert store.get(first) is not None
+    assert store.get(second) is None
+    assert len(store) == 2
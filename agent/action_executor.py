@@ -1,5 +1,5 @@
 # agent/action_executor.py (FIXED VERSION)
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -17,6 +17,8 @@ from loguru import logger
 import asyncio
 import random
 import time
+from driver_threads import driver_threads
+from selector_cache import selector_cache, url_domain, PROBE_ASYNC_SCRIPT
 
 class HumanBehavior:
     """Comportamiento humano para acciones"""
@@ -31,6 +33,19 @@ class HumanBehavior:
         """Velocidad de tipeo aleatoria"""
         return random.uniform(0.05, 0.15)
     
+    @staticmethod
+    def keystroke_delays(text: str) -> List[float]:
+        """Pausa tras cada tecla: más larga en espacios y alguna pausa ocasional"""
+        delays = []
+        for char in text:
+            delay = HumanBehavior.typing_speed()
+            if char == " ":
+                delay += random.uniform(0.05, 0.2)
+            elif random.random() < 0.05:
+                delay += random.uniform(0.2, 0.6)
+            delays.append(delay)
+        return delays
+    
     @staticmethod
     def mouse_movement_speed() -> float:
         """Velocidad de movimiento de mouse"""
@@ -48,14 +63,64 @@ class ActionExecutor:
         self.config = config
         self.behavior = HumanBehavior()
     
-    def _is_browser_alive(self, driver: webdriver.Chrome) -> bool:
+    async def _run(self, driver: webdriver.Chrome, func, *args, **kwargs):
+        """Ejecuta una llamada bloqueante de Selenium en el hilo del driver"""
+        return await driver_threads.run(driver, func, *args, **kwargs)
+    
+    async def _is_browser_alive(self, driver: webdriver.Chrome) -> bool:
         """Verifica si el navegador sigue activo"""
         try:
-            _ = driver.title
+            await self._run(driver, lambda: driver.title, timeout=10)
             return True
-        except (NoSuchWindowException, WebDriverException):
+        except (NoSuchWindowException, WebDriverException, asyncio.TimeoutError):
             return False
     
+    async def _resolve_element(
+        self,
+        driver: webdriver.Chrome,
+        group: str,
+        selectors: List[str],
+        timeout: float = 10
+    ):
+        """
+        Primer elemento que matchee alguno de los selectores, en un round-trip
+        
+        Sondea todos los selectores en la página hasta timeout y aprende el
+        ganador por dominio (selector_cache) para probarlo primero.
+        """
+        domain = url_domain(await self._run(driver, lambda: driver.current_url))
+        ordered = selector_cache.ordered(domain, group, selectors)
+        
+        index, element = await self._run(
+            driver,
+            driver.execute_async_script,
+            PROBE_ASYNC_SCRIPT,
+            ordered,
+            int(timeout * 1000),
+            timeout=timeout + 10
+        )
+        
+        if index < 0:
+            return None
+        
+        selector_cache.record(domain, group, ordered[index])
+        logger.debug(f"✓ Found {group} with: {ordered[index]}")
+        return element
+    
+    async def _type_keys(self, driver: webdriver.Chrome, text: str):
+        """
+        Tipeo humano en un solo round-trip
+        
+        Secuencia W3C Actions (keyDown/keyUp + pausa por tecla) enviada en
+        una llamada: el navegador aplica los tiempos y los eventos de teclado
+        son reales, sobre el elemento con foco.
+        """
+        delays = self.behavior.keystroke_delays(text)
+        chain = ActionChains(driver)
+        for char, delay in zip(text, delays):
+            chain.send_keys(char).pause(delay)
+        await self._run(driver, chain.perform)
+    
     def _safe_driver_call(self, func, *args, **kwargs):
         """Ejecuta una llamada al driver de forma segura"""
         max_retries = 2
@@ -88,7 +153,7 @@ class ActionExecutor:
         logger.debug(f"Executing action: {action_type}")
         
         # ✅ VERIFICAR QUE EL NAVEGADOR ESTÉ VIVO
-        if not self._is_browser_alive(driver):
+        if not await self._is_browser_alive(driver):
             logger.error(f"Browser is closed, cannot execute action: {action_type}")
             return False
         
@@ -190,7 +255,7 @@ class ActionExecutor:
             url = f"https://{url}"
         
         try:
-            self._safe_driver_call(driver.get, url)
+            await self._run(driver, self._safe_driver_call, driver.get, url)
             await asyncio.sleep(random.uniform(2, 4))
             logger.info(f"✓ Navigated to: {url}")
             return True
@@ -212,17 +277,15 @@ class ActionExecutor:
             await asyncio.sleep(2)
             
             # ✅ PASO 2: Verificar que estamos en Google
-            current_url = driver.current_url.lower()
+            current_url = (await self._run(driver, lambda: driver.current_url)).lower()
             if "google" not in current_url:
                 logger.warning(f"Not on Google page, current URL: {current_url}")
                 # Intentar navegar a Google primero
-                driver.get("https://www.google.com")
+                await self._run(driver, driver.get, "https://www.google.com")
                 await asyncio.sleep(3)
             
-            # ✅ PASO 3: Buscar input de búsqueda (MÚLTIPLES ESTRATEGIAS)
-            search_box = None
-            
-            # Estrategia 1: Selectores comunes
+            # ✅ PASO 3: Buscar input de búsqueda (todos los selectores en una sola sonda,
+            # primero el que funcionó antes en este dominio)
             search_selectors = [
                 "textarea[name='q']",
                 "input[name='q']",
@@ -234,28 +297,7 @@ class ActionExecutor:
                 "input[aria-label*='Search']",
             ]
             
-            for selector in search_selectors:
-                try:
-                    search_box = WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    if search_box:
-                        logger.debug(f"✓ Found search box with: {selector}")
-                        break
-                except TimeoutException:
-                    continue
-            
-            # Estrategia 2: Si no encontró, buscar por JavaScript
-            if not search_box:
-                logger.debug("Trying JavaScript selector...")
-                try:
-                    search_box = driver.execute_script("""
-                        return document.querySelector('input[name="q"]') || 
-                               document.querySelector('textarea[name="q"]') ||
-                               document.querySelector('.gLFyf');
-                    """)
-                except:
-                    pass
+            search_box = await self._resolve_element(driver, "search_box", search_selectors, timeout=10)
             
             if not search_box:
                 logger.error("❌ Search box not found after all attempts")
@@ -263,18 +305,20 @@ class ActionExecutor:
             
             # ✅ PASO 4: Click y focus en el input
             try:
-                driver.execute_script(
+                await self._run(
+                    driver,
+                    driver.execute_script,
                     "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
                     search_box
                 )
                 await asyncio.sleep(0.5)
                 
                 # Click con JavaScript (más confiable)
-                driver.execute_script("arguments[0].focus(); arguments[0].click();", search_box)
+                await self._run(driver, driver.execute_script, "arguments[0].focus(); arguments[0].click();", search_box)
                 await asyncio.sleep(0.5)
                 
                 # Limpiar campo
-                driver.execute_script("arguments[0].value = '';", search_box)
+                await self._run(driver, driver.execute_script, "arguments[0].value = '';", search_box)
                 await asyncio.sleep(0.3)
                 
                 logger.debug("✓ Input focused and cleared")
@@ -283,9 +327,7 @@ class ActionExecutor:
             
             # ✅ PASO 5: Escribir búsqueda (tipeo humanizado)
             try:
-                for char in query:
-                    search_box.send_keys(char)
-                    await asyncio.sleep(self.behavior.typing_speed())
+                await self._type_keys(driver, query)
                 
                 logger.debug(f"✓ Typed query: '{query}'")
                 await asyncio.sleep(random.uniform(0.5, 1.0))
@@ -298,7 +340,7 @@ class ActionExecutor:
             
             # Método 1: Enter key
             try:
-                search_box.send_keys(Keys.ENTER)
+                await self._run(driver, search_box.send_keys, Keys.ENTER)
                 await asyncio.sleep(1)
                 submit_success = True
                 logger.debug("✓ Submitted with ENTER key")
@@ -308,8 +350,8 @@ class ActionExecutor:
             # Método 2: Si Enter falló, buscar botón de submit
             if not submit_success:
                 try:
-                    submit_button = driver.find_element(By.CSS_SELECTOR, "input[value='Google Search']")
-                    submit_button.click()
+                    submit_button = await self._run(driver, driver.find_element, By.CSS_SELECTOR, "input[value='Google Search']")
+                    await self._run(driver, submit_button.click)
                     await asyncio.sleep(1)
                     submit_success = True
                     logger.debug("✓ Clicked submit button")
@@ -319,7 +361,7 @@ class ActionExecutor:
             # Método 3: JavaScript submit
             if not submit_success:
                 try:
-                    driver.execute_script("""
+                    await self._run(driver, driver.execute_script, """
                         var form = arguments[0].closest('form');
                         if (form) form.submit();
                     """, search_box)
@@ -338,7 +380,7 @@ class ActionExecutor:
             
             # ✅ PASO 8: Verificar que estamos en página de resultados
             try:
-                final_url = driver.current_url.lower()
+                final_url = (await self._run(driver, lambda: driver.current_url)).lower()
                 if "search" in final_url or "q=" in final_url:
                     logger.info(f"✅ Google search completed successfully: '{query}'")
                     return True
@@ -366,12 +408,16 @@ class ActionExecutor:
         try:
             by = By.CSS_SELECTOR if by_type == "css" else By.XPATH
             
-            element = WebDriverWait(driver, 10).until(
+            element = await self._run(
+                driver,
+                WebDriverWait(driver, 10).until,
                 EC.element_to_be_clickable((by, selector))
             )
             
             if human:
-                driver.execute_script(
+                await self._run(
+                    driver,
+                    driver.execute_script,
                     "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
                     element
                 )
@@ -381,9 +427,9 @@ class ActionExecutor:
                 actions.move_to_element(element)
                 actions.pause(random.uniform(0.2, 0.5))
                 actions.click()
-                actions.perform()
+                await self._run(driver, actions.perform)
             else:
-                element.click()
+                await self._run(driver, element.click)
             
             await asyncio.sleep(random.uniform(0.5, 1.5))
             return True
@@ -409,23 +455,23 @@ class ActionExecutor:
         try:
             by = By.CSS_SELECTOR if by_type == "css" else By.XPATH
             
-            element = WebDriverWait(driver, 10).until(
+            element = await self._run(
+                driver,
+                WebDriverWait(driver, 10).until,
                 EC.presence_of_element_located((by, selector))
             )
             
             if clear_first:
-                element.clear()
+                await self._run(driver, element.clear)
                 await asyncio.sleep(0.3)
             
-            element.click()
+            await self._run(driver, element.click)
             await asyncio.sleep(0.3)
             
             if human:
-                for char in text:
-                    element.send_keys(char)
-                    await asyncio.sleep(self.behavior.typing_speed())
+                await self._type_keys(driver, text)
             else:
-                element.send_keys(text)
+                await self._run(driver, element.send_keys, text)
             
             await asyncio.sleep(random.uniform(0.3, 0.7))
             return True
@@ -446,14 +492,14 @@ class ActionExecutor:
         try:
             if smooth:
                 if direction == "down":
-                    driver.execute_script(f"window.scrollBy({{top: {amount}, behavior: 'smooth'}});")
+                    await self._run(driver, driver.execute_script, f"window.scrollBy({{top: {amount}, behavior: 'smooth'}});")
                 else:
-                    driver.execute_script(f"window.scrollBy({{top: -{amount}, behavior: 'smooth'}});")
+                    await self._run(driver, driver.execute_script, f"window.scrollBy({{top: -{amount}, behavior: 'smooth'}});")
             else:
                 if direction == "down":
-                    driver.execute_script(f"window.scrollBy(0, {amount});")
+                    await self._run(driver, driver.execute_script, f"window.scrollBy(0, {amount});")
                 else:
-                    driver.execute_script(f"window.scrollBy(0, -{amount});")
+                    await self._run(driver, driver.execute_script, f"window.scrollBy(0, -{amount});")
             
             await asyncio.sleep(random.uniform(1, 2))
             logger.debug(f"✓ Scrolled {direction} {amount}px")
@@ -482,7 +528,9 @@ class ActionExecutor:
         try:
             by = By.CSS_SELECTOR if by_type == "css" else By.XPATH
             
-            WebDriverWait(driver, timeout).until(
+            await self._run(
+                driver,
+                WebDriverWait(driver, timeout).until,
                 EC.presence_of_element_located((by, selector))
             )
             return True
@@ -502,11 +550,13 @@ class ActionExecutor:
             if not selector:
                 return False
             
-            element = WebDriverWait(driver, 10).until(
+            element = await self._run(
+                driver,
+                WebDriverWait(driver, 10).until,
                 EC.presence_of_element_located((By.CSS_SELECTOR, selector))
             )
             
-            ActionChains(driver).move_to_element(element).perform()
+            await self._run(driver, ActionChains(driver).move_to_element(element).perform)
             await asyncio.sleep(1)
             return True
         except Exception as e:
@@ -521,12 +571,13 @@ class ActionExecutor:
             if not selector or not value:
                 return False
             
-            element = WebDriverWait(driver, 10).until(
+            element = await self._run(
+                driver,
+                WebDriverWait(driver, 10).until,
                 EC.presence_of_element_located((By.CSS_SELECTOR, selector))
             )
             
-            select = Select(element)
-            select.select_by_value(value)
+            await self._run(driver, lambda: Select(element).select_by_value(value))
             await asyncio.sleep(0.5)
             return True
         except Exception as e:
@@ -539,7 +590,7 @@ class ActionExecutor:
             key = params.get("key", "ENTER")
             key_obj = getattr(Keys, key.upper(), Keys.ENTER)
             
-            ActionChains(driver).send_keys(key_obj).perform()
+            await self._run(driver, ActionChains(driver).send_keys(key_obj).perform)
             await asyncio.sleep(0.5)
             return True
         except Exception as e:
@@ -550,7 +601,7 @@ class ActionExecutor:
         """Toma screenshot"""
         try:
             filename = params.get("filename", f"screenshot_{int(time.time())}.png")
-            driver.save_screenshot(filename)
+            await self._run(driver, driver.save_screenshot, filename)
             return True
         except Exception as e:
             logger.error(f"Screenshot failed: {e}")
@@ -560,9 +611,9 @@ class ActionExecutor:
         """Cambia de pestaña"""
         try:
             index = params.get("index", 0)
-            handles = driver.window_handles
+            handles = await self._run(driver, lambda: driver.window_handles)
             if index < len(handles):
-                driver.switch_to.window(handles[index])
+                await self._run(driver, driver.switch_to.window, handles[index])
                 await asyncio.sleep(0.5)
                 return True
             return False
@@ -573,10 +624,10 @@ class ActionExecutor:
     async def _close_tab(self, driver: webdriver.Chrome, params: Dict) -> bool:
         """Cierra pestaña"""
         try:
-            driver.close()
-            handles = driver.window_handles
+            await self._run(driver, driver.close)
+            handles = await self._run(driver, lambda: driver.window_handles)
             if handles:
-                driver.switch_to.window(handles[0])
+                await self._run(driver, driver.switch_to.window, handles[0])
             await asyncio.sleep(0.5)
             return True
         except Exception as e:
@@ -589,7 +640,7 @@ class ActionExecutor:
             script = params.get("script")
             if not script:
                 return False
-            driver.execute_script(script)
+            await self._run(driver, driver.execute_script, script)
             await asyncio.sleep(0.5)
             return True
         except Exception as e:
@@ -608,7 +659,7 @@ class ActionExecutor:
                 actions.move_by_offset(x, y)
                 actions.pause(random.uniform(0.5, 1.5))
             
-            actions.perform()
+            await self._run(driver, actions.perform)
             return True
         except Exception as e:
             logger.error(f"Random mouse failed: {e}")
@@ -0,0 +1,226 @@
+# agent/admission.py
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+import psutil
+from loguru import logger
+
+
+class AdmissionDeferred(Exception):
+    """La ejecución no fue admitida (cola llena o espera demasiado larga)"""
+
+
+class AdmissionController:
+    """
+    Control de admisión de ejecuciones según recursos de la máquina
+
+    Muestrea CPU, memoria y RSS de los navegadores con psutil y admite
+    ejecuciones en orden FIFO mientras haya slots y la máquina esté por
+    debajo de las marcas altas. Con histéresis: tras superar una marca alta
+    no se admite nada nuevo hasta bajar de la marca baja.
+    """
+
+    def __init__(self, config, browser_controller):
+        self.config = config
+        self.browser_controller = browser_controller
+
+        # Slots: MAX_BROWSERS también acota las ejecuciones simultáneas
+        self.max_running = min(config.MAX_CONCURRENT_EXECUTIONS, config.MAX_BROWSERS)
+        self.max_queue = config.ADMISSION_MAX_QUEUE
+        self.queue_timeout = config.ADMISSION_QUEUE_TIMEOUT
+
+        self.running = 0
+        self.overloaded = False
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        # Última muestra
+        self.cpu_percent = 0.0
+        self.memory_percent = 0.0
+        self.browser_rss_mb: Dict[int, float] = {}
+
+        self._sampler_task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[Dict], None]] = []
+        self.stats = {'admitted': 0, 'queued': 0, 'deferred': 0}
+
+    def add_listener(self, listener: Callable[[Dict], None]):
+        """Se notifica con get_stats() cuando cambia la cola o la carga"""
+        self._listeners.append(listener)
+
+    def _notify(self):
+        snapshot = self.get_stats()
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Admission listener error: {e}")
+
+    async def acquire(self, execution_id: int):
+        """Espera un slot; lanza AdmissionDeferred si no se puede admitir"""
+        if not self._waiters and self._can_admit():
+            self._admit()
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.stats['deferred'] += 1
+            raise AdmissionDeferred(f"Agent admission queue full ({self.max_queue})")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats['queued'] += 1
+        logger.info(f"⏳ Execution {execution_id} queued (depth={len(self._waiters)})")
+        self._notify()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return  # admitida justo al vencer el timeout
+            self.stats['deferred'] += 1
+            raise AdmissionDeferred(f"Not admitted within {self.queue_timeout}s (machine busy)")
+        except asyncio.CancelledError:
+            # Ejecución detenida mientras esperaba: devolver el slot si se alcanzó a admitir
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._notify()
+
+    def release(self):
+        """Libera un slot"""
+        self.running = max(0, self.running - 1)
+        self._wake()
+        self._notify()
+
+    def _admit(self):
+        self.running += 1
+        self.stats['admitted'] += 1
+
+    def _can_admit(self) -> bool:
+        if self.running >= self.max_running or self.overloaded:
+            return False
+        return self._fits_memory()
+
+    def _fits_memory(self) -> bool:
+        """Estima si un navegador más cabe bajo la marca alta de memoria"""
+        if self.browser_rss_mb:
+            avg_rss = sum(self.browser_rss_mb.values()) / len(self.browser_rss_mb)
+            total_mb = psutil.virtual_memory().total / (1024 * 1024)
+            projected = self.memory_percent + avg_rss / total_mb * 100
+            if projected > self.config.ADMISSION_MEMORY_HIGH:
+                return False
+        return True
+
+    def get_credits(self, held: int, prefetch: int = 0) -> int:
+        """
+        Ejecuciones nuevas que el orquestador puede enviar ahora
+
+        held: ejecuciones recibidas que aún no terminaron (en cola o
+        corriendo). Sin créditos mientras la máquina esté sobrecargada.
+        """
+        if self.overloaded or not self._fits_memory():
+            return 0
+        return max(0, self.max_running + prefetch - held)
+
+    def _wake(self):
+        """Admite waiters en orden mientras haya capacidad"""
+        while self._waiters and self._can_admit():
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._admit()
+            waiter.set_result(True)
+
+    async def start(self):
+        """Inicia el muestreo periódico"""
+        if self._sampler_task is None:
+            psutil.cpu_percent(interval=None)  # primera llamada: baseline
+            self._sampler_task = asyncio.create_task(self._sampler_loop())
+
+    async def stop(self):
+        if self._sampler_task:
+            self._sampler_task.cancel()
+            try:
+                await self._sampler_task
+            except asyncio.CancelledError:
+                pass
+            self._sampler_task = None
+
+    async def _sampler_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.config.ADMISSION_SAMPLE_INTERVAL)
+                await self.sample()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Admission sampler error: {e}")
+
+    async def sample(self):
+        """Toma una muestra y actualiza el estado de sobrecarga"""
+        ports = {
+            int(info['debug_port']): profile_id
+            for profile_id, info in self.browser_controller.browser_info.items()
+            if info.get('debug_port')
+        }
+
+        # process_iter recorre todos los procesos: fuera del event loop
+        cpu, memory, rss = await asyncio.to_thread(self._read_resources, ports)
+        self.cpu_percent, self.memory_percent, self.browser_rss_mb = cpu, memory, rss
+
+        was_overloaded = self.overloaded
+        if cpu >= self.config.ADMISSION_CPU_HIGH or memory >= self.config.ADMISSION_MEMORY_HIGH:
+            self.overloaded = True
+        elif cpu <= self.config.ADMISSION_CPU_LOW and memory <= self.config.ADMISSION_MEMORY_LOW:
+            self.overloaded = False
+
+        if self.overloaded != was_overloaded:
+            logger.warning(
+                f"Admission {'paused' if self.overloaded else 'resumed'}: "
+                f"cpu={cpu:.0f}% mem={memory:.0f}%"
+            )
+            self._notify()
+
+        self._wake()
+
+    @staticmethod
+    def _read_resources(ports: Dict[int, int]):
+        cpu = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory().percent
+
+        # RSS por navegador: proceso principal de Chrome con --remote-debugging-port
+        rss: Dict[int, float] = {}
+        if ports:
+            for proc in psutil.process_iter(['cmdline', 'memory_info']):
+                try:
+                    cmdline = proc.info.get('cmdline') or []
+                    for arg in cmdline:
+                        if arg.startswith('--remote-debugging-port='):
+                            port = int(arg.split('=', 1)[1])
+                            if port in ports:
+                                rss[ports[port]] = proc.info['memory_info'].rss / (1024 * 1024)
+                            break
+                except (psutil.Error, ValueError, TypeError):
+                    continue
+
+        return cpu, memory, rss
+
+    def get_queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'running': self.running,
+            'max_running': self.max_running,
+            'queue_depth': len(self._waiters),
+            'overloaded': self.overloaded,
+            'cpu_percent': round(self.cpu_percent, 1),
+            'memory_percent': round(self.memory_percent, 1),
+            'browser_rss_mb': round(sum(self.browser_rss_mb.values()), 1),
+            'updated_at': time.time()
+        }
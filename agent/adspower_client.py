@@ -0,0 +1,146 @@
+# agent/adspower_client.py
+import asyncio
+from typing import Dict, Iterable, List, Optional
+import httpx
+from loguru import logger
+
+
+class AdsPowerError(Exception):
+    """Error devuelto por la API local de AdsPower"""
+
+
+class AgentAdsPowerClient:
+    """
+    Cliente async de la API local de AdsPower
+
+    Un único httpx.AsyncClient con keep-alive para todas las llamadas,
+    timeouts por request y single-flight en browser/start: si dos
+    ejecuciones abren el mismo perfil a la vez, solo sale un request.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str,
+        timeout: float = 30.0,
+        max_connections: int = 10
+    ):
+        self.api_url = api_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # profile_id -> future del browser/start en curso
+        self._inflight_starts: Dict[str, asyncio.Future] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_url,
+                headers={
+                    'Content-Type': 'application/json',
+                    'Authorization': f'Bearer {self.api_key}'
+                },
+                timeout=self.timeout,
+                limits=self.limits
+            )
+        return self._client
+
+    async def close(self):
+        """Cierra el pool de conexiones"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, path: str, params: Optional[Dict] = None, timeout: Optional[float] = None) -> Dict:
+        response = await self._get_client().get(
+            path,
+            params=params,
+            timeout=timeout if timeout is not None else self.timeout
+        )
+        if response.status_code != 200:
+            raise AdsPowerError(f"AdsPower API error: {response.status_code}")
+        return response.json()
+
+    async def start_browser(self, profile_id, timeout: Optional[float] = None) -> Dict:
+        """browser/start con single-flight por perfil; retorna data (debug_port, ws, ...)"""
+        key = str(profile_id)
+
+        inflight = self._inflight_starts.get(key)
+        if inflight is not None:
+            logger.debug(f"Joining in-flight browser/start for profile {profile_id}")
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_starts[key] = future
+
+        try:
+            data = await self._get("/api/v1/browser/start", {"user_id": profile_id}, timeout)
+            if data.get("code") != 0:
+                raise AdsPowerError(f"AdsPower error: {data.get('msg')}")
+            result = data.get("data", {})
+            future.set_result(result)
+            return result
+
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else AdsPowerError("browser/start cancelled"))
+            # Evitar "exception was never retrieved" si nadie más esperaba
+            future.exception()
+            raise
+
+        finally:
+            self._inflight_starts.pop(key, None)
+
+    async def stop_browser(self, profile_id, timeout: float = 10) -> bool:
+        """browser/stop"""
+        data = await self._get("/api/v1/browser/stop", {"user_id": profile_id}, timeout)
+        return data.get("code") == 0
+
+    async def get_active_browsers(self, profile_ids: Optional[Iterable] = None) -> Dict[str, Dict]:
+        """
+        Navegadores abiertos en esta máquina: {user_id: data}
+
+        Usa browser/local-active (una sola llamada para todos). Si la versión
+        de AdsPower no lo soporta, consulta browser/active de profile_ids en
+        paralelo.
+        """
+        try:
+            data = await self._get("/api/v1/browser/local-active")
+            if data.get("code") == 0:
+                return {
+                    str(item.get("user_id")): item
+                    for item in data.get("data", {}).get("list", [])
+                }
+        except (httpx.HTTPError, AdsPowerError) as e:
+            logger.debug(f"browser/local-active unavailable: {e}")
+
+        if profile_ids is None:
+            return {}
+
+        profile_ids = [str(p) for p in profile_ids]
+        results = await asyncio.gather(
+            *(self._get("/api/v1/browser/active", {"user_id": p}) for p in profile_ids),
+            return_exceptions=True
+        )
+
+        active = {}
+        for profile_id, result in zip(profile_ids, results):
+            if isinstance(result, Exception) or result.get("code") != 0:
+                continue
+            if result.get("data", {}).get("status") == "Active":
+                active[profile_id] = result["data"]
+        return active
+
+    async def stop_browsers(self, profile_ids: Iterable) -> List[str]:
+        """Detiene varios navegadores en paralelo; retorna los detenidos"""
+        profile_ids = [str(p) for p in profile_ids]
+        results = await asyncio.gather(
+            *(self.stop_browser(p) for p in profile_ids),
+            return_exceptions=True
+        )
+        return [p for p, ok in zip(profile_ids, results) if ok is True]
@@ -3,11 +3,15 @@ from typing import Dict, Optional
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException
-import requests
 from loguru import logger
 import asyncio
 import os
+import httpx
 from selenium.webdriver.chrome.service import Service
+from readiness import wait_for_devtools, LatencyHistogram
+from driver_threads import driver_threads
+from cdp_backend import CDPPage
+from adspower_client import AgentAdsPowerClient
 
 
 class BrowserController:
@@ -18,16 +22,42 @@ class BrowserController:
         self.active_browsers: Dict[int, webdriver.Chrome] = {}
         self.browser_info: Dict[int, Dict] = {}
 
+        # Latencia open→ready (reportada al orquestador en status_update)
+        self.ready_histogram = LatencyHistogram()
+
+        # ✅ Cliente AdsPower async con pool keep-alive
+        self.adspower = AgentAdsPowerClient(
+            config.ADSPOWER_API_URL,
+            config.ADSPOWER_API_KEY,
+            timeout=config.BROWSER_OPEN_TIMEOUT
+        )
+
+        # Pool para los probes /json/version de los puertos DevTools locales
+        self._devtools_client: Optional[httpx.AsyncClient] = None
+
+        # Escalonar aperturas para no mandar N browser/start en el mismo segundo
+        self._launch_lock = asyncio.Lock()
+        self._last_launch = 0.0
+
+        # Registro persistente de los navegadores que abrió este agente (Outbox, se asigna en main)
+        self.launches = None
+
         # Ruta ABSOLUTA del ChromeDriver
         self.chromedriver_path = (
             "/Users/omarmaldonado/Desktop/proxys/proyectofinal/agent/chromedriver"
         )
 
-        if not os.path.exists(self.chromedriver_path):
+        if self.uses_cdp:
+            logger.info("✓ Browser backend: CDP (chromedriver not required)")
+        elif not os.path.exists(self.chromedriver_path):
             logger.error(f"ChromeDriver no encontrado en: {self.chromedriver_path}")
         else:
             logger.info(f"✓ ChromeDriver detectado: {self.chromedriver_path}")
 
+    @property
+    def uses_cdp(self) -> bool:
+        return self.config.BROWSER_BACKEND == "cdp"
+
     async def open_browser(self, profile_id: int) -> Optional[webdriver.Chrome]:
         """Abre un navegador AdsPower y conecta Selenium"""
 
@@ -39,55 +69,40 @@ class BrowserController:
         driver = None
 
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.config.ADSPOWER_API_KEY}'
-            }
-
             logger.info(f"🌐 Opening browser for profile {profile_id}")
 
-            # 1. Abrir en AdsPower
-            response = requests.get(
-                f"{self.config.ADSPOWER_API_URL}/api/v1/browser/start",
-                params={"user_id": profile_id},
-                headers=headers,
-                timeout=self.config.BROWSER_OPEN_TIMEOUT
-            )
-
-            if response.status_code != 200:
-                raise Exception(f"AdsPower API error: {response.status_code}")
-
-            data = response.json()
-            if data.get("code") != 0:
-                raise Exception(f"AdsPower error: {data.get('msg')}")
+            # 1. Abrir en AdsPower (escalonado, single-flight por perfil)
+            await self._stagger_launch()
+            data = await self.adspower.start_browser(profile_id)
+            await self._record_launch(profile_id)
 
-            debug_port = data.get("data", {}).get("debug_port")
+            debug_port = data.get("debug_port")
             if not debug_port:
                 raise Exception("No debug_port in response")
 
             logger.info(f"✓ Browser opened on port {debug_port}")
 
-            # 2. ✅ ESPERA CRÍTICA: Dar tiempo al navegador
-            await asyncio.sleep(4)  # Aumentado de 3 a 4 segundos
-            
-            # 3. Verificar disponibilidad del puerto
-            max_retries = 5
-            for attempt in range(max_retries):
-                try:
-                    test_response = requests.get(
-                        f"http://127.0.0.1:{debug_port}/json/version",
-                        timeout=2
-                    )
-                    if test_response.status_code == 200:
-                        logger.debug(f"✓ Port {debug_port} responding")
-                        break
-                except:
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(1)
-                    else:
-                        raise Exception(f"Port {debug_port} not responding")
+            # 2. ✅ Esperar a DevTools con backoff (sin sleep fijo)
+            ready_seconds = await wait_for_devtools(
+                debug_port,
+                timeout=self.config.BROWSER_READY_TIMEOUT,
+                client=self._get_devtools_client()
+            )
+            self.ready_histogram.observe(ready_seconds * 1000)
+            logger.debug(f"✓ Port {debug_port} ready in {ready_seconds * 1000:.0f}ms")
+
+            # Backend CDP: conexión directa, sin chromedriver
+            if self.uses_cdp:
+                driver = await CDPPage.attach(debug_port)
+                self.active_browsers[profile_id] = driver
+                self.browser_info[profile_id] = {
+                    'debug_port': debug_port,
+                    'opened_at': asyncio.get_event_loop().time()
+                }
+                logger.info(f"✅ Browser ready for profile {profile_id} (cdp)")
+                return driver
 
-            # 4. Configurar Selenium
+            # 3. Configurar Selenium
             service = Service(self.chromedriver_path)
 
             chrome_options = Options()
@@ -98,12 +113,13 @@ class BrowserController:
             chrome_options.add_argument("--disable-blink-features=AutomationControlled")
             chrome_options.add_argument("--log-level=3")
 
-            # 5. Conectar Selenium
+            # 4. Conectar Selenium
             max_selenium_retries = 3
             for attempt in range(max_selenium_retries):
                 try:
                     logger.debug(f"Connecting Selenium (attempt {attempt + 1})...")
-                    driver = webdriver.Chrome(
+                    driver = await asyncio.to_thread(
+                        webdriver.Chrome,
                         service=service,
                         options=chrome_options
                     )
@@ -119,14 +135,18 @@ class BrowserController:
             if not driver:
                 raise Exception("Failed to connect Selenium")
 
-            # 6. Guardar driver
+            # Hilo dedicado para este driver; el page load no puede colgarlo indefinidamente
+            driver_threads.bind(driver, str(profile_id))
+            await driver_threads.run(driver, driver.set_page_load_timeout, self.config.ACTION_TIMEOUT)
+
+            # 5. Guardar driver
             self.active_browsers[profile_id] = driver
             self.browser_info[profile_id] = {
                 'debug_port': debug_port,
                 'opened_at': asyncio.get_event_loop().time()
             }
 
-            # 7. ✅ PREPARACIÓN SIMPLIFICADA (sin cerrar ventanas)
+            # 6. ✅ PREPARACIÓN SIMPLIFICADA (sin cerrar ventanas)
             await self._prepare_browser_safe(driver, profile_id)
 
             logger.info(f"✅ Browser ready for profile {profile_id}")
@@ -138,21 +158,16 @@ class BrowserController:
             # Cleanup
             if driver:
                 try:
-                    driver.quit()
+                    await self._quit_driver(driver)
                 except:
                     pass
+                self.active_browsers.pop(profile_id, None)
+                self.browser_info.pop(profile_id, None)
             
             if debug_port and profile_id:
                 try:
-                    headers = {
-                        'Authorization': f'Bearer {self.config.ADSPOWER_API_KEY}'
-                    }
-                    requests.get(
-                        f"{self.config.ADSPOWER_API_URL}/api/v1/browser/stop",
-                        params={"user_id": profile_id},
-                        headers=headers,
-                        timeout=5
-                    )
+                    if await self.adspower.stop_browser(profile_id, timeout=5):
+                        await self._forget_launches([profile_id])
                 except:
                     pass
             
@@ -163,18 +178,15 @@ class BrowserController:
         try:
             logger.debug(f"Preparing browser for profile {profile_id}")
 
-            # Solo verificar que podemos acceder al navegador
-            await asyncio.sleep(1)
-
             try:
                 # Test básico: obtener título
-                _ = driver.title
+                await driver_threads.run(driver, lambda: driver.title)
                 
                 # Navegar a página inicial si está en about:blank
-                current_url = driver.current_url
+                current_url = await driver_threads.run(driver, lambda: driver.current_url)
                 if current_url == "about:blank" or not current_url:
-                    driver.get("https://www.google.com")
-                    await asyncio.sleep(2)
+                    # driver.get ya espera el evento load
+                    await driver_threads.run(driver, driver.get, "https://www.google.com")
                 
                 logger.info(f"✓ Browser prepared for profile {profile_id}")
                 return True
@@ -197,26 +209,16 @@ class BrowserController:
         try:
             driver = self.active_browsers[profile_id]
 
-            # Cerrar Selenium
+            # Cerrar Selenium / CDP
             try:
-                driver.quit()
-                await asyncio.sleep(1)
+                await self._quit_driver(driver)
             except Exception as e:
                 logger.warning(f"Error quitting driver: {e}")
 
             # Cerrar en AdsPower
             try:
-                headers = {
-                    'Authorization': f'Bearer {self.config.ADSPOWER_API_KEY}'
-                }
-
-                requests.get(
-                    f"{self.config.ADSPOWER_API_URL}/api/v1/browser/stop",
-                    params={"user_id": profile_id},
-                    headers=headers,
-                    timeout=10
-                )
-                await asyncio.sleep(1)
+                if await self.adspower.stop_browser(profile_id):
+                    await self._forget_launches([profile_id])
             except Exception as e:
                 logger.warning(f"Error closing in AdsPower: {e}")
 
@@ -232,10 +234,114 @@ class BrowserController:
             logger.error(f"Error closing browser: {e}")
             return False
 
+    async def _quit_driver(self, driver):
+        """Desconecta el driver (Selenium o CDP) y libera su hilo"""
+        if isinstance(driver, CDPPage):
+            await driver.close()
+            return
+        try:
+            await driver_threads.run(driver, driver.quit, timeout=10)
+        finally:
+            driver_threads.release(driver)
+
+    async def is_driver_alive(self, driver) -> bool:
+        """Probe liviano: el driver responde y tiene una ventana"""
+        if isinstance(driver, CDPPage):
+            return await driver.is_alive()
+        try:
+            await driver_threads.run(driver, lambda: driver.current_window_handle, timeout=5)
+            return True
+        except Exception as e:
+            logger.debug(f"Browser health probe failed: {e}")
+            return False
+
+    async def _stagger_launch(self):
+        """Espera hasta BROWSER_LAUNCH_STAGGER desde la última apertura"""
+        async with self._launch_lock:
+            loop = asyncio.get_running_loop()
+            wait = self._last_launch + self.config.BROWSER_LAUNCH_STAGGER - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_launch = loop.time()
+
+    def _get_devtools_client(self) -> httpx.AsyncClient:
+        if self._devtools_client is None or self._devtools_client.is_closed:
+            self._devtools_client = httpx.AsyncClient(timeout=2.0)
+        return self._devtools_client
+
     async def close_all_browsers(self):
-        """Cierra todos los navegadores"""
-        for profile_id in list(self.active_browsers.keys()):
-            await self.close_browser(profile_id)
+        """Cierra todos los navegadores en una pasada"""
+        profile_ids = list(self.active_browsers.keys())
+
+        # Drivers en paralelo, luego un solo pase a AdsPower
+        await asyncio.gather(
+            *(self._quit_driver(self.active_browsers[p]) for p in profile_ids),
+            return_exceptions=True
+        )
+        self.active_browsers.clear()
+        self.browser_info.clear()
+
+        ours = {str(p) for p in profile_ids}
+        active = await self.adspower.get_active_browsers(profile_ids)
+        stopped = await self.adspower.stop_browsers([p for p in active if p in ours])
+        if stopped:
+            logger.info(f"✓ Closed {len(stopped)} browsers in AdsPower")
+
+        # Los que no se pudieron cerrar quedan registrados para el próximo inicio
+        await self._forget_launches([p for p in ours if p not in active or p in stopped])
+
+    async def reconcile_on_startup(self) -> int:
+        """
+        Cierra navegadores que este agente dejó abiertos en una ejecución previa
+
+        Solo los registrados como abiertos por el agente: los que un
+        operador abrió a mano en la misma máquina no se tocan.
+        """
+        if self.launches is None:
+            return 0
+
+        try:
+            launched = set(await self.launches.launched())
+            if not launched:
+                return 0
+            active = await self.adspower.get_active_browsers(launched)
+        except Exception as e:
+            logger.warning(f"Startup reconciliation skipped: {e}")
+            return 0
+
+        current = {str(k) for k in self.active_browsers}
+        orphans = [p for p in active if p in launched and p not in current]
+        stopped = await self.adspower.stop_browsers(orphans) if orphans else []
+
+        # Ya cerrados (por AdsPower o a mano) o cerrados ahora
+        await self._forget_launches([p for p in launched if p not in active or p in stopped])
+
+        if stopped:
+            logger.info(f"🧹 Closed {len(stopped)} orphan browsers left open by a previous run")
+        return len(stopped)
+
+    async def _record_launch(self, profile_id):
+        if self.launches is None:
+            return
+        try:
+            await self.launches.record_launch(profile_id)
+        except Exception as e:
+            logger.warning(f"Could not record browser launch for profile {profile_id}: {e}")
+
+    async def _forget_launches(self, profile_ids):
+        if self.launches is None or not profile_ids:
+            return
+        try:
+            await self.launches.forget_launches(profile_ids)
+        except Exception as e:
+            logger.warning(f"Could not update launched browsers: {e}")
+
+    async def shutdown(self):
+        """Cierra los pools HTTP"""
+        await self.adspower.close()
+        if self._devtools_client is not None:
+            await self._devtools_client.aclose()
+            self._devtools_client = None
 
     def get_active_count(self) -> int:
         """Retorna cantidad de navegadores activos"""
@@ -0,0 +1,564 @@
+# agent/cdp_backend.py
+"""
+Backend CDP (Chrome DevTools Protocol) para el agente
+
+Alternativa a Selenium: habla CDP directamente por WebSocket con el
+debug_port que ya entrega AdsPower, sin proceso chromedriver ni la capa
+HTTP intermedia. Todas las acciones son corrutinas nativas (no bloquean
+el event loop). Se activa con BROWSER_BACKEND=cdp en AgentConfig.
+"""
+import asyncio
+import base64
+import itertools
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+import httpx
+import websockets
+from loguru import logger
+
+from action_executor import HumanBehavior
+from selector_cache import selector_cache, url_domain, probe_expression
+
+
+class CDPError(Exception):
+    """Error devuelto por el navegador o conexión CDP perdida"""
+
+
+# Teclas soportadas por press_key: nombre Selenium -> (key, keyCode, text)
+CDP_KEYS = {
+    "ENTER": ("Enter", 13, "\r"),
+    "RETURN": ("Enter", 13, "\r"),
+    "TAB": ("Tab", 9, None),
+    "ESCAPE": ("Escape", 27, None),
+    "BACKSPACE": ("Backspace", 8, None),
+    "SPACE": (" ", 32, " "),
+    "PAGE_DOWN": ("PageDown", 34, None),
+    "PAGE_UP": ("PageUp", 33, None),
+    "END": ("End", 35, None),
+    "HOME": ("Home", 36, None),
+    "ARROW_LEFT": ("ArrowLeft", 37, None),
+    "ARROW_UP": ("ArrowUp", 38, None),
+    "ARROW_RIGHT": ("ArrowRight", 39, None),
+    "ARROW_DOWN": ("ArrowDown", 40, None),
+}
+
+
+def js_find(selector: str, by: str = "css") -> str:
+    """Expresión JS que retorna el elemento (o null)"""
+    literal = json.dumps(selector)
+    if by == "xpath":
+        return (
+            f"document.evaluate({literal}, document, null, "
+            f"XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue"
+        )
+    return f"document.querySelector({literal})"
+
+
+class CDPPage:
+    """Conexión CDP a una pestaña (target de tipo page)"""
+
+    def __init__(self, debug_port: int, host: str = "127.0.0.1"):
+        self.debug_port = debug_port
+        self.host = host
+        self.target_id: Optional[str] = None
+        self.ws = None
+
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._event_waiters: Dict[str, List[asyncio.Future]] = {}
+        self._reader: Optional[asyncio.Task] = None
+
+        # Última posición del mouse (para hover/movimientos relativos)
+        self.mouse_x = 0.0
+        self.mouse_y = 0.0
+
+    @property
+    def http_url(self) -> str:
+        return f"http://{self.host}:{self.debug_port}"
+
+    @classmethod
+    async def attach(cls, debug_port: int, host: str = "127.0.0.1") -> "CDPPage":
+        """Se conecta a la primera pestaña del navegador"""
+        page = cls(debug_port, host)
+        await page.switch_to(0)
+        return page
+
+    async def _list_pages(self) -> List[Dict]:
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.get(f"{self.http_url}/json/list")
+            response.raise_for_status()
+            return [
+                t for t in response.json()
+                if t.get("type") == "page" and not t.get("url", "").startswith("devtools://")
+            ]
+
+    async def _new_page(self) -> Dict:
+        async with httpx.AsyncClient(timeout=5) as client:
+            # Chrome >= 111 exige PUT en /json/new
+            response = await client.put(f"{self.http_url}/json/new?about:blank")
+            response.raise_for_status()
+            return response.json()
+
+    async def switch_to(self, index: int) -> bool:
+        """Conecta a la pestaña `index` (crea una si no hay ninguna)"""
+        pages = await self._list_pages()
+        if not pages:
+            pages = [await self._new_page()]
+        if index >= len(pages):
+            return False
+
+        target = pages[index]
+        await self._disconnect()
+
+        self.target_id = target["id"]
+        self.ws = await websockets.connect(
+            target["webSocketDebuggerUrl"],
+            max_size=None,
+            ping_interval=None
+        )
+        self._reader = asyncio.create_task(self._read_loop())
+
+        async with httpx.AsyncClient(timeout=5) as client:
+            await client.get(f"{self.http_url}/json/activate/{self.target_id}")
+
+        await self.send("Page.enable")
+        return True
+
+    async def close_tab(self):
+        """Cierra la pestaña actual y pasa a la primera restante"""
+        target_id = self.target_id
+        await self._disconnect()
+        async with httpx.AsyncClient(timeout=5) as client:
+            await client.get(f"{self.http_url}/json/close/{target_id}")
+        await self.switch_to(0)
+
+    async def close(self):
+        """Cierra la conexión CDP (el navegador lo cierra AdsPower)"""
+        await self._disconnect()
+
+    async def _disconnect(self):
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self.ws:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+        self._fail_pending(CDPError("CDP connection closed"))
+
+    def _fail_pending(self, error: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def _read_loop(self):
+        """Despacha respuestas por id y eventos por método"""
+        try:
+            async for raw in self.ws:
+                message = json.loads(raw)
+
+                if "id" in message:
+                    future = self._pending.pop(message["id"], None)
+                    if future and not future.done():
+                        if "error" in message:
+                            future.set_exception(CDPError(message["error"].get("message")))
+                        else:
+                            future.set_result(message.get("result", {}))
+                    continue
+
+                for future in self._event_waiters.pop(message.get("method"), []):
+                    if not future.done():
+                        future.set_result(message.get("params", {}))
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"CDP reader stopped: {e}")
+        finally:
+            self._fail_pending(CDPError("CDP connection lost"))
+
+    async def send(self, method: str, params: Optional[Dict] = None, timeout: float = 30) -> Dict:
+        """Envía un comando CDP y espera su respuesta"""
+        if not self.ws:
+            raise CDPError("Not connected")
+
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+
+        try:
+            await self.ws.send(json.dumps({"id": message_id, "method": method, "params": params or {}}))
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    def wait_for_event(self, method: str) -> asyncio.Future:
+        """Future del próximo evento `method` (registrar antes de dispararlo)"""
+        future = asyncio.get_running_loop().create_future()
+        self._event_waiters.setdefault(method, []).append(future)
+        return future
+
+    async def evaluate(self, expression: str, timeout: float = 30) -> Any:
+        """Runtime.evaluate con returnByValue"""
+        result = await self.send(
+            "Runtime.evaluate",
+            {"expression": expression, "returnByValue": True, "awaitPromise": True},
+            timeout=timeout
+        )
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CDPError(details.get("exception", {}).get("description") or details.get("text"))
+        return result.get("result", {}).get("value")
+
+    async def navigate(self, url: str, timeout: float = 30):
+        """Navega y espera el evento load"""
+        loaded = self.wait_for_event("Page.loadEventFired")
+        result = await self.send("Page.navigate", {"url": url}, timeout=timeout)
+        if result.get("errorText"):
+            loaded.cancel()
+            raise CDPError(f"Navigation failed: {result['errorText']}")
+        await asyncio.wait_for(loaded, timeout=timeout)
+
+    async def current_url(self) -> str:
+        return await self.evaluate("location.href")
+
+    async def is_alive(self) -> bool:
+        try:
+            await self.evaluate("1", timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def element_center(self, selector: str, by: str = "css", scroll: bool = True) -> Optional[Dict]:
+        """Centro del elemento en coordenadas de viewport (o None)"""
+        scroll_js = "el.scrollIntoView({block: 'center'});" if scroll else ""
+        return await self.evaluate(f"""(() => {{
+            const el = {js_find(selector, by)};
+            if (!el) return null;
+            {scroll_js}
+            const r = el.getBoundingClientRect();
+            return {{x: r.left + r.width / 2, y: r.top + r.height / 2, visible: r.width > 0 && r.height > 0}};
+        }})()""")
+
+    async def wait_for_element(
+        self,
+        selector: str,
+        by: str = "css",
+        timeout: float = 10,
+        visible: bool = False
+    ) -> Optional[Dict]:
+        """Espera a que el elemento exista (y sea visible si se pide)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            center = await self.element_center(selector, by, scroll=False)
+            if center and (center["visible"] or not visible):
+                return center
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(0.2)
+
+    async def mouse_move(self, x: float, y: float, steps: int = 1):
+        """Mueve el mouse (interpolado en `steps` pasos)"""
+        start_x, start_y = self.mouse_x, self.mouse_y
+        for step in range(1, steps + 1):
+            px = start_x + (x - start_x) * step / steps
+            py = start_y + (y - start_y) * step / steps
+            await self.send("Input.dispatchMouseEvent", {"type": "mouseMoved", "x": px, "y": py})
+        self.mouse_x, self.mouse_y = x, y
+
+    async def mouse_click(self, x: float, y: float):
+        await self.mouse_move(x, y)
+        for event_type in ("mousePressed", "mouseReleased"):
+            await self.send("Input.dispatchMouseEvent", {
+                "type": event_type, "x": x, "y": y, "button": "left", "clickCount": 1
+            })
+
+    async def type_text(self, text: str, delays: List[float]):
+        """
+        Tipea text con una pausa por tecla sin esperar cada respuesta
+
+        Los Input.dispatchKeyEvent salen en pipeline según el cronograma;
+        las respuestas se recogen todas al final.
+        """
+        replies = []
+        for char, delay in zip(text, delays):
+            replies.append(asyncio.ensure_future(
+                self.send("Input.dispatchKeyEvent", {"type": "keyDown", "text": char, "key": char})
+            ))
+            replies.append(asyncio.ensure_future(
+                self.send("Input.dispatchKeyEvent", {"type": "keyUp", "key": char})
+            ))
+            await asyncio.sleep(delay)
+
+        for result in await asyncio.gather(*replies, return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
+
+    async def press_key(self, name: str):
+        key, code, text = CDP_KEYS.get(name.upper(), CDP_KEYS["ENTER"])
+        down = {"type": "keyDown", "key": key, "windowsVirtualKeyCode": code}
+        if text:
+            down["text"] = text
+        await self.send("Input.dispatchKeyEvent", down)
+        await self.send("Input.dispatchKeyEvent", {"type": "keyUp", "key": key, "windowsVirtualKeyCode": code})
+
+
+class CDPActionExecutor:
+    """Ejecutor de acciones sobre CDPPage (misma interfaz que ActionExecutor)"""
+
+    def __init__(self, config):
+        self.config = config
+        self.behavior = HumanBehavior()
+
+    async def execute_action(self, page: CDPPage, action: Dict[str, Any]) -> bool:
+        """Ejecuta una acción en el navegador"""
+        action_type = action.get("type")
+        params = action.get("params", {})
+
+        logger.debug(f"Executing action (cdp): {action_type}")
+
+        if not await page.is_alive():
+            logger.error(f"Browser is closed, cannot execute action: {action_type}")
+            return False
+
+        handler = getattr(self, f"_{action_type}", None)
+        if handler is None:
+            logger.warning(f"Unknown action type: {action_type}")
+            return False
+
+        timeout = params.get("timeout", self.config.ACTION_TIMEOUT)
+        try:
+            return await asyncio.wait_for(handler(page, params), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Action timeout ({timeout}s): {action_type}")
+            return False
+        except Exception as e:
+            logger.error(f"Action failed ({action_type}): {e}")
+            return False
+
+    async def _navigate(self, page: CDPPage, params: Dict) -> bool:
+        url = params.get("url")
+        if not url:
+            return False
+        if not url.startswith("http"):
+            url = f"https://{url}"
+
+        await page.navigate(url, timeout=self.config.ACTION_TIMEOUT)
+        await asyncio.sleep(random.uniform(2, 4))
+        logger.info(f"✓ Navigated to: {url}")
+        return True
+
+    async def _click(self, page: CDPPage, params: Dict) -> bool:
+        selector = params.get("selector")
+        if not selector:
+            return False
+
+        center = await page.wait_for_element(selector, params.get("by", "css"), timeout=10, visible=True)
+        if not center:
+            logger.warning(f"Element not found: {selector}")
+            return False
+
+        # Recalcular tras scrollIntoView
+        center = await page.element_center(selector, params.get("by", "css"))
+        if params.get("human", True):
+            await page.mouse_move(center["x"], center["y"], steps=random.randint(5, 15))
+            await asyncio.sleep(random.uniform(0.2, 0.5))
+        await page.mouse_click(center["x"], center["y"])
+
+        await asyncio.sleep(random.uniform(0.5, 1.5))
+        return True
+
+    async def _type(self, page: CDPPage, params: Dict) -> bool:
+        selector = params.get("selector")
+        text = params.get("text", "")
+        by = params.get("by", "css")
+        if not selector:
+            return False
+
+        if not await page.wait_for_element(selector, by, timeout=10):
+            logger.warning(f"Element not found: {selector}")
+            return False
+
+        clear = "el.value = '';" if params.get("clear", True) else ""
+        await page.evaluate(f"(() => {{ const el = {js_find(selector, by)}; {clear} el.focus(); }})()")
+        await asyncio.sleep(0.3)
+
+        if params.get("human", True):
+            await page.type_text(text, self.behavior.keystroke_delays(text))
+        else:
+            await page.send("Input.insertText", {"text": text})
+
+        await asyncio.sleep(random.uniform(0.3, 0.7))
+        return True
+
+    async def _human_typing(self, page: CDPPage, params: Dict) -> bool:
+        return await self._type(page, {**params, "human": True})
+
+    async def _scroll(self, page: CDPPage, params: Dict) -> bool:
+        amount = params.get("amount", self.behavior.scroll_amount())
+        if params.get("direction", "down") != "down":
+            amount = -amount
+        behavior = "smooth" if params.get("smooth", True) else "auto"
+
+        await page.evaluate(f"window.scrollBy({{top: {int(amount)}, behavior: '{behavior}'}})")
+        await asyncio.sleep(random.uniform(1, 2))
+        logger.debug(f"✓ Scrolled {amount}px")
+        return True
+
+    async def _wait(self, page: CDPPage, params: Dict) -> bool:
+        duration = params.get("duration", 1)
+        await asyncio.sleep(duration)
+        return True
+
+    async def _wait_element(self, page: CDPPage, params: Dict) -> bool:
+        selector = params.get("selector")
+        timeout = params.get("timeout", 10)
+        if not selector:
+            return False
+
+        if await page.wait_for_element(selector, params.get("by", "css"), timeout=timeout):
+            return True
+        logger.warning(f"Element not found within {timeout}s: {selector}")
+        return False
+
+    async def _hover(self, page: CDPPage, params: Dict) -> bool:
+        selector = params.get("selector")
+        if not selector:
+            return False
+
+        if not await page.wait_for_element(selector, timeout=10):
+            return False
+        center = await page.element_center(selector)
+        await page.mouse_move(center["x"], center["y"], steps=random.randint(5, 15))
+        await asyncio.sleep(1)
+        return True
+
+    async def _select(self, page: CDPPage, params: Dict) -> bool:
+        selector = params.get("selector")
+        value = params.get("value")
+        if not selector or not value:
+            return False
+
+        if not await page.wait_for_element(selector, timeout=10):
+            return False
+        await page.evaluate(f"""(() => {{
+            const el = {js_find(selector)};
+            el.value = {json.dumps(value)};
+            el.dispatchEvent(new Event('change', {{bubbles: true}}));
+        }})()""")
+        await asyncio.sleep(0.5)
+        return True
+
+    async def _press_key(self, page: CDPPage, params: Dict) -> bool:
+        await page.press_key(params.get("key", "ENTER"))
+        await asyncio.sleep(0.5)
+        return True
+
+    async def _screenshot(self, page: CDPPage, params: Dict) -> bool:
+        filename = params.get("filename", f"screenshot_{int(time.time())}.png")
+        result = await page.send("Page.captureScreenshot", {"format": "png"})
+        with open(filename, "wb") as f:
+            f.write(base64.b64decode(result["data"]))
+        return True
+
+    async def _switch_tab(self, page: CDPPage, params: Dict) -> bool:
+        switched = await page.switch_to(params.get("index", 0))
+        await asyncio.sleep(0.5)
+        return switched
+
+    async def _close_tab(self, page: CDPPage, params: Dict) -> bool:
+        await page.close_tab()
+        await asyncio.sleep(0.5)
+        return True
+
+    async def _execute_script(self, page: CDPPage, params: Dict) -> bool:
+        script = params.get("script")
+        if not script:
+            return False
+        # Selenium ejecuta el script como cuerpo de función
+        await page.evaluate(f"(() => {{ {script} }})()")
+        await asyncio.sleep(0.5)
+        return True
+
+    async def _random_mouse(self, page: CDPPage, params: Dict) -> bool:
+        viewport = await page.evaluate("({w: window.innerWidth, h: window.innerHeight})")
+        for _ in range(params.get("movements", 3)):
+            x = min(max(page.mouse_x + random.randint(-200, 200), 0), viewport["w"] - 1)
+            y = min(max(page.mouse_y + random.randint(-200, 200), 0), viewport["h"] - 1)
+            await page.mouse_move(x, y, steps=random.randint(5, 15))
+            await asyncio.sleep(random.uniform(0.5, 1.5))
+        return True
+
+    async def _resolve_selector(
+        self,
+        page: CDPPage,
+        group: str,
+        selectors: List[str],
+        timeout: float = 10
+    ) -> Optional[str]:
+        """Selector que matchea (una sola sonda); aprende el ganador por dominio"""
+        domain = url_domain(await page.current_url())
+        ordered = selector_cache.ordered(domain, group, selectors)
+
+        index = await page.evaluate(probe_expression(ordered, int(timeout * 1000)), timeout=timeout + 5)
+        if index is None or index < 0:
+            return None
+
+        selector_cache.record(domain, group, ordered[index])
+        return ordered[index]
+
+    async def _search_google(self, page: CDPPage, params: Dict) -> bool:
+        query = params.get("query", "")
+        if not query:
+            logger.error("❌ No query provided for Google search")
+            return False
+
+        logger.info(f"Starting Google search: '{query}'")
+
+        if "google" not in (await page.current_url()).lower():
+            await page.navigate("https://www.google.com", timeout=self.config.ACTION_TIMEOUT)
+
+        search_selectors = [
+            "textarea[name='q']",
+            "input[name='q']",
+            "textarea.gLFyf",
+            "input.gLFyf",
+        ]
+        selector = await self._resolve_selector(page, "search_box", search_selectors, timeout=10)
+
+        if not selector:
+            logger.error("❌ Search box not found after all attempts")
+            return False
+
+        await self._click(page, {"selector": selector})
+        await self._type(page, {"selector": selector, "text": query, "human": True})
+
+        # Enter y esperar la página de resultados
+        loaded = page.wait_for_event("Page.loadEventFired")
+        await page.press_key("ENTER")
+        try:
+            await asyncio.wait_for(loaded, timeout=15)
+        except asyncio.TimeoutError:
+            logger.warning("Results page load event not received")
+
+        await asyncio.sleep(random.uniform(3, 5))
+
+        final_url = (await page.current_url()).lower()
+        if "search" in final_url or "q=" in final_url:
+            logger.info(f"✅ Google search completed successfully: '{query}'")
+        else:
+            logger.warning(f"⚠️ Search completed but URL unexpected: {final_url}")
+        return True
+
+    async def _login(self, page: CDPPage, params: Dict) -> bool:
+        logger.warning("Login action not fully implemented")
+        return False
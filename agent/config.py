@@ -17,13 +17,57 @@ class AgentConfig(BaseSettings):
     ADSPOWER_API_URL: str = "http://local.adspower.net:50325"
     ADSPOWER_API_KEY: str
     
+    # Backend de automatización: "selenium" (chromedriver) o "cdp" (DevTools directo)
+    BROWSER_BACKEND: str = "selenium"
+    
+    # Al iniciar, cerrar los navegadores que este agente dejó abiertos (no los abiertos a mano)
+    CLOSE_ORPHAN_BROWSERS_ON_START: bool = True
+    
     # Capacidad
     MAX_BROWSERS: int = 10
     MAX_CONCURRENT_EXECUTIONS: int = 5
     
+    # Pool de sesiones: navegadores inactivos se reutilizan durante este TTL (0 = desactivado)
+    BROWSER_IDLE_TTL: int = 300  # segundos
+    SESSION_POOL_WAIT_TIMEOUT: float = 120  # segundos esperando una sesión libre con MAX_BROWSERS en uso
+    
+    # Admisión por recursos (porcentajes; pausa sobre HIGH, reanuda bajo LOW)
+    ADMISSION_CPU_HIGH: float = 90
+    ADMISSION_CPU_LOW: float = 70
+    ADMISSION_MEMORY_HIGH: float = 85
+    ADMISSION_MEMORY_LOW: float = 75
+    ADMISSION_SAMPLE_INTERVAL: float = 2  # segundos
+    ADMISSION_MAX_QUEUE: int = 20
+    ADMISSION_QUEUE_TIMEOUT: float = 600  # segundos en cola antes de diferir
+    CREDIT_PREFETCH: int = 1  # ejecuciones extra que se piden por adelantado al orquestador
+    BROWSER_LAUNCH_STAGGER: float = 1.5  # segundos mínimos entre browser/start
+    
+    # Progreso: latencia máxima antes de enviar lo acumulado de una ejecución
+    PROGRESS_MAX_LATENCY_MS: int = 500
+    PROGRESS_MAX_BATCH: int = 50  # entradas por frame
+    
+    # Outbox: journal local de eventos hasta el ack del orquestador
+    OUTBOX_PATH: str = "data/outbox.db"
+    OUTBOX_REPLAY_BATCH: int = 100  # eventos por frame
+    OUTBOX_MAX_INFLIGHT: int = 500  # eventos enviados sin ack antes de esperar
+    OUTBOX_ACK_TIMEOUT: float = 30  # segundos; luego se reenvía desde el último ack
+    
+    # Caché de scripts por hash de contenido
+    SCRIPT_CACHE_SIZE: int = 64
+    SCRIPT_FETCH_TIMEOUT: float = 15  # segundos esperando script_body
+    
+    # Selectores aprendidos por dominio (se olvidan tras este TTL sin aciertos)
+    SELECTOR_CACHE_TTL: int = 604800  # segundos (7 días)
+    
+    # Telemetría (ring buffer de muestras; resumen en cada heartbeat)
+    TELEMETRY_SAMPLE_INTERVAL: float = 5  # segundos
+    TELEMETRY_WINDOW: int = 60  # muestras
+    TELEMETRY_LATENCY_WINDOW: int = 500  # últimas acciones para percentiles
+    
     # Timeouts
     ACTION_TIMEOUT: int = 30  # segundos
     BROWSER_OPEN_TIMEOUT: int = 60
+    BROWSER_READY_TIMEOUT: float = 30  # deadline para que responda DevTools
     
     # Logs
     LOG_LEVEL: str = "INFO"
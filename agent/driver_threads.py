@@ -0,0 +1,79 @@
+# agent/driver_threads.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+
+
+class DriverThreads:
+    """
+    Un hilo dedicado por navegador para las llamadas bloqueantes de Selenium
+
+    Las llamadas a un mismo driver se serializan en su hilo (WebDriver no es
+    thread-safe) y el event loop queda libre: heartbeats, lecturas del
+    WebSocket y otras ejecuciones siguen avanzando mientras una página carga.
+    """
+
+    def __init__(self):
+        # id(driver) -> executor de un solo hilo
+        self._executors: Dict[int, ThreadPoolExecutor] = {}
+
+    def _get_executor(self, driver, name: Optional[str] = None) -> ThreadPoolExecutor:
+        key = id(driver)
+        if key not in self._executors:
+            self._executors[key] = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=f"driver-{name or key}"
+            )
+        return self._executors[key]
+
+    async def run(
+        self,
+        driver,
+        func: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Ejecuta func(*args, **kwargs) en el hilo del driver
+
+        Con timeout, el await falla con asyncio.TimeoutError al vencer aunque
+        la llamada siga bloqueada en el hilo; la cancelación de la tarea que
+        espera se propaga igual.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._get_executor(driver),
+            functools.partial(func, *args, **kwargs)
+        )
+
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout=timeout)
+
+    def bind(self, driver, name: str):
+        """Crea el hilo del driver con un nombre legible (profile_id)"""
+        self._get_executor(driver, name)
+
+    def release(self, driver):
+        """Libera el hilo del driver (no espera llamadas colgadas)"""
+        executor = self._executors.pop(id(driver), None)
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """Libera todos los hilos"""
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors.clear()
+        logger.debug("Driver threads released")
+
+    def get_count(self) -> int:
+        """Hilos de driver activos"""
+        return len(self._executors)
+
+
+# Instancia global
+driver_threads = DriverThreads()
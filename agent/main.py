@@ -11,6 +11,11 @@ from config import AgentConfig
 from websocket_client import WebSocketClient
 from browser_controller import BrowserController
 from warming_executor import WarmingExecutor
+from session_pool import BrowserSessionPool
+from admission import AdmissionController
+from telemetry import TelemetrySampler
+from driver_threads import driver_threads
+from selector_cache import selector_cache
 
 class AdsPowerAgent:
     """Agente AdsPower para ejecución distribuida"""
@@ -23,15 +28,24 @@ class AdsPowerAgent:
         self._setup_logging()
         
         # Inicializar componentes
+        selector_cache.ttl = self.config.SELECTOR_CACHE_TTL
         self.browser_controller = BrowserController(self.config)
+        self.session_pool = BrowserSessionPool(self.config, self.browser_controller)
+        self.admission = AdmissionController(self.config, self.browser_controller)
+        self.telemetry = TelemetrySampler(self.config, self.browser_controller, self.admission)
         self.warming_executor = WarmingExecutor(
             self.config,
-            self.browser_controller
+            self.browser_controller,
+            self.session_pool,
+            self.admission,
+            self.telemetry
         )
         self.websocket_client = WebSocketClient(
             self.config,
             self.warming_executor
         )
+        # Navegadores abiertos por el agente: se registran en el mismo journal SQLite
+        self.browser_controller.launches = self.websocket_client.outbox
         
         # Estado
         self.running = False
@@ -84,6 +98,18 @@ class AdsPowerAgent:
         logger.info("=" * 60)
         
         try:
+            # Reconciliar navegadores abiertos de una ejecución previa
+            if self.config.CLOSE_ORPHAN_BROWSERS_ON_START:
+                await self.browser_controller.reconcile_on_startup()
+            
+            # Pool de sesiones de navegador, control de admisión y telemetría
+            await self.session_pool.start()
+            await self.admission.start()
+            await self.telemetry.start()
+            
+            # Eventos pendientes de una ejecución previa se reenvían al conectar
+            await self.websocket_client.outbox.open()
+            
             # Conectar al orquestrador
             logger.info("Connecting to orchestrator...")
             await self.websocket_client.connect()
@@ -112,10 +138,16 @@ class AdsPowerAgent:
         self.running = False
         
         # Cerrar navegadores
+        await self.telemetry.stop()
+        await self.admission.stop()
+        await self.session_pool.close_all()
         await self.browser_controller.close_all_browsers()
+        await self.browser_controller.shutdown()
+        driver_threads.shutdown()
         
         # Desconectar WebSocket
         await self.websocket_client.disconnect()
+        await self.websocket_client.outbox.close()
         
         # Calcular uptime
         if self.start_time:
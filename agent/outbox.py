@@ -0,0 +1,159 @@
+# agent/outbox.py
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+
+class Outbox:
+    """
+    Journal local de eventos salientes (SQLite en modo WAL)
+
+    Cada evento recibe un número de secuencia creciente y queda guardado
+    hasta que el orquestador confirma (ack) esa secuencia; tras una
+    desconexión o un reinicio del agente se reenvía en orden lo pendiente.
+    Las escrituras corren en un hilo propio para no bloquear el event loop.
+
+    epoch identifica este archivo: se genera al crear la base, así el
+    orquestador sabe que las secuencias reiniciaron si el journal se borra.
+
+    launched_browsers guarda los perfiles que este agente abrió en AdsPower
+    y aún no cerró: al reiniciar se cierran solo esos, no los que abrió a
+    mano un operador.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+        self._conn: Optional[sqlite3.Connection] = None
+        self.epoch: Optional[str] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS outbox_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS launched_browsers ("
+                " profile_id TEXT PRIMARY KEY,"
+                " launched_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO outbox_meta (key, value) VALUES ('epoch', ?)",
+                (uuid.uuid4().hex,)
+            )
+            conn.commit()
+            self.epoch = conn.execute("SELECT value FROM outbox_meta WHERE key = 'epoch'").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self) -> int:
+        """Abre el journal; retorna cuántos eventos quedaron pendientes"""
+        pending = await self.count()
+        if pending:
+            logger.info(f"📬 Outbox: {pending} events pending from previous run")
+        return pending
+
+    def _append(self, payload: str) -> int:
+        conn = self._connect()
+        cursor = conn.execute(
+            "INSERT INTO outbox (payload, created_at) VALUES (?, ?)",
+            (payload, time.time())
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+    async def append(self, message: Dict) -> int:
+        """Guarda un evento; retorna su secuencia"""
+        return await self._run(self._append, json.dumps(message))
+
+    def _read_after(self, seq: int, limit: int) -> List[Tuple[int, Dict]]:
+        rows = self._connect().execute(
+            "SELECT seq, payload FROM outbox WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, limit)
+        ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    async def read_after(self, seq: int, limit: int) -> List[Tuple[int, Dict]]:
+        """Eventos pendientes con secuencia mayor a seq, en orden"""
+        return await self._run(self._read_after, seq, limit)
+
+    def _ack(self, seq: int) -> int:
+        conn = self._connect()
+        cursor = conn.execute("DELETE FROM outbox WHERE seq <= ?", (seq,))
+        conn.commit()
+        return cursor.rowcount
+
+    async def ack(self, seq: int) -> int:
+        """Descarta los eventos confirmados (ack acumulativo)"""
+        return await self._run(self._ack, seq)
+
+    def _count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    async def count(self) -> int:
+        return await self._run(self._count)
+
+    def _record_launch(self, profile_id: str):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO launched_browsers (profile_id, launched_at) VALUES (?, ?)",
+            (profile_id, time.time())
+        )
+        conn.commit()
+
+    async def record_launch(self, profile_id) -> None:
+        """Registra un navegador abierto por el agente"""
+        await self._run(self._record_launch, str(profile_id))
+
+    def _forget_launches(self, profile_ids: List[str]) -> int:
+        conn = self._connect()
+        cursor = conn.executemany(
+            "DELETE FROM launched_browsers WHERE profile_id = ?",
+            [(p,) for p in profile_ids]
+        )
+        conn.commit()
+        return cursor.rowcount
+
+    async def forget_launches(self, profile_ids) -> int:
+        """Quita navegadores ya cerrados del registro"""
+        profile_ids = [str(p) for p in profile_ids]
+        if not profile_ids:
+            return 0
+        return await self._run(self._forget_launches, profile_ids)
+
+    def _launched(self) -> List[str]:
+        rows = self._connect().execute("SELECT profile_id FROM launched_browsers").fetchall()
+        return [row[0] for row in rows]
+
+    async def launched(self) -> List[str]:
+        """Perfiles abiertos por el agente y no cerrados (p.ej. antes de un crash)"""
+        return await self._run(self._launched)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
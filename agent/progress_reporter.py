@@ -0,0 +1,113 @@
+# agent/progress_reporter.py
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict
+from loguru import logger
+
+
+class ProgressReporter:
+    """
+    Coalesce el progreso de cada ejecución antes de enviarlo
+
+    Los log_entry de una ejecución se acumulan y salen juntos en un solo
+    frame execution_progress_batch a lo sumo max_latency_ms después del
+    primero. Las acciones fallidas y los eventos finales (completed/error)
+    vacían el buffer de inmediato, con lo pendiente delante.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict], Awaitable[bool]],
+        max_latency_ms: int = 500,
+        max_batch: int = 50
+    ):
+        self.send = send
+        self.max_latency = max_latency_ms / 1000
+        self.max_batch = max_batch
+
+        # execution_id -> {'progress', 'entries'}
+        self._buffers: Dict[int, Dict] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        # Un flush a la vez por ejecución para no desordenar frames
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+        self.stats = {'entries': 0, 'frames': 0}
+
+    @staticmethod
+    def is_urgent(log_entry: dict) -> bool:
+        """Fallos y eventos finales no esperan al timer"""
+        return (
+            'completed' in log_entry
+            or 'error' in log_entry
+            or log_entry.get('success') is False
+        )
+
+    async def report(self, execution_id: int, progress: int, log_entry: dict):
+        """progress_callback de WarmingExecutor"""
+        buffer = self._buffers.get(execution_id)
+        if buffer is None:
+            buffer = self._buffers[execution_id] = {'progress': progress, 'entries': []}
+            self._schedule(execution_id)
+
+        buffer['progress'] = progress
+        buffer['entries'].append(log_entry)
+        self.stats['entries'] += 1
+
+        if self.is_urgent(log_entry) or len(buffer['entries']) >= self.max_batch:
+            await self.flush(execution_id)
+
+        if 'completed' in log_entry:
+            self._discard(execution_id)
+
+    def _schedule(self, execution_id: int):
+        loop = asyncio.get_running_loop()
+        self._timers[execution_id] = loop.call_later(
+            self.max_latency,
+            lambda: asyncio.ensure_future(self.flush(execution_id))
+        )
+
+    async def flush(self, execution_id: int) -> bool:
+        """Envía lo acumulado de una ejecución en un solo frame"""
+        lock = self._locks.setdefault(execution_id, asyncio.Lock())
+        async with lock:
+            timer = self._timers.pop(execution_id, None)
+            if timer:
+                timer.cancel()
+
+            buffer = self._buffers.pop(execution_id, None)
+            if not buffer or not buffer['entries']:
+                return True
+
+            self.stats['frames'] += 1
+            return await self.send({
+                "type": "execution_progress_batch",
+                "execution_id": execution_id,
+                "progress": buffer['progress'],
+                "log_entries": buffer['entries'],
+                "timestamp": datetime.utcnow().isoformat()
+            })
+
+    async def flush_all(self):
+        """Vacía todos los buffers (desconexión o apagado)"""
+        for execution_id in list(self._buffers):
+            try:
+                await self.flush(execution_id)
+            except Exception as e:
+                logger.error(f"Progress flush failed for execution {execution_id}: {e}")
+
+    def _discard(self, execution_id: int):
+        """Libera el estado de una ejecución terminada"""
+        timer = self._timers.pop(execution_id, None)
+        if timer:
+            timer.cancel()
+        self._buffers.pop(execution_id, None)
+        lock = self._locks.get(execution_id)
+        if lock is not None and not lock.locked():
+            self._locks.pop(execution_id, None)
+
+    def get_pending(self) -> Dict[int, int]:
+        """Entradas pendientes por ejecución"""
+        return {eid: len(b['entries']) for eid, b in self._buffers.items()}
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'pending': sum(self.get_pending().values())}
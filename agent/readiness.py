@@ -0,0 +1,85 @@
+# agent/readiness.py
+import asyncio
+import time
+from typing import Dict, Optional
+import httpx
+
+# Límites superiores de los buckets (ms); el último bucket es +Inf
+READINESS_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+async def wait_for_devtools(
+    debug_port: int,
+    host: str = "127.0.0.1",
+    timeout: float = 30.0,
+    initial_delay: float = 0.05,
+    max_delay: float = 1.0,
+    client: Optional[httpx.AsyncClient] = None
+) -> float:
+    """
+    Espera a que el puerto DevTools responda, con backoff exponencial
+
+    Retorna los segundos transcurridos; lanza TimeoutError si vence el deadline.
+    Con `client` reutiliza su pool de conexiones.
+    """
+    url = f"http://{host}:{debug_port}/json/version"
+    start = time.monotonic()
+    deadline = start + timeout
+    delay = initial_delay
+    last_error: Optional[Exception] = None
+
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient(timeout=min(2.0, timeout))
+
+    try:
+        while True:
+            try:
+                response = await client.get(url)
+                if response.status_code == 200:
+                    return time.monotonic() - start
+            except httpx.HTTPError as e:
+                last_error = e
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(
+                    f"DevTools port {debug_port} not ready after {timeout}s: {last_error}"
+                )
+
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+    finally:
+        if own_client:
+            await client.aclose()
+
+
+class LatencyHistogram:
+    """Histograma acumulado de latencias (ms)"""
+
+    def __init__(self, buckets_ms=READINESS_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, elapsed_ms: float):
+        """Registra una observación"""
+        index = len(self.buckets_ms)
+        for i, upper in enumerate(self.buckets_ms):
+            if elapsed_ms <= upper:
+                index = i
+                break
+
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_ms += elapsed_ms
+
+    def snapshot(self) -> Dict:
+        """Formato serializable (mismo que el orquestador)"""
+        labels = [f"le_{upper}" for upper in self.buckets_ms] + ["le_inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 1) if self.count else None,
+            "buckets": dict(zip(labels, self.counts))
+        }
@@ -0,0 +1,97 @@
+# agent/script_cache.py
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+
+
+def script_content_hash(actions: List[Dict]) -> str:
+    """sha256 del JSON canónico de las acciones (mismo cálculo que el orquestador)"""
+    canonical = json.dumps(actions, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ScriptCache:
+    """
+    Caché LRU de scripts de warming por hash de contenido
+
+    Los comandos execute_warming traen solo script_hash; el cuerpo se pide
+    al orquestador una vez (single-flight: varias ejecuciones del mismo
+    script esperan la misma respuesta) y se verifica contra el hash.
+    """
+
+    def __init__(self, max_entries: int = 64, fetch_timeout: float = 15.0):
+        self.max_entries = max_entries
+        self.fetch_timeout = fetch_timeout
+
+        self._scripts: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, script_hash: str) -> Optional[List[Dict]]:
+        actions = self._scripts.get(script_hash)
+        if actions is not None:
+            self._scripts.move_to_end(script_hash)
+        return actions
+
+    def put(self, script_hash: str, actions: List[Dict]) -> bool:
+        """Guarda el script si el contenido corresponde al hash"""
+        if script_content_hash(actions) != script_hash:
+            logger.error(f"Script body does not match hash {script_hash[:12]}")
+            return False
+
+        self._scripts[script_hash] = actions
+        self._scripts.move_to_end(script_hash)
+        while len(self._scripts) > self.max_entries:
+            self._scripts.popitem(last=False)
+        return True
+
+    async def resolve(
+        self,
+        script_hash: str,
+        script_id: Optional[int],
+        request: Callable[[str, Optional[int]], Awaitable[bool]]
+    ) -> List[Dict]:
+        """Acciones del script; en caso de miss las pide con request()"""
+        actions = self.get(script_hash)
+        if actions is not None:
+            self.stats['hits'] += 1
+            return actions
+
+        future = self._pending.get(script_hash)
+        if future is None:
+            self.stats['misses'] += 1
+            future = asyncio.get_running_loop().create_future()
+            self._pending[script_hash] = future
+
+            if not await request(script_hash, script_id):
+                self._fail(script_hash, "Cannot request script body: not connected")
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.fetch_timeout)
+        except asyncio.TimeoutError:
+            error = f"Script {script_hash[:12]} not received in {self.fetch_timeout}s"
+            self._fail(script_hash, error)
+            raise Exception(error)
+
+    def deliver(self, script_hash: str, actions: Optional[List[Dict]], error: Optional[str] = None):
+        """Respuesta script_body del orquestador"""
+        if actions is not None and self.put(script_hash, actions):
+            future = self._pending.pop(script_hash, None)
+            if future and not future.done():
+                future.set_result(actions)
+            return
+
+        self._fail(script_hash, error or "Invalid script body")
+
+    def _fail(self, script_hash: str, error: str):
+        future = self._pending.pop(script_hash, None)
+        if future and not future.done():
+            future.set_exception(Exception(error))
+            future.exception()  # evitar "exception was never retrieved"
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'size': len(self._scripts), 'pending': len(self._pending)}
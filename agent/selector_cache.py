@@ -0,0 +1,126 @@
+# agent/selector_cache.py
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+# Sondeo en una sola llamada (execute_async_script): prueba todos los
+# selectores en cada vuelta hasta encontrar uno o vencer el timeout.
+# Retorna [índice, elemento] o [-1, null].
+PROBE_ASYNC_SCRIPT = """
+var selectors = arguments[0], timeoutMs = arguments[1];
+var done = arguments[arguments.length - 1];
+var start = Date.now();
+(function probe() {
+    for (var i = 0; i < selectors.length; i++) {
+        var el = document.querySelector(selectors[i]);
+        if (el) { return done([i, el]); }
+    }
+    if (Date.now() - start >= timeoutMs) { return done([-1, null]); }
+    setTimeout(probe, 100);
+})();
+"""
+
+
+def probe_expression(selectors: List[str], timeout_ms: int) -> str:
+    """Misma sonda como expresión (Runtime.evaluate con awaitPromise); retorna el índice"""
+    return f"""
+new Promise(resolve => {{
+    const selectors = {json.dumps(selectors)};
+    const start = Date.now();
+    (function probe() {{
+        const i = selectors.findIndex(s => document.querySelector(s));
+        if (i >= 0 || Date.now() - start >= {int(timeout_ms)}) {{ return resolve(i); }}
+        setTimeout(probe, 100);
+    }})();
+}})
+"""
+
+
+def url_domain(url: str) -> str:
+    """Dominio (netloc) de una URL, sin www."""
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+
+class SelectorCache:
+    """
+    Selector ganador por dominio y grupo (ej. "search_box")
+
+    Recuerda qué selector encontró el elemento en cada dominio, con
+    contador de aciertos y expiración por TTL, para probarlo primero la
+    próxima vez. La tabla se exporta al orquestador y se precarga en
+    agentes nuevos.
+    """
+
+    def __init__(self, ttl: float = 7 * 24 * 3600):
+        self.ttl = ttl
+        # (dominio, grupo) -> {'selector', 'hits', 'last_hit'}
+        self._entries: Dict[Tuple[str, str], Dict] = {}
+        self.dirty = False
+
+    def _get(self, domain: str, group: str) -> Optional[Dict]:
+        entry = self._entries.get((domain, group))
+        if entry and time.time() - entry['last_hit'] > self.ttl:
+            del self._entries[(domain, group)]
+            return None
+        return entry
+
+    def ordered(self, domain: str, group: str, candidates: List[str]) -> List[str]:
+        """Candidatos con el ganador conocido primero"""
+        entry = self._get(domain, group)
+        if not entry:
+            return list(candidates)
+        winner = entry['selector']
+        return [winner] + [s for s in candidates if s != winner]
+
+    def record(self, domain: str, group: str, selector: str):
+        """Registra el selector que encontró el elemento"""
+        entry = self._get(domain, group)
+        if entry and entry['selector'] == selector:
+            entry['hits'] += 1
+            entry['last_hit'] = time.time()
+        else:
+            self._entries[(domain, group)] = {'selector': selector, 'hits': 1, 'last_hit': time.time()}
+        self.dirty = True
+
+    def evict_expired(self) -> int:
+        now = time.time()
+        expired = [k for k, e in self._entries.items() if now - e['last_hit'] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    def export(self) -> List[Dict]:
+        """Tabla serializable para el orquestador"""
+        self.evict_expired()
+        return [
+            {'domain': domain, 'group': group, **entry}
+            for (domain, group), entry in self._entries.items()
+        ]
+
+    def load(self, entries: List[Dict]):
+        """Precarga la tabla del orquestador sin pisar lo aprendido localmente"""
+        for item in entries:
+            try:
+                key = (item['domain'], item['group'])
+                entry = {
+                    'selector': item['selector'],
+                    'hits': int(item.get('hits', 0)),
+                    'last_hit': float(item.get('last_hit', time.time()))
+                }
+            except (KeyError, TypeError, ValueError):
+                continue
+            if key not in self._entries and time.time() - entry['last_hit'] <= self.ttl:
+                self._entries[key] = entry
+
+    def get_stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'hits': sum(e['hits'] for e in self._entries.values())
+        }
+
+
+# Instancia global
+selector_cache = SelectorCache()
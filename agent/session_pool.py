@@ -0,0 +1,206 @@
+# agent/session_pool.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from loguru import logger
+
+
+class SessionPoolFull(Exception):
+    """Todos los navegadores del pool están en uso y ninguno se liberó a tiempo"""
+
+
+class BrowserSessionPool:
+    """
+    Pool de sesiones de navegador por perfil
+
+    Mantiene vivos los drivers ya conectados durante BROWSER_IDLE_TTL para
+    reutilizarlos si el mismo perfil vuelve a ejecutarse, con desalojo LRU
+    acotado por MAX_BROWSERS. El tope lo aplica el pool: si todas las
+    sesiones están en uso, acquire espera a que se libere una.
+    """
+
+    def __init__(self, config, browser_controller):
+        self.config = config
+        self.browser_controller = browser_controller
+        self.max_sessions = config.MAX_BROWSERS
+        self.idle_ttl = config.BROWSER_IDLE_TTL
+        self.wait_timeout = config.SESSION_POOL_WAIT_TIMEOUT
+
+        # profile_id -> último uso (orden LRU: el primero es el más antiguo)
+        self.idle: "OrderedDict[int, float]" = OrderedDict()
+        self.in_use: Dict[int, object] = {}
+        # Navegadores abriéndose (ya cuentan para el tope)
+        self._opening = 0
+        self._slot_freed = asyncio.Event()
+
+        # Un perfil solo puede tener un navegador: serializar su uso
+        self._profile_locks: Dict[int, asyncio.Lock] = {}
+        self._reaper_task: Optional[asyncio.Task] = None
+
+        self.stats = {'reused': 0, 'opened': 0, 'evicted': 0, 'expired': 0, 'waited': 0}
+
+    async def acquire(self, profile_id: int):
+        """Retorna un driver para el perfil (reutilizado o nuevo)"""
+        lock = self._profile_locks.setdefault(profile_id, asyncio.Lock())
+        await lock.acquire()
+
+        try:
+            if profile_id in self.idle:
+                del self.idle[profile_id]
+                driver = self.browser_controller.active_browsers.get(profile_id)
+
+                if driver and await self._is_healthy(driver):
+                    self.in_use[profile_id] = driver
+                    self.stats['reused'] += 1
+                    logger.info(f"♻️ Reusing browser session for profile {profile_id}")
+                    return driver
+
+                logger.warning(f"Pooled session for profile {profile_id} is dead, reopening")
+                await self.browser_controller.close_browser(profile_id)
+
+            await self._make_room()
+
+            self._opening += 1
+            try:
+                driver = await self.browser_controller.open_browser(profile_id)
+            finally:
+                self._opening -= 1
+
+            if not driver:
+                self._slot_freed.set()
+                lock.release()
+                return None
+
+            self.in_use[profile_id] = driver
+            self.stats['opened'] += 1
+            return driver
+
+        except BaseException:
+            if lock.locked():
+                lock.release()
+            raise
+
+    async def release(self, profile_id: int, reusable: bool = True):
+        """Devuelve la sesión al pool (o la cierra si no es reutilizable)"""
+        driver = self.in_use.pop(profile_id, None)
+
+        try:
+            if driver is None:
+                return
+
+            if reusable and self.idle_ttl > 0 and await self._is_healthy(driver):
+                self.idle[profile_id] = time.monotonic()
+                self.idle.move_to_end(profile_id)
+                logger.debug(f"Browser session for profile {profile_id} returned to pool")
+            else:
+                await self.browser_controller.close_browser(profile_id)
+
+        finally:
+            # Un lugar libre (o una sesión inactiva desalojable) para quien espera
+            self._slot_freed.set()
+            lock = self._profile_locks.get(profile_id)
+            if lock and lock.locked():
+                lock.release()
+
+    async def start(self):
+        """Inicia el loop que cierra sesiones inactivas"""
+        if self._reaper_task is None and self.idle_ttl > 0:
+            self._reaper_task = asyncio.create_task(self._reaper_loop())
+
+    async def close_all(self):
+        """Detiene el reaper y cierra las sesiones inactivas"""
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+            self._reaper_task = None
+
+        for profile_id in list(self.idle.keys()):
+            await self._close_idle(profile_id)
+
+    def get_stats(self) -> Dict:
+        """Estadísticas del pool"""
+        return {
+            **self.stats,
+            'idle': len(self.idle),
+            'in_use': len(self.in_use),
+            'opening': self._opening,
+            'max_sessions': self.max_sessions
+        }
+
+    def _occupied(self) -> int:
+        return len(self.idle) + len(self.in_use) + self._opening
+
+    async def _make_room(self):
+        """
+        Deja un lugar libre: desaloja sesiones inactivas (LRU) o, si todas
+        están en uso, espera a que se libere una (SessionPoolFull al vencer)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        waited = False
+
+        while self._occupied() >= self.max_sessions:
+            if self.idle:
+                profile_id = next(iter(self.idle))
+                logger.info(f"Evicting idle browser session for profile {profile_id} (LRU)")
+                if await self._close_idle(profile_id):
+                    self.stats['evicted'] += 1
+                continue
+
+            if not waited:
+                waited = True
+                self.stats['waited'] += 1
+                logger.info(f"All {self.max_sessions} browser sessions in use, waiting for a release")
+
+            remaining = deadline - loop.time()
+            self._slot_freed.clear()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(self._slot_freed.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                raise SessionPoolFull(
+                    f"All {self.max_sessions} browser sessions still in use after {self.wait_timeout}s"
+                )
+
+    async def _close_idle(self, profile_id: int) -> bool:
+        """Cierra una sesión inactiva bajo el lock del perfil"""
+        lock = self._profile_locks.setdefault(profile_id, asyncio.Lock())
+        async with lock:
+            # Puede haber sido readquirida mientras esperábamos el lock
+            if profile_id not in self.idle:
+                return False
+            del self.idle[profile_id]
+            await self.browser_controller.close_browser(profile_id)
+            self._slot_freed.set()
+            return True
+
+    async def _is_healthy(self, driver) -> bool:
+        return await self.browser_controller.is_driver_alive(driver)
+
+    async def _reaper_loop(self):
+        """Cierra sesiones inactivas más viejas que idle_ttl"""
+        interval = max(5, min(60, self.idle_ttl / 2))
+
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                now = time.monotonic()
+
+                expired = [
+                    profile_id for profile_id, last_used in self.idle.items()
+                    if now - last_used >= self.idle_ttl
+                ]
+                for profile_id in expired:
+                    if await self._close_idle(profile_id):
+                        logger.info(f"Closed idle browser session for profile {profile_id}")
+                        self.stats['expired'] += 1
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Session pool reaper error: {e}")
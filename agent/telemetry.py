@@ -0,0 +1,109 @@
+# agent/telemetry.py
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from loguru import logger
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Percentil (nearest-rank) de una lista ya ordenada"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class TelemetrySampler:
+    """
+    Telemetría del agente muestreada en background
+
+    Guarda en un ring buffer muestras periódicas de CPU, memoria, navegadores
+    activos y cola de admisión, más las latencias recientes de acciones.
+    CPU y memoria se toman del último muestreo de AdmissionController
+    (cpu_percent(interval=None) mide desde la llamada anterior, así que
+    debe haber un solo lector de psutil). Los status y heartbeats leen
+    de aquí sin bloquear el event loop.
+    """
+
+    def __init__(self, config, browser_controller, admission):
+        self.config = config
+        self.browser_controller = browser_controller
+        self.admission = admission
+
+        self.samples: Deque[Dict] = deque(maxlen=config.TELEMETRY_WINDOW)
+        self.action_latencies_ms: Deque[float] = deque(maxlen=config.TELEMETRY_LATENCY_WINDOW)
+
+        self.started_at = time.monotonic()
+        self._sampler_task: Optional[asyncio.Task] = None
+
+    def observe_action(self, elapsed_ms: float):
+        """Registra la duración de una acción"""
+        self.action_latencies_ms.append(elapsed_ms)
+
+    async def start(self):
+        """Inicia el muestreo periódico"""
+        if self._sampler_task is None:
+            self.sample()
+            self._sampler_task = asyncio.create_task(self._sampler_loop())
+
+    async def stop(self):
+        if self._sampler_task:
+            self._sampler_task.cancel()
+            try:
+                await self._sampler_task
+            except asyncio.CancelledError:
+                pass
+            self._sampler_task = None
+
+    async def _sampler_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.config.TELEMETRY_SAMPLE_INTERVAL)
+                self.sample()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Telemetry sampler error: {e}")
+
+    def sample(self) -> Dict:
+        """Agrega una muestra al ring buffer"""
+        entry = {
+            'ts': time.time(),
+            'cpu': round(self.admission.cpu_percent, 1),
+            'mem': round(self.admission.memory_percent, 1),
+            'browsers': self.browser_controller.get_active_count(),
+            'running': self.admission.running,
+            'queue': self.admission.get_queue_depth()
+        }
+        self.samples.append(entry)
+        return entry
+
+    def get_uptime_seconds(self) -> int:
+        return int(time.monotonic() - self.started_at)
+
+    def get_latency_percentiles(self) -> Dict:
+        latencies = sorted(self.action_latencies_ms)
+        result = {}
+        for pct in (50, 95, 99):
+            value = percentile(latencies, pct)
+            result[f"p{pct}"] = round(value, 1) if value is not None else None
+        return result
+
+    def get_summary(self) -> Dict:
+        """Resumen compacto para el heartbeat"""
+        latest = self.samples[-1] if self.samples else self.sample()
+        window = list(self.samples)
+
+        return {
+            **{k: latest[k] for k in ('cpu', 'mem', 'browsers', 'running', 'queue')},
+            'cpu_avg': round(sum(s['cpu'] for s in window) / len(window), 1),
+            'mem_max': max(s['mem'] for s in window),
+            'actions': len(self.action_latencies_ms),
+            **self.get_latency_percentiles(),
+            'uptime': self.get_uptime_seconds()
+        }
+
+    def get_history(self) -> List[Dict]:
+        """Muestras del ring buffer (más antigua primero)"""
+        return list(self.samples)
@@ -1,32 +1,55 @@
 # agent/warming_executor.py
 import asyncio
+import time
 from typing import Dict, List, Callable, Optional
 from loguru import logger
 from datetime import datetime
 from action_executor import ActionExecutor
+from cdp_backend import CDPActionExecutor
+from session_pool import BrowserSessionPool
+from admission import AdmissionController
+from telemetry import TelemetrySampler
 
 class WarmingExecutor:
     """Ejecutor de warming scripts"""
     
-    def __init__(self, config, browser_controller):
+    def __init__(
+        self,
+        config,
+        browser_controller,
+        session_pool: Optional[BrowserSessionPool] = None,
+        admission: Optional[AdmissionController] = None,
+        telemetry: Optional[TelemetrySampler] = None
+    ):
         self.config = config
         self.browser_controller = browser_controller
-        self.action_executor = ActionExecutor(config)
+        self.session_pool = session_pool or BrowserSessionPool(config, browser_controller)
+        self.action_executor = (
+            CDPActionExecutor(config) if config.BROWSER_BACKEND == "cdp"
+            else ActionExecutor(config)
+        )
         
         # Ejecuciones activas: execution_id -> task
         self.active_executions: Dict[int, asyncio.Task] = {}
         
-        # Semáforo para limitar ejecuciones concurrentes
-        self.semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_EXECUTIONS)
+        # ✅ Admisión según slots y recursos (reemplaza el semáforo fijo)
+        self.admission = admission or AdmissionController(config, browser_controller)
+        self.telemetry = telemetry or TelemetrySampler(config, browser_controller, self.admission)
     
     async def execute(
         self,
         execution_id: int,
         profile_id: int,
         actions: List[dict],
-        progress_callback: Optional[Callable] = None
+        progress_callback: Optional[Callable] = None,
+        barrier_wait: Optional[Callable] = None
     ):
-        """Ejecuta warming script"""
+        """
+        Ejecuta warming script
+        
+        barrier_wait(action_index) -> bool: en batches sincronizados espera
+        a los demás participantes antes de cada acción.
+        """
         
         # Crear tarea
         task = asyncio.create_task(
@@ -34,7 +57,8 @@ class WarmingExecutor:
                 execution_id,
                 profile_id,
                 actions,
-                progress_callback
+                progress_callback,
+                barrier_wait
             )
         )
         
@@ -52,95 +76,106 @@ class WarmingExecutor:
         execution_id: int,
         profile_id: int,
         actions: List[dict],
-        progress_callback: Optional[Callable] = None
+        progress_callback: Optional[Callable] = None,
+        barrier_wait: Optional[Callable] = None
     ):
         """Ejecuta warming (interno)"""
         
         driver = None
+        reusable = False
+        
+        # Esperar admisión; AdmissionDeferred se propaga como execution_failed
+        await self.admission.acquire(execution_id)
         start_time = datetime.utcnow()
         
         try:
-            # Adquirir semáforo
-            async with self.semaphore:
-                logger.info(f"Starting warming: execution_id={execution_id}, profile_id={profile_id}")
-                
-                # Abrir navegador
-                driver = await self.browser_controller.open_browser(profile_id)
-                
-                if not driver:
-                    raise Exception(f"Failed to open browser for profile {profile_id}")
-                
-                # Ejecutar acciones
-                total_actions = len(actions)
-                completed = 0
-                failed = 0
+            logger.info(f"Starting warming: execution_id={execution_id}, profile_id={profile_id}")
+            
+            # Obtener navegador (reutilizado del pool si el perfil ya estaba abierto)
+            driver = await self.session_pool.acquire(profile_id)
+            
+            if not driver:
+                raise Exception(f"Failed to open browser for profile {profile_id}")
+            
+            # Ejecutar acciones
+            total_actions = len(actions)
+            completed = 0
+            failed = 0
+            
+            for i, action in enumerate(actions):
+                # ✅ Batch sincronizado: esperar a los demás antes de la acción
+                if barrier_wait and not await barrier_wait(i):
+                    logger.warning(f"Barrier {i} not released, continuing unsynchronized")
+                    barrier_wait = None
                 
-                for i, action in enumerate(actions):
-                    try:
-                        # Ejecutar acción
-                        success = await self.action_executor.execute_action(driver, action)
-                        
-                        if success:
-                            completed += 1
-                        else:
-                            failed += 1
-                        
-                        # Calcular progreso
-                        progress = int((i + 1) / total_actions * 100)
-                        
-                        # Enviar progreso
-                        if progress_callback:
-                            await progress_callback(
-                                execution_id,
-                                progress,
-                                {
-                                    "action_index": i,
-                                    "action_type": action.get("type"),
-                                    "success": success,
-                                    "timestamp": datetime.utcnow().isoformat()
-                                }
-                            )
-                        
-                        logger.debug(f"Action {i+1}/{total_actions} completed: {action.get('type')}")
+                try:
+                    # Ejecutar acción
+                    action_start = time.monotonic()
+                    success = await self.action_executor.execute_action(driver, action)
+                    self.telemetry.observe_action((time.monotonic() - action_start) * 1000)
                     
-                    except Exception as e:
-                        logger.error(f"Action {i+1} failed: {e}")
+                    if success:
+                        completed += 1
+                    else:
                         failed += 1
-                        
-                        # Enviar error
-                        if progress_callback:
-                            await progress_callback(
-                                execution_id,
-                                int((i + 1) / total_actions * 100),
-                                {
-                                    "action_index": i,
-                                    "action_type": action.get("type"),
-                                    "success": False,
-                                    "error": str(e),
-                                    "timestamp": datetime.utcnow().isoformat()
-                                }
-                            )
-                
-                # Calcular duración
-                duration = (datetime.utcnow() - start_time).total_seconds()
-                
-                # Enviar completado
-                if progress_callback:
-                    await progress_callback(
-                        execution_id,
-                        100,
-                        {
-                            "completed": True,
-                            "total_actions": total_actions,
-                            "actions_completed": completed,
-                            "actions_failed": failed,
-                            "duration_seconds": duration,
-                            "timestamp": datetime.utcnow().isoformat()
-                        }
-                    )
+                    
+                    # Calcular progreso
+                    progress = int((i + 1) / total_actions * 100)
+                    
+                    # Enviar progreso
+                    if progress_callback:
+                        await progress_callback(
+                            execution_id,
+                            progress,
+                            {
+                                "action_index": i,
+                                "action_type": action.get("type"),
+                                "success": success,
+                                "timestamp": datetime.utcnow().isoformat()
+                            }
+                        )
+                    
+                    logger.debug(f"Action {i+1}/{total_actions} completed: {action.get('type')}")
                 
-                logger.info(f"Warming completed: execution_id={execution_id}, completed={completed}, failed={failed}")
-        
+                except Exception as e:
+                    logger.error(f"Action {i+1} failed: {e}")
+                    failed += 1
+                    
+                    # Enviar error
+                    if progress_callback:
+                        await progress_callback(
+                            execution_id,
+                            int((i + 1) / total_actions * 100),
+                            {
+                                "action_index": i,
+                                "action_type": action.get("type"),
+                                "success": False,
+                                "error": str(e),
+                                "timestamp": datetime.utcnow().isoformat()
+                            }
+                        )
+            
+            # Calcular duración
+            duration = (datetime.utcnow() - start_time).total_seconds()
+            
+            # Enviar completado
+            if progress_callback:
+                await progress_callback(
+                    execution_id,
+                    100,
+                    {
+                        "completed": True,
+                        "total_actions": total_actions,
+                        "actions_completed": completed,
+                        "actions_failed": failed,
+                        "duration_seconds": duration,
+                        "timestamp": datetime.utcnow().isoformat()
+                    }
+                )
+            
+            logger.info(f"Warming completed: execution_id={execution_id}, completed={completed}, failed={failed}")
+            reusable = True
+    
         except Exception as e:
             logger.error(f"Warming failed: execution_id={execution_id}, error={e}")
             
@@ -157,9 +192,11 @@ class WarmingExecutor:
                 )
         
         finally:
-            # Cerrar navegador
+            # Devolver navegador al pool (se cierra si la ejecución no terminó bien)
             if driver:
-                await self.browser_controller.close_browser(profile_id)
+                await self.session_pool.release(profile_id, reusable=reusable)
+            
+            self.admission.release()
     
     async def stop(self, execution_id: int) -> bool:
         """Detiene una ejecución"""
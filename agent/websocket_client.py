@@ -5,6 +5,10 @@ import json
 from loguru import logger
 from datetime import datetime
 from typing import Optional
+from progress_reporter import ProgressReporter
+from outbox import Outbox
+from script_cache import ScriptCache
+from selector_cache import selector_cache
 
 class WebSocketClient:
     """Cliente WebSocket para comunicación con orquestrador"""
@@ -17,6 +21,37 @@ class WebSocketClient:
         self.reconnect_delay = 5
         self.heartbeat_task = None
         
+        # ✅ Eventos de ejecución: journal local + reenvío en orden hasta el ack
+        self.outbox = Outbox(config.OUTBOX_PATH)
+        self.outbox_task: Optional[asyncio.Task] = None
+        self._outbox_ready = asyncio.Event()
+        self._outbox_acked = asyncio.Event()
+        self.acked_seq = 0
+        
+        # ✅ Scripts por hash de contenido (el cuerpo se pide solo en un miss)
+        self.script_cache = ScriptCache(
+            max_entries=config.SCRIPT_CACHE_SIZE,
+            fetch_timeout=config.SCRIPT_FETCH_TIMEOUT
+        )
+        
+        # ✅ Progreso coalescido por ejecución (un frame cada N ms, no uno por acción)
+        self.progress_reporter = ProgressReporter(
+            self.send_durable,
+            max_latency_ms=config.PROGRESS_MAX_LATENCY_MS,
+            max_batch=config.PROGRESS_MAX_BATCH
+        )
+        
+        # Barreras de batches sincronizados: (batch_id, action_index, execution_id) -> future
+        self._barrier_waiters: dict = {}
+        
+        # ✅ Reportar cola/carga al orquestador cuando cambia
+        self._admission_update_task: Optional[asyncio.Task] = None
+        self.warming_executor.admission.add_listener(self._on_admission_change)
+        
+        # ✅ Créditos: el orquestador solo envía ejecuciones cuando hay capacidad
+        self._held: set = set()  # execution_ids recibidos que no terminaron
+        self.commands_received = 0  # execute_warming recibidos en la conexión actual
+        
     async def connect(self):
         """Conecta al orquestrador"""
         
@@ -36,11 +71,24 @@ class WebSocketClient:
                 )
                 
                 self.connected = True
+                self.commands_received = 0
                 logger.info("✅ Connected to orchestrator!")
                 
+                # Anunciar créditos para que el orquestador empiece a despachar
+                self._on_admission_change(self.warming_executor.admission.get_stats())
+                
                 # Iniciar heartbeat
                 self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
                 
+                # Re-exportar selectores aprendidos (el orquestador pudo reiniciarse)
+                if selector_cache.get_stats()['entries']:
+                    selector_cache.dirty = True
+                
+                # Reenviar lo pendiente del outbox (y lo nuevo) en orden
+                if self.outbox_task:
+                    self.outbox_task.cancel()
+                self.outbox_task = asyncio.create_task(self._outbox_loop())
+                
                 # Iniciar escucha de mensajes
                 await self._listen()
                 
@@ -82,6 +130,7 @@ class WebSocketClient:
                 logger.info(f"Connected confirmation: {data.get('message')}")
             
             elif message_type == "execute_warming":
+                self.commands_received += 1
                 # ✅ Ejecutar en background (NO BLOQUEANTE)
                 asyncio.create_task(self._execute_warming(data))
             
@@ -94,6 +143,27 @@ class WebSocketClient:
             elif message_type == "heartbeat_ack":
                 logger.debug("Heartbeat acknowledged")
             
+            elif message_type == "barrier_release":
+                key = (data.get("batch_id"), data.get("action_index"), data.get("execution_id"))
+                future = self._barrier_waiters.pop(key, None)
+                if future and not future.done():
+                    future.set_result(bool(data.get("released")))
+            
+            elif message_type == "selector_cache_seed":
+                # Selectores aprendidos por otros agentes
+                selector_cache.load(data.get("entries", []))
+                logger.info(f"Selector cache seeded: {selector_cache.get_stats()['entries']} entries")
+            
+            elif message_type == "script_body":
+                self.script_cache.deliver(
+                    data.get("script_hash"),
+                    data.get("actions"),
+                    data.get("error")
+                )
+            
+            elif message_type == "outbox_ack":
+                await self._handle_outbox_ack(data.get("seq", 0), data.get("epoch"))
+            
             else:
                 logger.warning(f"Unknown message type: {message_type}")
         
@@ -105,28 +175,95 @@ class WebSocketClient:
         
         execution_id = data.get("execution_id")
         profile_id = data.get("profile_id")
-        actions = data.get("actions", [])
         
         logger.info(f"🔥 Executing warming: execution_id={execution_id}, profile_id={profile_id}")
         
+        self._held.add(execution_id)
+        
         # ✅ Ejecutar SIN AWAIT (para no bloquear websocket)
         try:
+            if "script_hash" in data:
+                actions = await self.script_cache.resolve(
+                    data["script_hash"],
+                    data.get("script_id"),
+                    self._request_script
+                )
+            else:
+                actions = data.get("actions", [])
+            
             await self.warming_executor.execute(
                 execution_id=execution_id,
                 profile_id=profile_id,
                 actions=actions,
-                progress_callback=self._send_progress
+                progress_callback=self.progress_reporter.report,
+                barrier_wait=self._barrier_waiter(execution_id, data.get("sync"))
             )
         except Exception as e:
             logger.error(f"Warming execution error: {e}")
             
+            # Lo pendiente sale antes que el fallo
+            await self.progress_reporter.flush(execution_id)
+            
             # Enviar fallo al orquestador
-            await self.send({
+            await self.send_durable({
                 "type": "execution_failed",
                 "execution_id": execution_id,
                 "error": str(e),
                 "timestamp": datetime.utcnow().isoformat()
             })
+        
+        finally:
+            # Slot libre: anunciar nuevos créditos
+            self._held.discard(execution_id)
+            self._on_admission_change(self.warming_executor.admission.get_stats())
+    
+    async def _send_selector_cache(self):
+        """Envía la tabla de selectores aprendidos al orquestador"""
+        selector_cache.dirty = False
+        await self.send({
+            "type": "selector_cache_export",
+            "entries": selector_cache.export(),
+            "timestamp": datetime.utcnow().isoformat()
+        })
+    
+    def _barrier_waiter(self, execution_id: int, sync: Optional[dict]):
+        """Callback de barrera para WarmingExecutor (None si el batch no es sincronizado)"""
+        if not sync:
+            return None
+        
+        async def wait(action_index: int) -> bool:
+            key = (sync["batch_id"], action_index, execution_id)
+            future = asyncio.get_running_loop().create_future()
+            self._barrier_waiters[key] = future
+            
+            try:
+                sent = await self.send({
+                    "type": "barrier_arrive",
+                    "sync": sync,
+                    "action_index": action_index,
+                    "execution_id": execution_id,
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+                if not sent:
+                    return False
+                # Margen sobre el timeout del orquestador (que responde released=False)
+                return await asyncio.wait_for(future, timeout=sync.get("timeout", 60) + 10)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self._barrier_waiters.pop(key, None)
+        
+        return wait
+    
+    async def _request_script(self, script_hash: str, script_id: Optional[int]) -> bool:
+        """Pide al orquestador el cuerpo de un script que no está en caché"""
+        logger.debug(f"Script cache miss: {script_hash[:12]}")
+        return await self.send({
+            "type": "script_request",
+            "script_hash": script_hash,
+            "script_id": script_id,
+            "timestamp": datetime.utcnow().isoformat()
+        })
     
     async def _stop_warming(self, data: dict):
         """Detiene warming"""
@@ -136,31 +273,27 @@ class WebSocketClient:
         
         await self.warming_executor.stop(execution_id)
     
-    async def _send_progress(self, execution_id: int, progress: int, log_entry: dict):
-        """Envía progreso al orquestrador"""
-        
-        message = {
-            "type": "execution_progress",
-            "execution_id": execution_id,
-            "progress": progress,
-            "log_entry": log_entry,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        await self.send(message)
-    
     async def _send_status(self):
         """Envía estado al orquestrador"""
         
-        import psutil
+        # ✅ Lecturas del sampler en background: responde sin esperar a psutil
+        telemetry = self.warming_executor.telemetry
+        summary = telemetry.get_summary()
         
         state = {
             "active_browsers": self.warming_executor.browser_controller.get_active_count(),
             "max_browsers": self.config.MAX_BROWSERS,
             "active_executions": len(self.warming_executor.active_executions),
-            "cpu_usage": psutil.cpu_percent(interval=1),
-            "memory_usage": psutil.virtual_memory().percent,
-            "uptime_seconds": 0
+            "cpu_usage": summary["cpu"],
+            "memory_usage": summary["mem"],
+            "uptime_seconds": summary["uptime"],
+            "telemetry": summary,
+            "telemetry_history": telemetry.get_history(),
+            "browser_ready_ms": self.warming_executor.browser_controller.ready_histogram.snapshot(),
+            "admission": self.warming_executor.admission.get_stats(),
+            "outbox_pending": await self.outbox.count(),
+            "script_cache": self.script_cache.get_stats(),
+            "selector_cache": selector_cache.get_stats()
         }
         
         message = {
@@ -184,9 +317,16 @@ class WebSocketClient:
                     try:
                         await self.send({
                             "type": "heartbeat",
+                            "queue_depth": self.warming_executor.admission.get_queue_depth(),
+                            "telemetry": self.warming_executor.telemetry.get_summary(),
+                            **self._credit_fields(),
                             "timestamp": datetime.utcnow().isoformat()
                         })
                         logger.debug("💓 Heartbeat sent")
+                        
+                        # Exportar selectores aprendidos si hubo cambios
+                        if selector_cache.dirty:
+                            await self._send_selector_cache()
                     except Exception as e:
                         logger.error(f"Heartbeat send failed: {e}")
                         break
@@ -199,6 +339,97 @@ class WebSocketClient:
                 logger.error(f"Heartbeat error: {e}")
                 break
     
+    def _on_admission_change(self, stats: dict):
+        """Listener de AdmissionController (sin bloquear al que notifica)"""
+        if not self.connected:
+            return
+        if self._admission_update_task and not self._admission_update_task.done():
+            return  # ya hay un envío pendiente; llevará el estado más reciente
+        self._admission_update_task = asyncio.create_task(self._send_admission_update())
+    
+    async def _send_admission_update(self):
+        await asyncio.sleep(0.5)  # coalescer ráfagas de cambios
+        await self.send({
+            "type": "admission_update",
+            "admission": self.warming_executor.admission.get_stats(),
+            **self._credit_fields(),
+            "timestamp": datetime.utcnow().isoformat()
+        })
+    
+    def _credit_fields(self) -> dict:
+        """Créditos libres + comandos recibidos (el orquestador descuenta los que están en vuelo)"""
+        return {
+            "credits": self.warming_executor.admission.get_credits(
+                len(self._held), self.config.CREDIT_PREFETCH
+            ),
+            "received": self.commands_received
+        }
+    
+    async def send_durable(self, message: dict) -> bool:
+        """Encola un evento en el outbox; se entrega aunque el socket esté caído"""
+        await self.outbox.append(message)
+        self._outbox_ready.set()
+        return True
+    
+    async def _handle_outbox_ack(self, seq: int, epoch: Optional[str] = None):
+        """Ack acumulativo del orquestador: descarta hasta seq"""
+        if epoch and epoch != self.outbox.epoch:
+            return  # ack de un journal anterior (secuencias reiniciadas)
+        if seq <= self.acked_seq:
+            return
+        self.acked_seq = seq
+        await self.outbox.ack(seq)
+        self._outbox_acked.set()
+    
+    async def _outbox_loop(self):
+        """
+        Envía el outbox en orden, en lotes de OUTBOX_REPLAY_BATCH
+
+        Tras reconectar empieza desde lo no confirmado. Con más de
+        OUTBOX_MAX_INFLIGHT eventos sin ack espera antes de seguir, para no
+        inundar al orquestador después de una caída larga.
+        """
+        sent_seq = 0
+        batch_size = self.config.OUTBOX_REPLAY_BATCH
+        
+        try:
+            while self.connected:
+                if sent_seq - self.acked_seq >= self.config.OUTBOX_MAX_INFLIGHT:
+                    self._outbox_acked.clear()
+                    try:
+                        await asyncio.wait_for(self._outbox_acked.wait(), timeout=self.config.OUTBOX_ACK_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        logger.warning("Outbox ack timeout, resending unacknowledged events")
+                        sent_seq = self.acked_seq
+                    continue
+                
+                self._outbox_ready.clear()
+                rows = await self.outbox.read_after(sent_seq, batch_size)
+                if not rows:
+                    await self._outbox_ready.wait()
+                    continue
+                
+                # Lo que ya no está en el outbox fue confirmado antes
+                self.acked_seq = max(self.acked_seq, rows[0][0] - 1)
+                
+                sent = await self.send({
+                    "type": "outbox_batch",
+                    "epoch": self.outbox.epoch,
+                    "messages": [{**message, "seq": seq} for seq, message in rows],
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+                if not sent:
+                    break
+                
+                sent_seq = rows[-1][0]
+                if len(rows) > 1:
+                    logger.debug(f"📬 Outbox batch sent: {len(rows)} events (up to seq {sent_seq})")
+        
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Outbox loop error: {e}")
+    
     async def send(self, message: dict):
         """Envía mensaje al orquestrador"""
         
@@ -217,8 +448,14 @@ class WebSocketClient:
     async def disconnect(self):
         """Desconecta del orquestrador"""
         
+        # Enviar el progreso acumulado antes de cerrar (queda en el outbox)
+        await self.progress_reporter.flush_all()
+        
         self.connected = False
         
+        if self.outbox_task:
+            self.outbox_task.cancel()
+        
         # Cancelar heartbeat
         if self.heartbeat_task:
             self.heartbeat_task.cancel()